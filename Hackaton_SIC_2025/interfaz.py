@@ -1,11 +1,16 @@
+import time
+_T0 = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
 import webbrowser
 import threading
+import queue
 import json
 import os
 import sys 
-from datetime import date, timedelta
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,9 +19,10 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 try:
-    # Importaciones de módulos de IA
-    from Hackaton_SIC_2025.modulos_gee.feature_generator import feature_generator
-    from Proyecto_final_SIC_2025.Models.predict import predict_from_dataframe
+    # Cliente del servicio de predicción (el modelo y GEE viven en servicio_prediccion.py;
+    # si no está corriendo se cargan en segundo plano en este proceso)
+    from Hackaton_SIC_2025.servicio_prediccion import cliente_por_defecto, fecha_por_defecto
+    from Hackaton_SIC_2025.modulos_gee.indice_corregimientos import cargar_indice
     print("✅ Módulos importados correctamente.")
 except ImportError as e:
     print(f"Error crítico importando módulos: {e}")
@@ -24,16 +30,198 @@ except ImportError as e:
     print(f"Raíz del proyecto detectada: {project_root}")
     print(f"Sys.path: {sys.path}")
 
+
+class StartupReport:
+    """
+    Registra los tiempos de arranque (segundos desde el inicio del proceso)
+    y los agrega a startup_report.jsonl para seguir regresiones de arranque en frío.
+    """
+
+    def __init__(self, t0, path):
+        self.t0 = t0
+        self.path = path
+        self.marks = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        with self._lock:
+            self.marks[name] = round(time.perf_counter() - self.t0, 3)
+
+    def save(self):
+        with self._lock:
+            entry = {"timestamp": datetime.now().isoformat(timespec="seconds"), **self.marks}
+        print("⏱ Arranque: " + ", ".join(f"{k}={v}s" for k, v in entry.items() if k != "timestamp"))
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"No se pudo guardar el reporte de arranque: {e}")
+
+
+STARTUP = StartupReport(_T0, os.path.join(current_dir, "startup_report.jsonl"))
+STARTUP.mark("imports")
+
+
+# Puntos por consulta en lote al encolar una provincia
+PROVINCE_CHUNK = 8
+
+
+class PredictionJob:
+    """Una predicción encolada (un punto) y su estado para la tabla de resultados."""
+
+    def __init__(self, job_id, label, lat, lon):
+        self.id = job_id
+        self.label = label
+        self.lat = lat
+        self.lon = lon
+        self.status = "En cola"
+        self.result = None
+        self.error = None
+        self.started = None
+        self.elapsed = None
+        self.future = None
+        self.cancelled = threading.Event()
+
+
+class JobScheduler:
+    """
+    Cola de predicciones con un pool acotado de hilos. Los hilos no tocan Tk:
+    publican el id del trabajo que cambió en una cola que la interfaz lee con
+    root.after (poll()). Cancelar un trabajo evita su consulta a GEE aunque su
+    grupo ya haya empezado; una consulta que ya está en curso no se puede
+    interrumpir, su resultado se descarta.
+    """
+
+    def __init__(self, get_servicio, max_workers=4):
+        self.get_servicio = get_servicio
+        self.jobs = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._updates = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prediccion")
+
+    def submit(self, label, lat, lon):
+        return self.submit_many([(label, lat, lon)])[0]
+
+    def submit_many(self, items, chunk_size=PROVINCE_CHUNK):
+        """
+        Encola varios puntos (label, lat, lon). Se resuelven por grupos de
+        chunk_size con un solo predecir_lote (GEE en paralelo y un forward
+        pass por grupo); la tabla se actualiza al terminar cada grupo.
+        """
+        with self._lock:
+            jobs = []
+            for label, lat, lon in items:
+                self._next_id += 1
+                job = PredictionJob(self._next_id, label, lat, lon)
+                self.jobs[job.id] = job
+                jobs.append(job)
+        for start in range(0, len(jobs), chunk_size):
+            group = jobs[start:start + chunk_size]
+            future = self._executor.submit(self._run, group)
+            for job in group:
+                job.future = future
+                self._updates.put(job.id)
+        return jobs
+
+    def _set_status(self, job, status):
+        with self._lock:
+            if job.status == "Cancelado":
+                return False
+            job.status = status
+        self._updates.put(job.id)
+        return True
+
+    def _finish(self, job, result=None, error=None):
+        job.elapsed = time.perf_counter() - job.started
+        if job.cancelled.is_set():
+            return
+        if error is None:
+            job.result = result
+            self._set_status(job, "Listo")
+        else:
+            job.error = error
+            self._set_status(job, "Error")
+
+    def _run(self, group):
+        # Los trabajos cancelados mientras esperaban no llegan a consultar GEE
+        active = [j for j in group
+                  if not j.cancelled.is_set() and self._set_status(j, "Consultando GEE...")]
+        if not active:
+            return
+        started = time.perf_counter()
+        for job in active:
+            job.started = started
+        servicio = self.get_servicio()
+        try:
+            if len(active) == 1:
+                job = active[0]
+                self._finish(job, servicio.predecir(job.lon, job.lat, fecha_por_defecto()))
+                return
+            results = servicio.predecir_lote([(j.lon, j.lat, fecha_por_defecto()) for j in active],
+                                             cancelados=[j.cancelled.is_set for j in active])
+            for job, result in zip(active, results):
+                self._finish(job, result, result.get("error"))
+        except Exception as e:
+            for job in active:
+                self._finish(job, error=str(e))
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.status in ("Listo", "Error", "Cancelado"):
+            return
+        job.cancelled.set()
+        with self._lock:
+            job.status = "Cancelado"
+        self._updates.put(job.id)
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def forget_finished(self):
+        """Quita de la cola los trabajos terminados; devuelve sus ids."""
+        with self._lock:
+            done = [i for i, j in self.jobs.items() if j.status in ("Listo", "Error", "Cancelado")]
+            for job_id in done:
+                del self.jobs[job_id]
+        return done
+
+    def poll(self):
+        """Ids de los trabajos que cambiaron desde la última llamada (hilo de Tk)."""
+        changed = []
+        while True:
+            try:
+                job_id = self._updates.get_nowait()
+            except queue.Empty:
+                return list(dict.fromkeys(changed))
+            changed.append(job_id)
+
+    def counts(self):
+        with self._lock:
+            total = len(self.jobs)
+            done = sum(j.status in ("Listo", "Error", "Cancelado") for j in self.jobs.values())
+        return done, total
+
+    def close(self):
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
 class SolarRadiationMapApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Proyecto Final IA | Predictor y Mapa de Radiación Solar")
        
-        self.root.geometry("900x780") 
+        self.root.geometry("900x880") 
         self.root.configure(bg='#f0f8ff')
         
+        self._servicio = None
+        self._servicio_lock = threading.Lock()
+        self.scheduler = JobScheduler(self.get_servicio)
+
         # Cargar datos GeoJSON
         self.locations_data = self.load_geojson_data()
+        STARTUP.mark("geojson_loaded")
         
         self.PANAMA_BOUNDS = {
             'min_lat': 7.0,
@@ -56,40 +244,41 @@ class SolarRadiationMapApp:
         self.create_predictor_tab()
         self.create_footer()
 
+    def start_background_warmup(self):
+        """Prepara GEE y el modelo en segundo plano, una vez visible la ventana."""
+        STARTUP.mark("window_shown")
+
+        def warm():
+            try:
+                self.get_servicio().precalentar()
+                STARTUP.mark("service_ready")
+            except Exception as e:
+                print(f"No se pudo preparar el servicio de predicción: {e}")
+            STARTUP.save()
+
+        threading.Thread(target=warm, name="warmup", daemon=True).start()
+
+    def get_servicio(self):
+        """Cliente del servicio de predicción (o el servicio en proceso), creado una vez."""
+        with self._servicio_lock:
+            if self._servicio is None:
+                self._servicio = cliente_por_defecto()
+            return self._servicio
+
     def load_geojson_data(self):
-        """Carga el GeoJSON para la funcionalidad de dropdowns."""
-        data_structure = {}
+        """
+        Provincia -> Corregimiento -> (lat, lon) desde el índice precalculado
+        (modulos_gee/indice_corregimientos.py). Se usa el punto interior de
+        cada corregimiento: su centroide, salvo que caiga fuera (islas).
+        """
         try:
-            base_path = os.path.dirname(os.path.abspath(__file__))
-            json_path = os.path.join(base_path, "Panama_Boundaries.geojson")
-            
-            with open(json_path, 'r', encoding='utf-8') as f:
-                geojson = json.load(f)
-            
-            for feature in geojson['features']:
-                props = feature['properties']
-                prov = props.get('Provincia', 'Desconocido')
-                corr = props.get('Corregimiento', 'Desconocido')
-                
-                geom = feature['geometry']
-                if geom['type'] == 'MultiPolygon':
-                    coords = geom['coordinates'][0][0]
-                elif geom['type'] == 'Polygon':
-                    coords = geom['coordinates'][0]
-                else:
-                    continue
-                
-                lons = [p[0] for p in coords]
-                lats = [p[1] for p in coords]
-                centroid = (sum(lats) / len(lats), sum(lons) / len(lons))
-                
-                if prov not in data_structure:
-                    data_structure[prov] = {}
-                data_structure[prov][corr] = centroid
-                
-            return {k: dict(sorted(v.items())) for k, v in sorted(data_structure.items())}
+            indice = cargar_indice()
+            return {
+                prov: {nombre: (c['punto'][1], c['punto'][0]) for nombre, c in corrs.items()}
+                for prov, corrs in indice['provincias'].items()
+            }
         except Exception as e:
-            print(f"Error cargando GeoJSON: {e}")
+            print(f"Error cargando el índice de corregimientos: {e}")
             return {}
 
     def create_header(self):
@@ -183,9 +372,18 @@ class SolarRadiationMapApp:
             font=('Arial', 11, 'bold'),
             bg='#0066cc', fg='white', relief='raised', bd=3,
             padx=15, pady=5,
-            command=self.start_prediction_thread, cursor='hand2'
+            command=self.enqueue_point, cursor='hand2'
         )
         self.btn_predict.pack(side='left', padx=10)
+
+        tk.Button(
+            button_frame,
+            text="📋 Encolar Provincia",
+            font=('Arial', 11),
+            bg='#e0e0e0', fg='#333333', relief='raised', bd=3,
+            padx=15, pady=5,
+            command=self.enqueue_province, cursor='hand2'
+        ).pack(side='left', padx=10)
         
         tk.Button(
             button_frame,
@@ -198,6 +396,33 @@ class SolarRadiationMapApp:
 
         self.loading_label = tk.Label(predictor_frame, text="", font=('Arial', 10, 'italic'), fg='#0066cc')
         self.loading_label.pack()
+
+        # --- TABLA DE TRABAJOS (se actualiza con root.after) ---
+        jobs_frame = tk.Frame(predictor_frame)
+        jobs_frame.pack(fill='x', padx=10)
+
+        progress_frame = tk.Frame(jobs_frame)
+        progress_frame.pack(fill='x', pady=(0, 5))
+        self.progress = ttk.Progressbar(progress_frame, mode='determinate')
+        self.progress.pack(side='left', fill='x', expand=True)
+        tk.Button(progress_frame, text="⛔ Cancelar selección", font=('Arial', 9),
+                  command=self.cancel_selected, cursor='hand2').pack(side='left', padx=(10, 0))
+        tk.Button(progress_frame, text="Cancelar todo", font=('Arial', 9),
+                  command=self.scheduler.cancel_all, cursor='hand2').pack(side='left', padx=(5, 0))
+
+        columns = ('lugar', 'lat', 'lon', 'estado', 'pred', 'real', 'conf', 'tiempo')
+        headings = ('Lugar', 'Lat', 'Lon', 'Estado', 'IA (MJ/m²)', 'Real (MJ/m²)', 'Confianza', 'Tiempo')
+        widths = (190, 70, 80, 140, 90, 95, 80, 60)
+        self.jobs_table = ttk.Treeview(jobs_frame, columns=columns, show='headings', height=7)
+        for col, text, width in zip(columns, headings, widths):
+            self.jobs_table.heading(col, text=text)
+            self.jobs_table.column(col, width=width, anchor='w' if col == 'lugar' else 'center')
+        scroll = ttk.Scrollbar(jobs_frame, orient='vertical', command=self.jobs_table.yview)
+        self.jobs_table.configure(yscrollcommand=scroll.set)
+        self.jobs_table.pack(side='left', fill='x', expand=True)
+        scroll.pack(side='left', fill='y')
+        self.jobs_table.bind("<<TreeviewSelect>>", self.on_job_selected)
+        self.root.after(100, self.poll_jobs)
         
         # --- FRAME DE RESULTADOS (Espacio reservado) ---
         self.result_frame = tk.Frame(predictor_frame, bg='#fffacd', relief='solid', bd=1)
@@ -223,7 +448,7 @@ class SolarRadiationMapApp:
             self.lon_entry.insert(0, f"{lon:.4f}")
 
     # --- LÓGICA DE PREDICCIÓN ---
-    def start_prediction_thread(self):
+    def enqueue_point(self):
         lat = self.lat_entry.get()
         lon = self.lon_entry.get()
         
@@ -241,37 +466,73 @@ class SolarRadiationMapApp:
             messagebox.showerror("Error", "Valores numéricos inválidos.")
             return
 
-        self.btn_predict.config(state='disabled', bg='#cccccc')
-        self.loading_label.config(text="⌛ Conectando con satélite y procesando modelo...")
-        self.result_frame.pack_forget()
-
-        threading.Thread(target=self.run_prediction_logic, args=(lat_val, lon_val)).start()
-
-    def run_prediction_logic(self, lat, lon):
-        try:
-            target_date = date.today() - timedelta(days=20)
-            date_str = target_date.strftime("%Y-%m-%d")
+        # Si las coordenadas son las del corregimiento elegido, se usa su nombre
+        prov, corr = self.prov_combo.get(), self.corr_combo.get()
+        label = f"{lat_val:.4f}, {lon_val:.4f}"
+        if corr and self.locations_data.get(prov, {}).get(corr):
+            c_lat, c_lon = self.locations_data[prov][corr]
+            if f"{c_lat:.4f}" == f"{lat_val:.4f}" and f"{c_lon:.4f}" == f"{lon_val:.4f}":
+                label = f"{corr} ({prov})"
+        self.add_job(label, lat_val, lon_val)
+
+    def enqueue_province(self):
+        """Encola todos los corregimientos de la provincia seleccionada."""
+        prov = self.prov_combo.get()
+        if prov not in self.locations_data:
+            messagebox.showerror("Error", "Seleccione una provincia.")
+            return
+        self.add_jobs([(f"{corr} ({prov})", lat, lon)
+                       for corr, (lat, lon) in self.locations_data[prov].items()])
+
+    def add_job(self, label, lat, lon):
+        self.add_jobs([(label, lat, lon)])
+
+    def add_jobs(self, items):
+        for job in self.scheduler.submit_many(items):
+            self.jobs_table.insert('', 'end', iid=str(job.id), values=self.job_row(job))
+
+    def job_row(self, job):
+        r = job.result or {}
+        return (
+            job.label, f"{job.lat:.4f}", f"{job.lon:.4f}",
+            job.status if job.error is None else f"Error: {job.error}",
+            f"{r['prediccion_mj']:.2f}" if r else "",
+            f"{r['real_mj']:.2f}" if r.get('real_mj') else "",
+            f"{r['confianza']:.1f}%" if r else "",
+            f"{job.elapsed:.1f} s" if job.elapsed is not None else "",
+        )
 
-            df_features, real_value = feature_generator([lon, lat], target_date=date_str)
-            
-            pred_joules = float(predict_from_dataframe(df_features)[0])
-            
-            # Conversión a MJ
-            pred_mj = pred_joules / 1_000_000
-            real_mj = (real_value / 1_000_000) if real_value > 0 else 0.0
+    def poll_jobs(self):
+        """Lleva a la tabla los cambios publicados por los hilos de trabajo."""
+        for job_id in self.scheduler.poll():
+            job = self.scheduler.jobs.get(job_id)
+            if job is not None and self.jobs_table.exists(str(job_id)):
+                self.jobs_table.item(str(job_id), values=self.job_row(job))
+                if job.status == "Listo" and str(job_id) in self.jobs_table.selection():
+                    self.show_job(job)
+
+        done, total = self.scheduler.counts()
+        self.progress.config(maximum=max(total, 1), value=done)
+        pending = total - done
+        self.loading_label.config(
+            text=f"⌛ {pending} predicción(es) en curso o en cola..." if pending else ""
+        )
+        self.root.after(100, self.poll_jobs)
 
-            if real_value > 0:
-                diff = abs(pred_joules - real_value)
-                conf = max(0, 100 - (diff / real_value * 100))
-            else:
-                conf = 0.0
+    def on_job_selected(self, event):
+        selection = self.jobs_table.selection()
+        if selection:
+            job = self.scheduler.jobs.get(int(selection[-1]))
+            if job is not None and job.status == "Listo":
+                self.show_job(job)
 
-            self.root.after(0, lambda: self.show_results(lat, lon, pred_mj, conf, real_mj))
+    def show_job(self, job):
+        r = job.result
+        self.show_results(job.lat, job.lon, r['prediccion_mj'], r['confianza'], r['real_mj'])
 
-        except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("Error", str(e)))
-        finally:
-            self.root.after(0, lambda: [self.btn_predict.config(state='normal', bg='#0066cc'), self.loading_label.config(text="")])
+    def cancel_selected(self):
+        for iid in self.jobs_table.selection():
+            self.scheduler.cancel(int(iid))
 
     def show_results(self, lat, lon, pred_mj, conf, real_mj):
         for w in self.result_frame.winfo_children(): w.destroy()
@@ -361,8 +622,19 @@ class SolarRadiationMapApp:
         self.prov_combo.set('')
         self.corr_combo.set('')
         self.result_frame.pack_forget()
+        # Quita de la tabla los trabajos terminados (los pendientes siguen)
+        for job_id in self.scheduler.forget_finished():
+            if self.jobs_table.exists(str(job_id)):
+                self.jobs_table.delete(str(job_id))
+
+    def on_close(self):
+        self.scheduler.close()
+        self.root.destroy()
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = SolarRadiationMapApp(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
+    # Se ejecuta cuando el bucle de eventos ya dibujó la ventana
+    root.after(100, app.start_background_warmup)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,365 @@
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import ee
+except ImportError:  # El backend local no necesita earthengine-api
+    ee = None
+
+from Hackaton_SIC_2025.modulos_gee.cache_gee import redondear_coords
+
+# --- Manejo Dinámico de Rutas ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+service_account = 'kointrol-team@kointrol-ai.iam.gserviceaccount.com'
+key_file = os.path.join(BASE_DIR, "kointrol-ai-218d7c03278d.json")
+
+# Directorio por defecto del backend local (fixtures y mallas)
+DATOS_LOCALES = os.path.join(BASE_DIR, "datos_locales")
+FIXTURES_NOMBRE = "fixtures.json"
+
+# --- Parámetros de reducción espacial ---
+# Radio de búsqueda (m) y escala (m) para variables diarias/horarias
+BUFFER_DINAMICO = 25000
+ESCALA_DINAMICA = 10000
+# Radio de búsqueda (m) y escala (m) para variables estáticas (elevación)
+BUFFER_ESTATICO = 100
+ESCALA_ESTATICA = 30
+
+METROS_POR_GRADO = 111320.0
+
+_ee_inicializado = False
+_ee_lock = threading.Lock()
+
+
+def inicializar_ee():
+    """
+    Autentica la cuenta de servicio e inicializa GEE la primera vez que se
+    necesita. Seguro entre hilos: llamadas concurrentes esperan a la primera.
+    """
+    global _ee_inicializado
+    if _ee_inicializado:
+        return
+    with _ee_lock:
+        if _ee_inicializado:
+            return
+        if ee is None:
+            raise ImportError("earthengine-api no está instalado; usa BackendLocal.")
+        credentials = ee.ServiceAccountCredentials(service_account, key_file)
+        ee.Initialize(credentials)
+        _ee_inicializado = True
+
+
+def clave_peticion(coords, peticion):
+    """Clave estable de una petición de reducción (para fixtures grabados)."""
+    escala = ESCALA_ESTATICA if peticion['type'] == 'static' else ESCALA_DINAMICA
+    lon, lat = redondear_coords(coords[0], coords[1], escala)
+    return json.dumps([peticion['dataset'], sorted(peticion['bands']),
+                       peticion['inicio'], peticion['fin'], lon, lat])
+
+
+# Contrato común de los backends:
+#   precalentar() -> prepara conexiones/credenciales (opcional, en segundo plano)
+#   reducir(coords, peticiones) -> {nombre: {banda: valor}}
+# con peticiones = {nombre: {'dataset', 'bands', 'type', 'inicio', 'fin'}},
+# 'inicio'/'fin' fechas ISO (fin exclusivo; None para variables estáticas).
+# Una ventana sin imágenes (p. ej. un día de ERA5 aún no publicado) devuelve {}
+# y un píxel enmascarado None, para distinguirlos de un 0 real; DataFetcher
+# rellena con 0.0 las bandas que faltan.
+
+class BackendEE:
+    """Backend en vivo: cada llamada a reducir() es un único getInfo() a GEE."""
+
+    nombre = 'ee'
+    cacheable = True
+
+    def precalentar(self):
+        inicializar_ee()
+
+    def reducir(self, coords, peticiones):
+        inicializar_ee()
+        punto = ee.Geometry.Point(list(coords))
+
+        consulta = {}
+        for nombre, p in peticiones.items():
+            if p['type'] == 'static':
+                consulta[nombre] = self._static_reduced_expr(p['dataset'], p['bands'], punto)
+            else:
+                f1 = ee.Date(p['inicio'])
+                f2 = ee.Date(p['fin'])
+                consulta[nombre] = self._reduced_value_expr(p['dataset'], p['bands'], f1, f2, punto)
+
+        crudos = ee.Dictionary(consulta).getInfo() if consulta else {}
+        return {nombre: crudos.get(nombre) or {} for nombre in peticiones}
+
+    def _reduced_value_expr(self, dataset, bands, f1, f2, punto):
+        coll = ee.ImageCollection(dataset).filterDate(f1, f2).select(bands)
+
+        # --- SOLUCIÓN CRÍTICA: BUFFER ---
+        # Creamos un radio de búsqueda de 25km (BUFFER_DINAMICO) alrededor del punto.
+        # Esto permite capturar datos de tierra incluso si el click fue en el mar cercano.
+        stats = coll.mean().reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=punto.buffer(BUFFER_DINAMICO), # Usamos el área circular, no el punto
+            scale=ESCALA_DINAMICA
+        )
+        return ee.Algorithms.If(coll.size().eq(0), ee.Dictionary({}), stats)
+
+    def _static_reduced_expr(self, dataset, bands, punto):
+        img = ee.Image(dataset).select(bands)
+        return img.reduceRegion(
+            reducer=ee.Reducer.first(),
+            geometry=punto.buffer(BUFFER_ESTATICO), # Pequeño buffer para elevación también
+            scale=ESCALA_ESTATICA
+        )
+
+
+class MallaLocal:
+    """
+    Malla regular de un dataset en disco. Cada banda es un arreglo
+    (n_fechas, n_lat, n_lon) o (n_lat, n_lon) para datasets estáticos.
+    """
+
+    def __init__(self, lats, lons, bandas, fechas=None):
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.fechas = np.asarray(fechas if fechas is not None else [], dtype=str)
+        self.bandas = {b: np.asarray(v, dtype=float) for b, v in bandas.items()}
+
+    @classmethod
+    def desde_archivo(cls, path):
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.npz':
+            with np.load(path, allow_pickle=False) as datos:
+                fechas = datos['fecha'] if 'fecha' in datos.files else None
+                bandas = {k: datos[k] for k in datos.files if k not in ('lat', 'lon', 'fecha')}
+                return cls(datos['lat'], datos['lon'], bandas, fechas)
+        if ext == '.nc':
+            import xarray as xr
+            with xr.open_dataset(path) as ds:
+                ds = ds.rename({k: v for k, v in (('latitude', 'lat'), ('longitude', 'lon'))
+                                if k in ds.dims})
+                fechas = None
+                if 'time' in ds.dims:
+                    fechas = pd.to_datetime(ds['time'].values).strftime('%Y-%m-%d')
+                bandas = {k: ds[k].values for k in ds.data_vars}
+                return cls(ds['lat'].values, ds['lon'].values, bandas, fechas)
+        if ext in ('.parquet', '.csv'):
+            df = pd.read_parquet(path) if ext == '.parquet' else pd.read_csv(path)
+            return cls.desde_tabla(df)
+        raise ValueError(f"Formato de malla no soportado: {path}")
+
+    @classmethod
+    def desde_tabla(cls, df):
+        """Tabla larga (fecha?, lat, lon, bandas...) -> malla."""
+        lats = np.sort(df['lat'].unique())
+        lons = np.sort(df['lon'].unique())
+        iy = np.searchsorted(lats, df['lat'].to_numpy())
+        ix = np.searchsorted(lons, df['lon'].to_numpy())
+        columnas = [c for c in df.columns if c not in ('fecha', 'lat', 'lon')]
+
+        if 'fecha' in df.columns:
+            fechas_col = pd.to_datetime(df['fecha']).dt.strftime('%Y-%m-%d').to_numpy()
+            fechas = np.unique(fechas_col)
+            it = np.searchsorted(fechas, fechas_col)
+            forma = (len(fechas), len(lats), len(lons))
+        else:
+            fechas = None
+            forma = (len(lats), len(lons))
+
+        bandas = {}
+        for c in columnas:
+            arr = np.full(forma, np.nan)
+            if fechas is None:
+                arr[iy, ix] = df[c].to_numpy(dtype=float)
+            else:
+                arr[it, iy, ix] = df[c].to_numpy(dtype=float)
+            bandas[c] = arr
+        return cls(lats, lons, bandas, fechas)
+
+    def _celdas(self, lon, lat, radio):
+        """Máscara (n_lat, n_lon) de celdas a menos de `radio` metros del punto."""
+        dy = (self.lats[:, None] - lat) * METROS_POR_GRADO
+        dx = (self.lons[None, :] - lon) * METROS_POR_GRADO * math.cos(math.radians(lat))
+        dist = np.hypot(dx, dy)
+        mascara = dist <= radio
+        if not mascara.any():
+            # Como GEE con un buffer pequeño: al menos el píxel más cercano
+            mascara = dist == dist.min()
+        return mascara
+
+    def reducir(self, coords, peticion):
+        lon, lat = coords
+        bands = peticion['bands']
+
+        if peticion['type'] == 'static':
+            mascara = self._celdas(lon, lat, BUFFER_ESTATICO)
+            stats = {}
+            for b in bands:
+                valores = self.bandas[b][mascara] if b in self.bandas else np.array([np.nan])
+                valores = valores[~np.isnan(valores)]
+                stats[b] = float(valores[0]) if valores.size else None
+            return stats
+
+        dentro = (self.fechas >= peticion['inicio']) & (self.fechas < peticion['fin'])
+        if not dentro.any():
+            return {}
+
+        mascara = self._celdas(lon, lat, BUFFER_DINAMICO)
+        stats = {}
+        for b in bands:
+            if b not in self.bandas:
+                stats[b] = None
+                continue
+            valores = self.bandas[b][dentro][:, mascara]
+            stats[b] = float(np.nanmean(valores)) if np.isfinite(valores).any() else None
+        return stats
+
+
+class BackendLocal:
+    """
+    Backend sin red. Sirve los mismos diccionarios de bandas que BackendEE a partir de:
+      - fixtures grabados con BackendGrabador (<directorio>/fixtures.json);
+      - mallas por dataset en <directorio>, con el id del dataset usando '_' en
+        lugar de '/' (p. ej. ECMWF_ERA5_LAND_DAILY_AGGR.npz / .parquet / .csv / .nc).
+    Con estricto=True una petición sin datos locales lanza KeyError.
+    """
+
+    nombre = 'local'
+    cacheable = False
+
+    EXTENSIONES = ('.npz', '.parquet', '.csv', '.nc')
+
+    def __init__(self, directorio=DATOS_LOCALES, estricto=False):
+        self.directorio = directorio
+        self.estricto = estricto
+        self.fixtures = {}
+        path = os.path.join(directorio, FIXTURES_NOMBRE)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.fixtures = json.load(f)
+        self._mallas = {}
+        self._lock = threading.Lock()
+
+    def precalentar(self):
+        pass
+
+    def _malla(self, dataset):
+        with self._lock:
+            if dataset not in self._mallas:
+                self._mallas[dataset] = None
+                base = os.path.join(self.directorio, dataset.replace('/', '_'))
+                for ext in self.EXTENSIONES:
+                    if os.path.exists(base + ext):
+                        self._mallas[dataset] = MallaLocal.desde_archivo(base + ext)
+                        break
+            return self._mallas[dataset]
+
+    def reducir(self, coords, peticiones):
+        resultados = {}
+        for nombre, p in peticiones.items():
+            clave = clave_peticion(coords, p)
+            if clave in self.fixtures:
+                resultados[nombre] = self.fixtures[clave]
+                continue
+            malla = self._malla(p['dataset'])
+            if malla is not None:
+                resultados[nombre] = malla.reducir(coords, p)
+            elif self.estricto:
+                raise KeyError(f"Sin datos locales para {p['dataset']} en {coords}")
+            else:
+                resultados[nombre] = {}
+        return resultados
+
+
+class BackendGrabador:
+    """
+    Envuelve otro backend y graba cada respuesta como fixture para BackendLocal.
+    Úsalo con DataFetcher(..., cache=False) para que todas las peticiones pasen por aquí.
+    """
+
+    def __init__(self, backend, directorio=DATOS_LOCALES):
+        self.backend = backend
+        self.nombre = backend.nombre
+        self.cacheable = backend.cacheable
+        self.path = os.path.join(directorio, FIXTURES_NOMBRE)
+        os.makedirs(directorio, exist_ok=True)
+        self.fixtures = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.fixtures = json.load(f)
+        self._lock = threading.Lock()
+
+    def precalentar(self):
+        self.backend.precalentar()
+
+    def reducir(self, coords, peticiones):
+        resultados = self.backend.reducir(coords, peticiones)
+        with self._lock:
+            for nombre, p in peticiones.items():
+                self.fixtures[clave_peticion(coords, p)] = resultados[nombre]
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.fixtures, f, indent=1, sort_keys=True)
+        return resultados
+
+
+class BackendConRespaldo:
+    """
+    Usa el backend principal y, si falla o tarda más de `timeout` segundos,
+    responde con el de respaldo (típicamente BackendLocal).
+    """
+
+    cacheable = False
+
+    def __init__(self, principal, respaldo, timeout=10.0):
+        self.principal = principal
+        self.respaldo = respaldo
+        self.timeout = timeout
+        self.nombre = f"{principal.nombre}+{respaldo.nombre}"
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="backend")
+
+    def precalentar(self):
+        self.respaldo.precalentar()
+        try:
+            self.principal.precalentar()
+        except Exception as e:
+            print(f"No se pudo preparar {self.principal.nombre}: {e}")
+
+    def reducir(self, coords, peticiones):
+        futuro = self._executor.submit(self.principal.reducir, coords, peticiones)
+        try:
+            return futuro.result(timeout=self.timeout)
+        except Exception as e:
+            print(f"Backend {self.principal.nombre} no respondió ({type(e).__name__}); usando {self.respaldo.nombre}.")
+            return self.respaldo.reducir(coords, peticiones)
+
+
+_backend_default = None
+_backend_lock = threading.Lock()
+
+
+def backend_por_defecto():
+    """
+    Backend compartido según la variable de entorno GEE_BACKEND:
+    'ee' (por defecto), 'local' o 'ee+local' (GEE con respaldo local).
+    El directorio local se toma de GEE_DATOS_LOCALES.
+    """
+    global _backend_default
+    with _backend_lock:
+        if _backend_default is None:
+            modo = os.environ.get('GEE_BACKEND', 'ee').lower()
+            directorio = os.environ.get('GEE_DATOS_LOCALES', DATOS_LOCALES)
+            if modo == 'local':
+                _backend_default = BackendLocal(directorio)
+            elif modo == 'ee+local':
+                _backend_default = BackendConRespaldo(BackendEE(), BackendLocal(directorio))
+            elif modo == 'ee':
+                _backend_default = BackendEE()
+            else:
+                raise ValueError(f"GEE_BACKEND desconocido: {modo}")
+        return _backend_default
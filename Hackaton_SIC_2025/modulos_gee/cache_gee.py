@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# --- Manejo Dinámico de Rutas ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(BASE_DIR, "cache_gee.sqlite")
+
+METROS_POR_GRADO = 111320.0
+
+# Tiempo de vida (segundos) de cada entrada según el 'type' de la variable.
+# None = no expira (SRTM no cambia nunca).
+TTL_POR_TIPO = {
+    'static': None,
+    'daily': 30 * 24 * 3600,
+    'hourly': 7 * 24 * 3600,
+}
+# Reducciones vacías (p. ej. un día de ERA5 aún no publicado) se reintentan pronto
+TTL_VACIO = 6 * 3600
+# Límite de entradas; al superarlo se eliminan las menos usadas recientemente
+MAX_ENTRADAS = 200_000
+
+
+def redondear_coords(lon, lat, escala):
+    """
+    Lleva (lon, lat) al centro de la celda de la malla de reducción de
+    `escala` metros. Puntos cercanos dentro de la misma celda comparten clave.
+    """
+    paso = escala / METROS_POR_GRADO
+    return (round(round(lon / paso) * paso, 6), round(round(lat / paso) * paso, 6))
+
+
+def es_vacio(stats, bands=None):
+    """
+    Una reducción sin datos: vacía, con alguna banda pedida ausente o en None.
+    Un 0 es un dato válido (p. ej. un día sin precipitación).
+    """
+    if not stats:
+        return True
+    if bands is not None and any(b not in stats for b in bands):
+        return True
+    return any(v is None for v in stats.values())
+
+
+class CacheReducciones:
+    """
+    Caché persistente (SQLite) de diccionarios de bandas reducidas por GEE.
+    La clave es (dataset, bandas, fecha, coordenadas redondeadas, buffer, escala).
+    Es segura para usar desde varios hilos.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl_por_tipo=None, ttl_vacio=TTL_VACIO,
+                 max_entradas=MAX_ENTRADAS):
+        self.path = path
+        self.ttl_por_tipo = dict(TTL_POR_TIPO, **(ttl_por_tipo or {}))
+        self.ttl_vacio = ttl_vacio
+        self.max_entradas = max_entradas
+        self._escrituras = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reducciones ("
+            " clave TEXT PRIMARY KEY,"
+            " tipo TEXT NOT NULL,"
+            " valor TEXT NOT NULL,"
+            " creado REAL NOT NULL,"
+            " accedido REAL NOT NULL,"
+            " expira REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_reducciones_accedido ON reducciones (accedido)"
+        )
+
+    def clave(self, dataset, bands, fecha, coords, buffer, escala):
+        lon, lat = redondear_coords(coords[0], coords[1], escala)
+        return json.dumps([dataset, sorted(bands), fecha, lon, lat, buffer, escala])
+
+    def get(self, clave):
+        """Devuelve el diccionario guardado o None si no existe o expiró."""
+        ahora = time.time()
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT valor, expira FROM reducciones WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                return None
+            valor, expira = fila
+            if expira is not None and expira < ahora:
+                self._conn.execute("DELETE FROM reducciones WHERE clave = ?", (clave,))
+                return None
+            self._conn.execute(
+                "UPDATE reducciones SET accedido = ? WHERE clave = ?", (ahora, clave)
+            )
+        return json.loads(valor)
+
+    def put(self, clave, tipo, stats, bands=None):
+        ahora = time.time()
+        ttl = self.ttl_vacio if es_vacio(stats, bands) else self.ttl_por_tipo.get(tipo)
+        expira = ahora + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reducciones VALUES (?, ?, ?, ?, ?, ?)",
+                (clave, tipo, json.dumps(stats), ahora, ahora, expira)
+            )
+            self._escrituras += 1
+            if self._escrituras % 100 == 0:
+                self._desalojar()
+
+    def _desalojar(self):
+        """Borra entradas expiradas y, si sobra, las menos usadas (LRU)."""
+        self._conn.execute(
+            "DELETE FROM reducciones WHERE expira IS NOT NULL AND expira < ?", (time.time(),)
+        )
+        total = self._conn.execute("SELECT COUNT(*) FROM reducciones").fetchone()[0]
+        exceso = total - self.max_entradas
+        if exceso > 0:
+            self._conn.execute(
+                "DELETE FROM reducciones WHERE clave IN ("
+                " SELECT clave FROM reducciones ORDER BY accedido LIMIT ?)",
+                (exceso,)
+            )
+
+    def limpiar(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM reducciones")
+
+
+_cache_default = None
+_cache_lock = threading.Lock()
+
+
+def cache_por_defecto():
+    """Instancia compartida del caché en CACHE_PATH."""
+    global _cache_default
+    with _cache_lock:
+        if _cache_default is None:
+            _cache_default = CacheReducciones()
+        return _cache_default
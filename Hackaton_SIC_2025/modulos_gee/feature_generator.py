@@ -7,6 +7,8 @@ pd.set_option('future.no_silent_downcasting', True)
 from datetime import date, timedelta, datetime
 # Importación absoluta basada en la raíz del proyecto
 from Hackaton_SIC_2025.modulos_gee.modulos_gee import Solicitud, DataFetcher
+from Hackaton_SIC_2025.modulos_gee.fetch_concurrente import MotorConcurrente
+from Proyecto_final_SIC_2025.Models.features import build_features, FEATURE_COLS
 
 def feature_generator(coords, target_date=None):
     """
@@ -20,7 +22,9 @@ def feature_generator(coords, target_date=None):
     else:
         date_obj = date.fromisoformat(target_date)
         
-    prev_date_obj = date_obj - timedelta(days=1)
+    # Días previos necesarios para los lags (hoy solo lag1)
+    dias_lag = 1
+    prev_date_obj = date_obj - timedelta(days=dias_lag)
     
     # Variables a pedir a GEE
     vars_list = [
@@ -28,18 +32,18 @@ def feature_generator(coords, target_date=None):
         'presion', 'temperatura', 'precipitacion', 'direccion viento', 'velocidad viento'
     ]
 
-    # 2. Obtener datos del día objetivo (Target) y día previo (para Lag1)
-    # Solicitud Día Objetivo
-    solicitud_target = Solicitud(coords)
-    detalles_target = solicitud_target.hacer_solicitud(vars_list, fecha=date_obj)
-    fetcher_target = DataFetcher(detalles_target)
-    df_target = fetcher_target.to_dataframe()
+    # 2. Obtener día objetivo (Target) y días previos (para Lag1) en un solo viaje a GEE;
+    # de los días previos solo se usa la radiación
+    solicitud = Solicitud(coords)
+    dias_previos = {prev_date_obj + timedelta(days=i): ['radiacion solar'] for i in range(dias_lag)}
+    detalles = solicitud.hacer_solicitud_rango(vars_list, prev_date_obj, date_obj,
+                                               variables_por_fecha=dias_previos)
+    fetcher = DataFetcher(detalles)
+    df_rango = fetcher.to_dataframe_rango()
 
-    # Solicitud Día Previo
-    solicitud_prev = Solicitud(coords)
-    detalles_prev = solicitud_prev.hacer_solicitud(['radiacion solar'], fecha=prev_date_obj)
-    fetcher_prev = DataFetcher(detalles_prev)
-    df_prev = fetcher_prev.to_dataframe()
+    # La última fila es el día objetivo; las anteriores son los días previos
+    df_target = df_rango.iloc[[-1]].reset_index(drop=True)
+    df_prev = df_rango.iloc[[-1 - dias_lag]].reset_index(drop=True)
     
     # 3. Mapeo de columnas base
     column_map = {
@@ -59,60 +63,27 @@ def feature_generator(coords, target_date=None):
     
     # Extraer el Lag1 del dataframe previo
     lag1_val = df_prev['radiacion solar'].iloc[0] if 'radiacion solar' in df_prev.columns else 0
-    df_target['surface_net_solar_radiation_sum_lag1'] = lag1_val
 
-    # 4. INGENIERÍA DE CARACTERÍSTICAS
+    # 4. INGENIERÍA DE CARACTERÍSTICAS (módulo compartido con el entrenamiento)
+    # Nulos e infinitos se reemplazan por 0
+    X = build_features(df_target, lag1=np.array([lag1_val], dtype=np.float64), date_col='fecha', fill_value=0, live=True)
+    df_final = pd.DataFrame(X, columns=FEATURE_COLS)
     
-    # A. Transformaciones Geográficas
-    df_target["lat_rad"] = np.radians(df_target["lat"])
-    df_target["lon_rad"] = np.radians(df_target["lon"])
-    df_target["sin_lat"] = np.sin(df_target["lat_rad"])
-    df_target["cos_lat"] = np.cos(df_target["lat_rad"])
-    df_target["sin_lon"] = np.sin(df_target["lon_rad"])
-    df_target["cos_lon"] = np.cos(df_target["lon_rad"])
+    return df_final, real_value
 
-    # B. Transformaciones Temporales
-    dt = pd.to_datetime(df_target['fecha'])
-    dayofyear = dt.dt.dayofyear
-    df_target["dayofyear_norm"] = dayofyear / 365.0
-    df_target["sin_doy"] = np.sin(2 * np.pi * dayofyear / 365.0)
-    df_target["cos_doy"] = np.cos(2 * np.pi * dayofyear / 365.0)
 
-    # C. Variables Derivadas (AQUÍ ESTABA EL ERROR)
-    df_target["temp_humidity_index"] = (
-        df_target["temperature_2m_C"] * (df_target["relative_humidity"] / 100.0)
-    )
-    
-    pressure_safe = df_target["surface_pressure"].replace(0, 1.0)
-    df_target["cloud_pressure_ratio"] = (
-        df_target["Cloud_Cover_Mean_24h"] / pressure_safe
-    )
-
-    # 5. Seleccionar y ordenar columnas finales
-    final_cols = [
-        "Cloud_Cover_Mean_24h",
-        "relative_humidity",
-        "temperature_2m_C",
-        "total_precipitation_sum",
-        "surface_pressure",
-        "elevation",
-        "sin_lat",
-        "cos_lat",
-        "sin_lon",
-        "cos_lon",
-        "sin_doy",
-        "cos_doy",
-        "dayofyear_norm",
-        "surface_net_solar_radiation_sum_lag1",
-        "temp_humidity_index",
-        "cloud_pressure_ratio"
-    ]
-    
-    df_final = df_target[final_cols].copy()
-    
-    # Reemplazar infinitos por 0 
-    df_final.replace([np.inf, -np.inf], 0, inplace=True)
-    # Reemplazar nulos por 0
-    df_final.fillna(0, inplace=True)
-    
-    return df_final, real_value
\ No newline at end of file
+def feature_generator_batch(coords_list, target_date=None, motor=None, cancelado=None):
+    """
+    Genera las features de muchas coordenadas en paralelo (MotorConcurrente).
+    Generador de (coords, (df_features, real_value), error) en orden de finalización.
+    cancelado(coords) -> bool (opcional): esas coordenadas no se consultan.
+    """
+    propio = motor is None
+    if propio:
+        motor = MotorConcurrente()
+    try:
+        yield from motor.mapear(lambda coords: feature_generator(coords, target_date), coords_list,
+                                cancelado=cancelado)
+    finally:
+        if propio:
+            motor.close()
@@ -0,0 +1,134 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError, wait, FIRST_COMPLETED
+
+from Hackaton_SIC_2025.modulos_gee.modulos_gee import Solicitud, DataFetcher
+
+# Fragmentos de los mensajes de error de GEE que indican límite de cuota/concurrencia
+ERRORES_CUOTA = (
+    'too many concurrent',
+    'quota',
+    'rate limit',
+    'too many requests',
+    '429',
+)
+# 'user memory limit' y 'computation timed out' no son transitorios: la misma
+# consulta vuelve a fallar, así que no se reintentan.
+
+
+def es_error_cuota(error):
+    """True si el error de GEE es transitorio (cuota/concurrencia) y vale la pena reintentar."""
+    mensaje = str(error).lower()
+    return any(fragmento in mensaje for fragmento in ERRORES_CUOTA)
+
+
+class LimitadorRitmo:
+    """Limita el número de solicitudes iniciadas por segundo (compartido entre hilos)."""
+
+    def __init__(self, max_por_segundo):
+        self.intervalo = 1.0 / max_por_segundo if max_por_segundo else 0.0
+        self._siguiente = 0.0
+        self._lock = threading.Lock()
+
+    def esperar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente)
+            self._siguiente = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+
+class MotorConcurrente:
+    """
+    Motor de consultas concurrentes a GEE para muchas coordenadas.
+    Mantiene `max_en_vuelo` solicitudes activas, respeta `max_por_segundo`,
+    reintenta con backoff exponencial los errores de cuota y entrega los
+    resultados a medida que terminan (no en el orden de entrada).
+    Los items cancelados (ver mapear) no se envían ni se reintentan.
+    """
+
+    def __init__(self, max_en_vuelo=8, max_por_segundo=10.0, reintentos=4, espera_base=1.0):
+        self.max_en_vuelo = max_en_vuelo
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.limitador = LimitadorRitmo(max_por_segundo)
+        self._executor = ThreadPoolExecutor(max_workers=max_en_vuelo, thread_name_prefix="gee")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _ejecutar(self, funcion, item, cancelado=None):
+        intento = 0
+        while True:
+            self.limitador.esperar()
+            # Una consulta en curso no se puede interrumpir; la siguiente sí se evita
+            if cancelado is not None and cancelado(item):
+                raise CancelledError("cancelado")
+            try:
+                return funcion(item)
+            except Exception as e:
+                if intento >= self.reintentos or not es_error_cuota(e):
+                    raise
+                # Backoff exponencial con jitter para no sincronizar los reintentos
+                espera = self.espera_base * (2 ** intento) * (1 + random.random())
+                time.sleep(espera)
+                intento += 1
+
+    def mapear(self, funcion, items, cancelado=None):
+        """
+        Aplica funcion(item) a cada item en paralelo. Generador de tuplas
+        (item, resultado, error) en orden de finalización; error es None si
+        todo salió bien. cancelado(item) -> bool (opcional): los items
+        cancelados no se envían a GEE y salen con error CancelledError.
+        """
+        items = iter(items)
+        en_vuelo = {}
+        saltados = []
+
+        def enviar():
+            for item in items:
+                if cancelado is not None and cancelado(item):
+                    saltados.append(item)
+                    continue
+                futuro = self._executor.submit(self._ejecutar, funcion, item, cancelado)
+                en_vuelo[futuro] = item
+                if len(en_vuelo) >= 2 * self.max_en_vuelo:
+                    break
+
+        enviar()
+        try:
+            while True:
+                while saltados:
+                    yield saltados.pop(), None, CancelledError("cancelado")
+                if not en_vuelo:
+                    break
+                listos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    item = en_vuelo.pop(futuro)
+                    error = futuro.exception()
+                    yield item, (None if error else futuro.result()), error
+                enviar()
+        finally:
+            for futuro in en_vuelo:
+                futuro.cancel()
+
+    def fetch(self, coords_list, variables, fecha=None, backend=None):
+        """
+        Versión concurrente de DataFetcher.fetch() para una lista de coordenadas
+        [lon, lat]. Generador de (coords, resultados, error).
+        """
+        def obtener(coords):
+            detalles = Solicitud(coords).hacer_solicitud(variables, fecha=fecha)
+            return DataFetcher(detalles, include_meta=False, backend=backend).fetch()
+
+        return self.mapear(obtener, coords_list)
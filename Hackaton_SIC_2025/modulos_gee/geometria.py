@@ -0,0 +1,99 @@
+import numpy as np
+
+
+def _area_centroide_anillo(anillo):
+    """Área con signo y centroide de un anillo (fórmula del polígono / shoelace)."""
+    pts = np.asarray(anillo, dtype=float)[:, :2]
+    x, y = pts[:, 0], pts[:, 1]
+    x1, y1 = np.roll(x, -1), np.roll(y, -1)
+    cruz = x * y1 - x1 * y
+    area = cruz.sum() / 2.0
+    if area == 0:
+        return 0.0, float(x.mean()), float(y.mean())
+    cx = ((x + x1) * cruz).sum() / (6.0 * area)
+    cy = ((y + y1) * cruz).sum() / (6.0 * area)
+    return area, cx, cy
+
+
+def _poligonos(geom):
+    if geom['type'] == 'Polygon':
+        return [geom['coordinates']]
+    if geom['type'] == 'MultiPolygon':
+        return geom['coordinates']
+    return []
+
+
+def centroide_geometria(geom):
+    """
+    Centroide ponderado por área (lon, lat) de un Polygon/MultiPolygon GeoJSON.
+    Considera todas las partes (islas) y resta los huecos.
+    """
+    area_total = 0.0
+    sx = sy = 0.0
+    for poligono in _poligonos(geom):
+        for k, anillo in enumerate(poligono):
+            area, cx, cy = _area_centroide_anillo(anillo)
+            # Exterior suma, huecos restan, sin importar la orientación del anillo
+            area = abs(area) if k == 0 else -abs(area)
+            area_total += area
+            sx += cx * area
+            sy += cy * area
+
+    if area_total == 0:
+        pts = np.concatenate([np.asarray(p[0], dtype=float)[:, :2] for p in _poligonos(geom)])
+        return float(pts[:, 0].mean()), float(pts[:, 1].mean())
+    return sx / area_total, sy / area_total
+
+
+def bbox_geometria(geom):
+    """Caja envolvente (min_lon, min_lat, max_lon, max_lat) de un Polygon/MultiPolygon."""
+    pts = np.concatenate([np.asarray(p[0], dtype=float)[:, :2] for p in _poligonos(geom)])
+    min_lon, min_lat = pts.min(axis=0)
+    max_lon, max_lat = pts.max(axis=0)
+    return float(min_lon), float(min_lat), float(max_lon), float(max_lat)
+
+
+def _contiene(poligono, x, y):
+    """True si (x, y) está dentro del polígono (exterior menos huecos), por ray casting."""
+    dentro = False
+    for anillo in poligono:
+        pts = np.asarray(anillo, dtype=float)[:, :2]
+        x0, y0 = pts[:, 0], pts[:, 1]
+        x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+        cruza = (y0 > y) != (y1 > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xc = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+        # Cada anillo (exterior o hueco) invierte la paridad
+        dentro ^= bool(np.count_nonzero(cruza & (x < xc)) % 2)
+    return dentro
+
+
+def punto_interior_geometria(geom):
+    """
+    Punto (lon, lat) dentro de un Polygon/MultiPolygon, lo más cerca posible
+    del centroide: el centroide si cae dentro; si no (islas, formas en C),
+    el centro del tramo más ancho de la horizontal que pasa por el centroide
+    de la parte más grande.
+    """
+    lon, lat = centroide_geometria(geom)
+    poligonos = _poligonos(geom)
+    if any(_contiene(p, lon, lat) for p in poligonos):
+        return lon, lat
+
+    principal = max(poligonos, key=lambda p: abs(_area_centroide_anillo(p[0])[0]))
+    _, cx, cy = _area_centroide_anillo(principal[0])
+    # Cortes de la horizontal y = cy con todos los anillos de la parte
+    cortes = []
+    for anillo in principal:
+        pts = np.asarray(anillo, dtype=float)[:, :2]
+        x0, y0 = pts[:, 0], pts[:, 1]
+        x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+        cruza = (y0 > cy) != (y1 > cy)
+        cortes.append(x0[cruza] + (cy - y0[cruza]) * (x1[cruza] - x0[cruza]) / (y1[cruza] - y0[cruza]))
+    cortes = np.sort(np.concatenate(cortes))
+    if len(cortes) < 2:
+        return cx, cy
+    # Los tramos (cortes[0], cortes[1]), (cortes[2], cortes[3])... quedan dentro
+    anchos = cortes[1::2] - cortes[0:len(cortes) - 1:2]
+    k = int(np.argmax(anchos))
+    return float((cortes[2 * k] + cortes[2 * k + 1]) / 2.0), float(cy)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import time
+
+from Hackaton_SIC_2025.modulos_gee.geometria import (
+    centroide_geometria, bbox_geometria, punto_interior_geometria, _poligonos
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GEOJSON_PATH = os.path.join(os.path.dirname(BASE_DIR), "Panama_Boundaries.geojson")
+VERSION_INDICE = 1
+
+
+def ruta_indice(geojson_path=GEOJSON_PATH):
+    """El índice vive junto al GeoJSON: <nombre>.index.json."""
+    base, _ = os.path.splitext(geojson_path)
+    return base + ".index.json"
+
+
+def hash_archivo(path):
+    """sha256 del archivo de límites (invalida el índice si cambia)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+def _firma(path):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def construir_indice(geojson_path=GEOJSON_PATH):
+    """
+    Índice Provincia -> Corregimiento con el ID_CORR, el distrito, el
+    centroide ponderado por área (todas las partes, sin huecos), un punto
+    interior (para consultar GEE sobre tierra aunque el centroide de un
+    grupo de islas caiga en el mar) y la caja envolvente. Las features con
+    el mismo ID_CORR se unen; los nombres repetidos dentro de una provincia
+    se distinguen con el distrito (y el ID si hace falta).
+    """
+    with open(geojson_path, 'r', encoding='utf-8') as f:
+        geojson = json.load(f)
+
+    partes, props_por_id = {}, {}
+    for feature in geojson['features']:
+        geom = feature['geometry']
+        if geom is None or geom['type'] not in ('Polygon', 'MultiPolygon'):
+            continue
+        id_corr = str(feature['properties'].get('ID_CORR'))
+        partes.setdefault(id_corr, []).extend(_poligonos(geom))
+        props_por_id.setdefault(id_corr, feature['properties'])
+
+    registros = []
+    for id_corr, poligonos in partes.items():
+        props = props_por_id[id_corr]
+        geom = {'type': 'MultiPolygon', 'coordinates': poligonos}
+        registros.append({
+            'provincia': props.get('Provincia', 'Desconocido'),
+            'distrito': props.get('Distrito', 'Desconocido'),
+            'nombre': props.get('Corregimiento', 'Desconocido'),
+            'id': id_corr,
+            'centroide': [round(v, 6) for v in centroide_geometria(geom)],
+            'punto': [round(v, 6) for v in punto_interior_geometria(geom)],
+            'bbox': [round(v, 6) for v in bbox_geometria(geom)],
+        })
+
+    def contar(claves):
+        conteo = {}
+        for clave in claves:
+            conteo[clave] = conteo.get(clave, 0) + 1
+        return conteo
+
+    por_nombre = contar((r['provincia'], r['nombre']) for r in registros)
+    por_distrito = contar((r['provincia'], r['distrito'], r['nombre']) for r in registros)
+
+    provincias = {}
+    for r in sorted(registros, key=lambda r: (r['provincia'], r['nombre'], r['distrito'], r['id'])):
+        provincia, nombre = r.pop('provincia'), r.pop('nombre')
+        if por_nombre[(provincia, nombre)] > 1:
+            if por_distrito[(provincia, r['distrito'], nombre)] > 1:
+                nombre = f"{nombre} ({r['distrito']}, {r['id']})"
+            else:
+                nombre = f"{nombre} ({r['distrito']})"
+        provincias.setdefault(provincia, {})[nombre] = r
+
+    return {'version': VERSION_INDICE, 'provincias': provincias}
+
+
+def guardar_indice(indice, geojson_path=GEOJSON_PATH, path=None):
+    path = path or ruta_indice(geojson_path)
+    indice = {**indice, 'fuente': {'sha256': hash_archivo(geojson_path), **_firma(geojson_path)}}
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(indice, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"No se pudo guardar el índice de corregimientos: {e}")
+    return indice
+
+
+def cargar_indice(geojson_path=GEOJSON_PATH, path=None):
+    """
+    Índice de corregimientos, reconstruido solo si cambió el GeoJSON. Si el
+    tamaño y la fecha de modificación coinciden no se vuelve a leer el
+    GeoJSON; si no, se compara el sha256 antes de reconstruir.
+    """
+    path = path or ruta_indice(geojson_path)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            indice = json.load(f)
+        fuente = indice.get('fuente', {})
+        if indice.get('version') == VERSION_INDICE:
+            firma = _firma(geojson_path)
+            if all(fuente.get(k) == v for k, v in firma.items()):
+                return indice
+            if fuente.get('sha256') == hash_archivo(geojson_path):
+                # Mismo contenido (p. ej. tras un checkout): se actualiza la firma
+                return guardar_indice(indice, geojson_path, path)
+    except (OSError, ValueError):
+        pass
+
+    print("Construyendo índice de corregimientos...")
+    return guardar_indice(construir_indice(geojson_path), geojson_path, path)
+
+
+if __name__ == "__main__":
+    inicio = time.perf_counter()
+    indice = guardar_indice(construir_indice())
+    n = sum(len(v) for v in indice['provincias'].values())
+    print(f"{n} corregimientos en {ruta_indice()} ({time.perf_counter() - inicio:.2f} s)")
@@ -1,16 +1,12 @@
-import ee
 import pandas as pd
 from datetime import date, timedelta
 import math
-import os
-
-# --- Manejo Dinámico de Rutas ---
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-service_account = 'kointrol-team@kointrol-ai.iam.gserviceaccount.com'
-key_file = os.path.join(BASE_DIR, "kointrol-ai-218d7c03278d.json")
-
-credentials = ee.ServiceAccountCredentials(service_account, key_file)
-ee.Initialize(credentials)
+from Hackaton_SIC_2025.modulos_gee.cache_gee import cache_por_defecto
+# La conexión con GEE vive en backends.py (se inicializa al primer uso)
+from Hackaton_SIC_2025.modulos_gee.backends import (
+    backend_por_defecto,
+    BUFFER_DINAMICO, ESCALA_DINAMICA, BUFFER_ESTATICO, ESCALA_ESTATICA
+)
 
 class Solicitud:
     def __init__(self, coords):
@@ -77,24 +73,68 @@ class Solicitud:
             
         selected = {var: self.registro_variables[var]
                     for var in variables if var in self.registro_variables}
+        # Solo datos del lado cliente: el backend construye la consulta
         detalles_solicitud = {
-            'punto': ee.Geometry.Point(self.coords),
-            'fecha_inicio': ee.Date(fecha.isoformat()),
-            'fecha_final': ee.Date(fecha.isoformat()).advance(1, 'day'),
+            'coords': list(self.coords),
+            'fecha': fecha.isoformat(),
+            'fechas': [fecha.isoformat()],
             'variables': selected
         }
         return detalles_solicitud
 
+    def hacer_solicitud_rango(self, variables, fecha_inicio, fecha_final, variables_por_fecha=None):
+        """
+        Solicitud para todos los días entre fecha_inicio y fecha_final (ambos
+        incluidos). Se resuelve con DataFetcher.fetch_rango / to_dataframe_rango.
+        variables_por_fecha (opcional): {fecha: [variables]} para pedir solo
+        un subconjunto en esas fechas (p. ej. el día previo solo para el lag);
+        las demás fechas piden todas las variables.
+        """
+        if isinstance(fecha_inicio, str):
+            fecha_inicio = date.fromisoformat(fecha_inicio)
+        if isinstance(fecha_final, str):
+            fecha_final = date.fromisoformat(fecha_final)
+        if fecha_final < fecha_inicio:
+            raise ValueError("fecha_final debe ser posterior o igual a fecha_inicio.")
+
+        n_dias = (fecha_final - fecha_inicio).days + 1
+        fechas = [(fecha_inicio + timedelta(days=i)).isoformat() for i in range(n_dias)]
+
+        detalles_solicitud = self.hacer_solicitud(variables, fecha=fecha_inicio)
+        detalles_solicitud['fechas'] = fechas
+        if variables_por_fecha:
+            detalles_solicitud['variables_por_fecha'] = {
+                (f if isinstance(f, str) else f.isoformat()):
+                    [v for v in vars_fecha if v in detalles_solicitud['variables']]
+                for f, vars_fecha in variables_por_fecha.items()
+            }
+        return detalles_solicitud
+
 
 class DataFetcher:
-    def __init__(self, solicitud, include_meta=True):
+    def __init__(self, solicitud, include_meta=True, batch=True, cache=True, backend=None):
         self.solicitud = solicitud
         self.include_meta = include_meta
+        # batch=True: todas las variables se resuelven en una sola llamada al backend
+        self.batch = batch
+        # Backend de datos: GEE en vivo o local (ver backends.py)
+        self.backend = backend or backend_por_defecto()
+        # cache=True usa el caché compartido en disco; False/None lo desactiva.
+        # Los backends no cacheables (local, con respaldo) nunca escriben en él.
+        if not getattr(self.backend, 'cacheable', True):
+            cache = None
+        self.cache = cache_por_defecto() if cache is True else (cache or None)
 
     def fetch(self):
-        punto = self.solicitud['punto']
-        f1 = self.solicitud['fecha_inicio']
-        f2 = self.solicitud['fecha_final']
+        if self.batch:
+            return self.fetch_batch()
+
+        # Una llamada al backend por variable, con la ventana completa de la solicitud
+        coords = self.solicitud['coords']
+        fechas = self.solicitud['fechas']
+        inicio = fechas[0]
+        fin = (date.fromisoformat(fechas[-1]) + timedelta(days=1)).isoformat()
+        ventana = fechas[0] if len(fechas) == 1 else f"{fechas[0]}/{fechas[-1]}"
 
         results = {}
         for var_name, meta in self.solicitud['variables'].items():
@@ -103,45 +143,156 @@ class DataFetcher:
             vtype = meta['type']
 
             if vtype == 'daily' or vtype == 'hourly':
-                raw_data = self.get_reduced_value(dataset, bands, f1, f2, punto)
+                peticion = {'dataset': dataset, 'bands': bands, 'type': vtype,
+                            'inicio': inicio, 'fin': fin}
+                stats = self._con_cache(
+                    dataset, bands, vtype, ventana,
+                    lambda: self.backend.reducir(coords, {'v': peticion})['v']
+                )
             elif vtype == 'static':
-                raw_data = self.get_static_reduced(dataset, bands, punto)
+                peticion = {'dataset': dataset, 'bands': bands, 'type': vtype,
+                            'inicio': None, 'fin': None}
+                stats = self._con_cache(
+                    dataset, bands, vtype, None,
+                    lambda: self.backend.reducir(coords, {'v': peticion})['v']
+                )
             else:
-                raw_data = 0.0
+                stats = {}
 
-            results[var_name] = self.process_variable_logic(var_name, bands, raw_data)
+            results[var_name] = self._procesar_variable(var_name, meta, stats)
             
         return results
 
-    def get_reduced_value(self, dataset, bands, f1, f2, punto):
-        coll = ee.ImageCollection(dataset).filterDate(f1, f2).select(bands)
-        
-        if coll.size().getInfo() == 0:
-            return {b: 0.0 for b in bands}
-            
-        img = coll.mean()
-        
-        # --- SOLUCIÓN CRÍTICA: BUFFER ---
-        # Creamos un radio de búsqueda de 5km (5000m) alrededor del punto.
-        # Esto permite capturar datos de tierra incluso si el click fue en el mar cercano.
-        geometry_buffer = punto.buffer(25000)
-
-        stats = img.reduceRegion(
-            reducer=ee.Reducer.mean(),
-            geometry=geometry_buffer, # Usamos el área circular, no el punto
-            scale=10000 
-        ).getInfo()
-        
-        return stats if stats else {b: 0.0 for b in bands}
+    def fetch_batch(self):
+        """
+        Resuelve todas las variables de la solicitud en una sola llamada al backend.
+        Con GEE, las bandas de un mismo dataset/ventana se apilan en una sola
+        imagen, se reducen una vez y el diccionario completo se evalúa con un getInfo().
+        """
+        return self._fetch_fechas([self.solicitud['fecha']])[0]
+
+    def fetch_rango(self):
+        """
+        Igual que fetch_batch pero para todas las fechas de la solicitud
+        (ver Solicitud.hacer_solicitud_rango). Devuelve una lista de
+        resultados, uno por fecha, obtenidos con una sola llamada al backend.
+        """
+        return self._fetch_fechas(self.solicitud['fechas'])
+
+    def _variables_fecha(self, fecha):
+        """Variables pedidas para una fecha (ver Solicitud.hacer_solicitud_rango)."""
+        variables = self.solicitud['variables']
+        nombres = (self.solicitud.get('variables_por_fecha') or {}).get(fecha)
+        if nombres is None:
+            return variables
+        return {v: meta for v, meta in variables.items() if v in nombres}
 
-    def get_static_reduced(self, dataset, bands, punto):
-        img = ee.Image(dataset).select(bands)
-        stats = img.reduceRegion(
-            reducer=ee.Reducer.first(),
-            geometry=punto.buffer(100), # Pequeño buffer para elevación también
-            scale=30
-        ).getInfo()
-        return stats if stats else {bands[0]: 0.0}
+    def _fetch_fechas(self, fechas):
+        coords = self.solicitud['coords']
+        grupos = self._agrupar_bandas()
+        bandas_fecha = {fecha: self._agrupar_bandas(self._variables_fecha(fecha)) for fecha in fechas}
+
+        # Una entrada por (grupo, fecha) con solo las bandas pedidas ese día; las
+        # estáticas una sola vez para todo el rango. Lo que ya está en caché no
+        # viaja al backend.
+        crudos = {}
+        pendientes = {}
+        claves = {}
+        for i, ((dataset, vtype), todas) in enumerate(grupos.items()):
+            if vtype == 'static':
+                entradas = [(f'g{i}', None, todas)]
+            elif vtype == 'daily' or vtype == 'hourly':
+                entradas = [(f'g{i}_d{j}', fecha, bandas_fecha[fecha].get((dataset, vtype)))
+                            for j, fecha in enumerate(fechas)]
+            else:
+                continue
+            for nombre, fecha, bands in entradas:
+                if not bands:
+                    continue
+                clave = self._clave_cache(dataset, bands, vtype, fecha)
+                cacheado = self.cache.get(clave) if clave else None
+                if cacheado is None and clave and bands != todas:
+                    # Una reducción con todas las bandas del grupo también sirve
+                    cacheado = self.cache.get(self._clave_cache(dataset, todas, vtype, fecha))
+                if cacheado is not None:
+                    crudos[nombre] = cacheado
+                    continue
+                fin = (date.fromisoformat(fecha) + timedelta(days=1)).isoformat() if fecha else None
+                pendientes[nombre] = {'dataset': dataset, 'bands': bands, 'type': vtype,
+                                      'inicio': fecha, 'fin': fin}
+                claves[nombre] = clave
+
+        if pendientes:
+            nuevos = self.backend.reducir(coords, pendientes)
+            for nombre, peticion in pendientes.items():
+                crudos[nombre] = nuevos.get(nombre) or {}
+                if claves[nombre]:
+                    self.cache.put(claves[nombre], peticion['type'], crudos[nombre], peticion['bands'])
+
+        resultados = []
+        for j, fecha in enumerate(fechas):
+            stats_grupo = {}
+            for i, key in enumerate(grupos):
+                clave = f'g{i}' if key[1] == 'static' else f'g{i}_d{j}'
+                stats_grupo[key] = crudos.get(clave) or {}
+            resultados.append(self._procesar_grupos(stats_grupo, self._variables_fecha(fecha)))
+        return resultados
+
+    def _clave_cache(self, dataset, bands, vtype, fecha):
+        """Clave del caché para una reducción (None si el caché está desactivado)."""
+        if self.cache is None:
+            return None
+        coords = self.solicitud['coords']
+        if vtype == 'static':
+            return self.cache.clave(dataset, bands, None, coords, BUFFER_ESTATICO, ESCALA_ESTATICA)
+        return self.cache.clave(dataset, bands, fecha, coords, BUFFER_DINAMICO, ESCALA_DINAMICA)
+
+    def _con_cache(self, dataset, bands, vtype, fecha, obtener):
+        """Devuelve la reducción desde el caché o la calcula con obtener()."""
+        clave = self._clave_cache(dataset, bands, vtype, fecha)
+        if clave:
+            stats = self.cache.get(clave)
+            if stats is not None:
+                return stats
+        stats = obtener()
+        if clave:
+            self.cache.put(clave, vtype, stats, bands)
+        return stats
+
+    def _procesar_grupos(self, stats_grupo, variables=None):
+        """Reparte las bandas reducidas por grupo entre las variables pedidas."""
+        results = {}
+        if variables is None:
+            variables = self.solicitud['variables']
+        for var_name, meta in variables.items():
+            stats = stats_grupo.get((meta['dataset'], meta['type']), {})
+            results[var_name] = self._procesar_variable(var_name, meta, stats)
+        return results
+
+    def _procesar_variable(self, var_name, meta, stats):
+        bands = meta['bands']
+        vtype = meta['type']
+        # Reducción vacía: 0.0 por banda (o solo la primera en estáticas)
+        raw_data = {b: stats[b] for b in bands if b in stats}
+        if vtype == 'daily' or vtype == 'hourly':
+            raw_data = raw_data or {b: 0.0 for b in bands}
+        elif vtype == 'static':
+            raw_data = raw_data or {bands[0]: 0.0}
+        else:
+            raw_data = 0.0
+        return self.process_variable_logic(var_name, bands, raw_data)
+
+    def _agrupar_bandas(self, variables=None):
+        """Agrupa las bandas pedidas por (dataset, tipo), sin duplicados."""
+        if variables is None:
+            variables = self.solicitud['variables']
+        grupos = {}
+        for meta in variables.values():
+            bands = grupos.setdefault((meta['dataset'], meta['type']), [])
+            for b in meta['bands']:
+                if b not in bands:
+                    bands.append(b)
+        return grupos
 
     def process_variable_logic(self, var_name, bands, muestra):
         if not muestra: return 0.0
@@ -176,10 +327,20 @@ class DataFetcher:
     def to_dataframe(self):
         results = self.fetch()
         if self.include_meta:
-            punto = self.solicitud['punto']
-            f1 = self.solicitud['fecha_inicio']
-            lon, lat = punto['coordinates']
-            results['fecha'] = f1.format('YYYY-MM-dd').getInfo()
+            # Metadatos del lado cliente: evita un getInfo() extra por la fecha
+            lon, lat = self.solicitud['coords']
+            results['fecha'] = self.solicitud['fecha']
             results['lat'] = lat
             results['lon'] = lon
-        return pd.DataFrame([results])
\ No newline at end of file
+        return pd.DataFrame([results])
+
+    def to_dataframe_rango(self):
+        """Tabla con una fila por fecha de la solicitud (un solo getInfo)."""
+        filas = self.fetch_rango()
+        if self.include_meta:
+            lon, lat = self.solicitud['coords']
+            for fecha, fila in zip(self.solicitud['fechas'], filas):
+                fila['fecha'] = fecha
+                fila['lat'] = lat
+                fila['lon'] = lon
+        return pd.DataFrame(filas)
\ No newline at end of file
@@ -0,0 +1,160 @@
+import ee
+import json
+import os
+import pandas as pd
+from datetime import date, timedelta
+
+from Hackaton_SIC_2025.modulos_gee.modulos_gee import (
+    Solicitud, DataFetcher,
+    BUFFER_DINAMICO, ESCALA_DINAMICA, BUFFER_ESTATICO, ESCALA_ESTATICA
+)
+from Hackaton_SIC_2025.modulos_gee.geometria import centroide_geometria
+from Hackaton_SIC_2025.modulos_gee.backends import inicializar_ee
+
+# --- Manejo Dinámico de Rutas ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GEOJSON_PATH = os.path.join(os.path.dirname(BASE_DIR), "Panama_Boundaries.geojson")
+
+
+class FetcherRegiones:
+    """
+    Modo masivo: sube todas las regiones (corregimientos) como una sola
+    ee.FeatureCollection y resuelve las variables con reduceRegions.
+    Hace un getInfo() por fecha, sin importar cuántas regiones o variables.
+
+    modo='centroides' reduce un buffer alrededor del centroide de cada región,
+    igual que DataFetcher con un punto. modo='poligonos' reduce el polígono
+    completo (payload más pesado; regiones menores que la escala de ERA5
+    pueden quedar sin píxeles y devolver 0).
+    """
+
+    def __init__(self, geojson_path=GEOJSON_PATH, id_col='ID_CORR', modo='centroides'):
+        if modo not in ('centroides', 'poligonos'):
+            raise ValueError("modo debe ser 'centroides' o 'poligonos'.")
+        self.id_col = id_col
+        self.modo = modo
+        # Modo masivo solo disponible con GEE en vivo
+        inicializar_ee()
+
+        with open(geojson_path, 'r', encoding='utf-8') as f:
+            geojson = json.load(f)
+
+        features = []
+        self.ids = []
+        for feature in geojson['features']:
+            geom = feature['geometry']
+            if geom is None or geom['type'] not in ('Polygon', 'MultiPolygon'):
+                continue
+            id_region = str(feature['properties'][id_col])
+            if modo == 'centroides':
+                geometria = ee.Geometry.Point(list(centroide_geometria(geom)))
+            else:
+                geometria = ee.Geometry(geom)
+            features.append(ee.Feature(geometria, {id_col: id_region}))
+            self.ids.append(id_region)
+
+        self.regiones = ee.FeatureCollection(features)
+
+    def _geometrias(self, buffer):
+        if self.modo == 'centroides':
+            return self.regiones.map(lambda f: f.buffer(buffer))
+        return self.regiones
+
+    def _reducir(self, img, bands, reducer, buffer, escala):
+        # Con una sola banda reduceRegions nombra la salida como el reductor
+        if len(bands) == 1:
+            reducer = reducer.setOutputs(bands)
+        reducidas = img.reduceRegions(
+            collection=self._geometrias(buffer),
+            reducer=reducer,
+            scale=escala
+        )
+        # Solo propiedades: no descargamos las geometrías de vuelta
+        return reducidas.select([self.id_col] + bands, None, False)
+
+    def _reducir_dinamico(self, dataset, bands, fecha):
+        f1 = ee.Date(fecha)
+        coll = ee.ImageCollection(dataset).filterDate(f1, f1.advance(1, 'day')).select(bands)
+        reducidas = self._reducir(coll.mean(), bands, ee.Reducer.mean(),
+                                  BUFFER_DINAMICO, ESCALA_DINAMICA)
+        # Día sin imágenes: regiones sin bandas (DataFetcher completa con 0)
+        vacias = self.regiones.select([self.id_col], None, False)
+        return ee.Algorithms.If(coll.size().eq(0), vacias, reducidas)
+
+    def _reducir_estatico(self, dataset, bands):
+        img = ee.Image(dataset).select(bands)
+        return self._reducir(img, bands, ee.Reducer.first(), BUFFER_ESTATICO, ESCALA_ESTATICA)
+
+    def _por_region(self, coleccion):
+        resultado = {}
+        for feature in (coleccion or {}).get('features', []):
+            props = dict(feature.get('properties', {}))
+            resultado[str(props.pop(self.id_col))] = props
+        return resultado
+
+    def fetch(self, variables, fecha_inicio=None, fecha_final=None):
+        """
+        DataFrame con una fila por (región, fecha) y una columna por variable,
+        con el mismo post-procesamiento que DataFetcher.
+        """
+        if fecha_inicio is None:
+            fecha_inicio = date.today() - timedelta(days=20)
+        if isinstance(fecha_inicio, str):
+            fecha_inicio = date.fromisoformat(fecha_inicio)
+        if fecha_final is None:
+            fecha_final = fecha_inicio
+        if isinstance(fecha_final, str):
+            fecha_final = date.fromisoformat(fecha_final)
+
+        n_dias = (fecha_final - fecha_inicio).days + 1
+        fechas = [(fecha_inicio + timedelta(days=i)).isoformat() for i in range(n_dias)]
+
+        registro = Solicitud(None).registro_variables
+        selected = {var: registro[var] for var in variables if var in registro}
+        procesador = DataFetcher({'variables': selected}, include_meta=False, cache=False)
+        grupos = procesador._agrupar_bandas()
+
+        estaticos = {}
+        filas = []
+        for fecha in fechas:
+            consulta = {}
+            for i, ((dataset, vtype), bands) in enumerate(grupos.items()):
+                if vtype == 'static':
+                    # Las estáticas se piden solo en la primera fecha
+                    if (dataset, vtype) not in estaticos:
+                        consulta[f'g{i}'] = self._reducir_estatico(dataset, bands)
+                elif vtype == 'daily' or vtype == 'hourly':
+                    consulta[f'g{i}'] = self._reducir_dinamico(dataset, bands, fecha)
+
+            crudos = ee.Dictionary(consulta).getInfo() if consulta else {}
+
+            por_grupo = {}
+            for i, key in enumerate(grupos):
+                if key[1] == 'static':
+                    if key not in estaticos:
+                        estaticos[key] = self._por_region(crudos.get(f'g{i}'))
+                    por_grupo[key] = estaticos[key]
+                else:
+                    por_grupo[key] = self._por_region(crudos.get(f'g{i}'))
+
+            for id_region in self.ids:
+                stats_grupo = {key: por_grupo[key].get(id_region, {}) for key in grupos}
+                fila = procesador._procesar_grupos(stats_grupo)
+                fila[self.id_col] = id_region
+                fila['fecha'] = fecha
+                filas.append(fila)
+
+        columnas = [self.id_col, 'fecha'] + list(selected)
+        return pd.DataFrame(filas, columns=columnas)
+
+
+if __name__ == "__main__":
+    # Actualización nacional: todas las variables, todos los corregimientos
+    vars_list = [
+        'nubosidad', 'elevacion', 'humedad relativa', 'radiacion solar',
+        'presion', 'temperatura', 'precipitacion', 'direccion viento', 'velocidad viento'
+    ]
+    fetcher = FetcherRegiones()
+    df = fetcher.fetch(vars_list)
+    df.to_csv("corregimientos_gee.csv", index=False)
+    print(f"{len(df)} filas guardadas en corregimientos_gee.csv")
@@ -0,0 +1,415 @@
+"""
+Servicio local de predicción: un proceso de larga duración que mantiene
+calientes el modelo, el pipeline de FEATURE_COLS y la sesión de GEE.
+
+    python Hackaton_SIC_2025/servicio_prediccion.py [--puerto 8766]
+
+Rutas (JSON):
+    GET  /salud                      -> estado del servicio
+    GET  /predict?lat=..&lon=..[&fecha=YYYY-MM-DD]
+    POST /predict        {"lat", "lon", "fecha"?}
+    POST /predict/batch  {"puntos": [{"lat", "lon", "fecha"?}, ...]}
+
+La interfaz de Tk y otras herramientas usan ClienteServicio.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+from collections import OrderedDict
+from concurrent.futures import Future, CancelledError
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from Hackaton_SIC_2025.modulos_gee.backends import ESCALA_ESTATICA, backend_por_defecto
+from Hackaton_SIC_2025.modulos_gee.cache_gee import redondear_coords
+from Hackaton_SIC_2025.modulos_gee.feature_generator import feature_generator_batch
+from Hackaton_SIC_2025.modulos_gee.fetch_concurrente import MotorConcurrente
+
+HOST = "127.0.0.1"
+PUERTO = int(os.environ.get("SOLAR_SERVICE_PORT", 8766))
+# Días de atraso de la fecha por defecto (ERA5 publica con retraso)
+DIAS_ATRASO = 20
+MAX_LOTE = 1000
+MAX_RESULTADOS = 4096
+
+
+def fecha_por_defecto():
+    return (date.today() - timedelta(days=DIAS_ATRASO)).isoformat()
+
+
+def clave_punto(lon, lat, fecha):
+    """Puntos en la misma celda de 30 m y la misma fecha tienen las mismas features."""
+    return (*redondear_coords(lon, lat, ESCALA_ESTATICA), fecha)
+
+
+def armar_resultado(lon, lat, fecha, pred_joules, real_value):
+    """Predicción en MJ/m2 y confianza contra el valor real de ERA5 (si existe)."""
+    if real_value > 0:
+        conf = max(0.0, 100 - abs(pred_joules - real_value) / real_value * 100)
+    else:
+        conf = 0.0
+    return {
+        "lat": lat,
+        "lon": lon,
+        "fecha": fecha,
+        "prediccion_mj": pred_joules / 1_000_000,
+        "real_mj": (real_value / 1_000_000) if real_value > 0 else 0.0,
+        "confianza": conf,
+    }
+
+
+class CacheLRU:
+    """Resultados recientes en memoria; descarta los menos usados (seguro entre hilos)."""
+
+    def __init__(self, max_entradas=MAX_RESULTADOS):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            if clave not in self._datos:
+                return None
+            self._datos.move_to_end(clave)
+            return self._datos[clave]
+
+    def put(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class ServicioPrediccion:
+    """
+    Predicción de radiación para puntos (lon, lat, fecha) con el modelo y GEE
+    ya cargados. Solicitudes iguales en curso se agrupan en una sola (el
+    segundo pedido espera el resultado del primero) y los resultados
+    recientes se guardan en un LRU. Un lote consulta GEE en paralelo
+    (feature_generator_batch) y hace un solo forward pass; un punto suelto
+    pasa por la cola de micro-batching del motor (InferenceEngine.submit).
+    """
+
+    def __init__(self, backend_modelo=None, max_resultados=MAX_RESULTADOS, max_en_vuelo=8):
+        self.backend_modelo = backend_modelo
+        self.cache = CacheLRU(max_resultados)
+        self.motor = MotorConcurrente(max_en_vuelo=max_en_vuelo)
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+        self.contadores = {"solicitudes": 0, "cache": 0, "agrupadas": 0, "calculadas": 0}
+
+    def precalentar(self):
+        """Prepara GEE y el modelo (se llama al arrancar el servicio)."""
+        from Proyecto_final_SIC_2025.Models.predict import warm_up
+
+        try:
+            backend_por_defecto().precalentar()
+        except Exception as e:
+            print(f"No se pudo preparar Earth Engine: {e}")
+        warm_up(self.backend_modelo)
+
+    def close(self):
+        self.motor.close()
+
+    def _reservar(self, claves):
+        """
+        Separa las claves en resueltas (LRU), en curso (Future de otro pedido)
+        y propias (Future nuevo que este pedido debe resolver).
+        """
+        listos, ajenos, propios = {}, {}, {}
+        with self._lock:
+            for clave in claves:
+                if clave in listos or clave in ajenos or clave in propios:
+                    continue
+                self.contadores["solicitudes"] += 1
+                resultado = self.cache.get(clave)
+                if resultado is not None:
+                    self.contadores["cache"] += 1
+                    listos[clave] = resultado
+                elif clave in self._en_curso:
+                    self.contadores["agrupadas"] += 1
+                    ajenos[clave] = self._en_curso[clave]
+                else:
+                    propios[clave] = self._en_curso[clave] = Future()
+        return listos, ajenos, propios
+
+    def _resolver(self, clave, futuro, resultado=None, error=None):
+        with self._lock:
+            self._en_curso.pop(clave, None)
+            if error is None:
+                self.cache.put(clave, resultado)
+                self.contadores["calculadas"] += 1
+        if error is None:
+            futuro.set_result(resultado)
+        else:
+            futuro.set_exception(error)
+
+    def predecir_lote(self, puntos, cancelados=None):
+        """
+        puntos: lista de (lon, lat, fecha o None). Devuelve una lista del mismo
+        largo con el resultado de cada punto o {"error": mensaje}.
+        cancelados (opcional): una función () -> bool por punto; los puntos
+        cancelados antes de consultar GEE no se consultan ni se reintentan.
+        """
+        from Proyecto_final_SIC_2025.Models.predict import FEATURE_COLS, get_engine
+
+        puntos = [(float(lon), float(lat), fecha or fecha_por_defecto()) for lon, lat, fecha in puntos]
+        claves = [clave_punto(*p) for p in puntos]
+        listos, ajenos, propios = self._reservar(claves)
+
+        # Una clave repetida en el lote solo se cancela si todos sus pedidos se cancelaron
+        checks = {}
+        for clave, check in zip(claves, cancelados or ()):
+            checks.setdefault(clave, []).append(check)
+
+        def cancelado(clave):
+            return clave in checks and all(check() for check in checks[clave])
+
+        if propios:
+            primero = {}
+            for clave, punto in zip(claves, puntos):
+                if clave in propios:
+                    primero.setdefault(clave, punto)
+            por_fecha = {}
+            for clave, (lon, lat, fecha) in primero.items():
+                por_fecha.setdefault(fecha, {})[(lon, lat)] = clave
+            features = {}
+            try:
+                # Features de todos los puntos de cada fecha en paralelo (MotorConcurrente)
+                for fecha, claves_fecha in por_fecha.items():
+                    coords_list = [[lon, lat] for lon, lat in claves_fecha]
+                    resultados_gee = feature_generator_batch(
+                        coords_list, fecha, motor=self.motor,
+                        cancelado=lambda coords, c=claves_fecha: cancelado(c[tuple(coords)])
+                    )
+                    for coords, datos, error in resultados_gee:
+                        clave = claves_fecha[tuple(coords)]
+                        if error is None:
+                            features[clave] = datos
+                        else:
+                            self._resolver(clave, propios[clave], error=error)
+
+                if features:
+                    orden = list(features)
+                    X = [features[c][0][FEATURE_COLS].values[0] for c in orden]
+                    engine = get_engine(self.backend_modelo)
+                    if len(X) == 1:
+                        # Pedidos de un punto de varios hilos comparten un forward pass
+                        # en la cola de micro-batching del motor
+                        y = [engine.predict_one(X[0])]
+                    else:
+                        y = engine.predict(X)
+                    for clave, pred in zip(orden, y):
+                        lon, lat, fecha = primero[clave]
+                        self._resolver(clave, propios[clave],
+                                       armar_resultado(lon, lat, fecha, float(pred), features[clave][1]))
+            except Exception as e:
+                for clave, futuro in propios.items():
+                    if not futuro.done():
+                        self._resolver(clave, futuro, error=e)
+
+        resultados = []
+        for (lon, lat, fecha), clave in zip(puntos, claves):
+            try:
+                r = listos[clave] if clave in listos else (propios.get(clave) or ajenos[clave]).result()
+                resultados.append({**r, "lat": lat, "lon": lon})
+            except CancelledError:
+                if clave in propios:
+                    resultados.append({"lat": lat, "lon": lon, "fecha": fecha, "error": "cancelado"})
+                else:
+                    # Lo canceló el otro pedido que lo estaba calculando: se vuelve a pedir
+                    resultados.append(self.predecir_lote([(lon, lat, fecha)])[0])
+            except Exception as e:
+                resultados.append({"lat": lat, "lon": lon, "fecha": fecha, "error": str(e)})
+        return resultados
+
+    def predecir(self, lon, lat, fecha=None):
+        """Predicción de un punto; lanza la excepción si falla."""
+        resultado = self.predecir_lote([(lon, lat, fecha)])[0]
+        if "error" in resultado:
+            raise RuntimeError(resultado["error"])
+        return resultado
+
+    def estado(self):
+        return {
+            "ok": True,
+            "uptime_s": round(time.time() - self.inicio, 1),
+            "resultados_en_cache": len(self.cache),
+            **self.contadores,
+        }
+
+
+# ============================================
+# HTTP
+# ============================================
+def _punto(datos):
+    return (float(datos["lon"]), float(datos["lat"]), datos.get("fecha"))
+
+
+def crear_manejador(servicio):
+    class Manejador(BaseHTTPRequestHandler):
+        # HTTP/1.1: los clientes reutilizan la conexión entre solicitudes
+        protocol_version = "HTTP/1.1"
+
+        def _responder(self, datos, estado=200):
+            cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+            self.send_response(estado)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def _leer_json(self):
+            largo = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(largo) or b"{}")
+
+        def _atender(self, ruta, obtener_datos):
+            try:
+                if ruta == "/salud":
+                    self._responder(servicio.estado())
+                elif ruta == "/predict":
+                    self._responder(servicio.predecir(*_punto(obtener_datos())))
+                elif ruta == "/predict/batch":
+                    puntos = [_punto(p) for p in obtener_datos()["puntos"]]
+                    if len(puntos) > MAX_LOTE:
+                        self._responder({"error": f"máximo {MAX_LOTE} puntos por lote"}, 413)
+                        return
+                    self._responder({"resultados": servicio.predecir_lote(puntos)})
+                else:
+                    self._responder({"error": "ruta no encontrada"}, 404)
+            except (KeyError, TypeError, ValueError) as e:
+                self._responder({"error": f"solicitud inválida: {e}"}, 400)
+            except Exception as e:
+                self._responder({"error": str(e)}, 500)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            self._atender(url.path, lambda: {k: v[0] for k, v in parse_qs(url.query).items()})
+
+        def do_POST(self):
+            self._atender(urlparse(self.path).path, self._leer_json)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Manejador
+
+
+def servir(host=HOST, puerto=PUERTO, servicio=None):
+    """Arranca el servicio (bloquea hasta Ctrl+C)."""
+    servicio = servicio or ServicioPrediccion()
+    print("Preparando modelo y Earth Engine...")
+    servicio.precalentar()
+    servidor = ThreadingHTTPServer((host, puerto), crear_manejador(servicio))
+    servidor.daemon_threads = True
+    print(f"Servicio de predicción en http://{host}:{servidor.server_address[1]}/ (Ctrl+C para terminar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servicio.close()
+
+
+# ============================================
+# Cliente
+# ============================================
+class ClienteServicio:
+    """
+    Cliente del servicio con una conexión persistente por hilo. Misma
+    interfaz que ServicioPrediccion (predecir / predecir_lote / estado).
+    """
+
+    def __init__(self, host=HOST, puerto=PUERTO, timeout=120.0):
+        self.host = host
+        self.puerto = puerto
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conexion(self):
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout)
+            self._local.conexion = conexion
+        return conexion
+
+    def _pedir(self, metodo, ruta, datos=None):
+        cuerpo = json.dumps(datos).encode("utf-8") if datos is not None else None
+        headers = {"Content-Type": "application/json"} if cuerpo else {}
+        for intento in range(2):
+            conexion = self._conexion()
+            try:
+                conexion.request(metodo, ruta, body=cuerpo, headers=headers)
+                respuesta = conexion.getresponse()
+                resultado = json.loads(respuesta.read())
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # Conexión cerrada por el servidor: se reintenta una vez con una nueva
+                conexion.close()
+                self._local.conexion = None
+                if intento:
+                    raise
+        if respuesta.status != 200:
+            raise RuntimeError(resultado.get("error", f"HTTP {respuesta.status}"))
+        return resultado
+
+    def precalentar(self):
+        """El servicio ya tiene el modelo y GEE cargados."""
+
+    def disponible(self):
+        try:
+            return self._pedir("GET", "/salud").get("ok", False)
+        except OSError:
+            return False
+
+    def estado(self):
+        return self._pedir("GET", "/salud")
+
+    def predecir(self, lon, lat, fecha=None):
+        return self._pedir("POST", "/predict", {"lon": lon, "lat": lat, "fecha": fecha})
+
+    def predecir_lote(self, puntos, cancelados=None):
+        # Por HTTP solo se pueden omitir los puntos ya cancelados al enviar
+        cancelados = [c() for c in cancelados] if cancelados else [False] * len(puntos)
+        enviar = [p for p, c in zip(puntos, cancelados) if not c]
+        datos = {"puntos": [{"lon": lon, "lat": lat, "fecha": fecha} for lon, lat, fecha in enviar]}
+        recibidos = iter(self._pedir("POST", "/predict/batch", datos)["resultados"] if enviar else [])
+        return [{"lat": lat, "lon": lon, "fecha": fecha, "error": "cancelado"} if c else next(recibidos)
+                for (lon, lat, fecha), c in zip(puntos, cancelados)]
+
+
+def cliente_por_defecto():
+    """
+    Cliente del servicio si está corriendo; si no, un ServicioPrediccion en
+    este mismo proceso (misma interfaz), para que la interfaz funcione sola.
+    """
+    cliente = ClienteServicio()
+    if cliente.disponible():
+        print(f"✅ Usando el servicio de predicción en {HOST}:{PUERTO}")
+        return cliente
+    print("Servicio de predicción no disponible; se usa el modelo en este proceso.")
+    return ServicioPrediccion()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio local de predicción de radiación solar")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    args = parser.parse_args()
+    servir(args.host, args.puerto)
@@ -0,0 +1,62 @@
+from concurrent.futures import CancelledError
+
+import pytest
+
+from Hackaton_SIC_2025.modulos_gee.fetch_concurrente import MotorConcurrente, es_error_cuota
+
+
+def _motor():
+    return MotorConcurrente(max_en_vuelo=1, max_por_segundo=None, reintentos=4, espera_base=0.0)
+
+
+def test_limite_de_memoria_no_se_reintenta():
+    llamadas = []
+
+    def funcion(item):
+        llamadas.append(item)
+        raise RuntimeError("User memory limit exceeded.")
+
+    with _motor() as motor:
+        with pytest.raises(RuntimeError, match="memory limit"):
+            motor._ejecutar(funcion, "p")
+    assert llamadas == ["p"]
+
+
+def test_error_de_cuota_se_reintenta():
+    llamadas = []
+
+    def funcion(item):
+        llamadas.append(item)
+        if len(llamadas) < 3:
+            raise RuntimeError("Too many concurrent aggregations.")
+        return 1.0
+
+    with _motor() as motor:
+        assert motor._ejecutar(funcion, "p") == 1.0
+    assert len(llamadas) == 3
+
+
+@pytest.mark.parametrize("mensaje, esperado", [
+    ("Too many requests (429)", True),
+    ("Quota exceeded", True),
+    ("User memory limit exceeded.", False),
+    ("Computation timed out.", False),
+])
+def test_es_error_cuota(mensaje, esperado):
+    assert es_error_cuota(RuntimeError(mensaje)) is esperado
+
+
+def test_items_cancelados_no_se_consultan():
+    consultados = []
+    cancelados = {2, 3}
+
+    def funcion(item):
+        consultados.append(item)
+        return item * 10
+
+    with _motor() as motor:
+        salida = {item: (resultado, error)
+                  for item, resultado, error in motor.mapear(funcion, range(5), cancelado=cancelados.__contains__)}
+    assert sorted(consultados) == [0, 1, 4]
+    assert salida[1] == (10, None)
+    assert all(isinstance(salida[i][1], CancelledError) for i in cancelados)
@@ -1,8 +1,14 @@
-import pandas as pd
+import sys
+import os
 
-path = r"C:\Users\alan7\OneDrive\Documentos\Codigo\Python\Proyectos\solar_merged.csv"
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
 
-df = pd.read_csv(path)
+from Storage.dataset_store import dataset_path, dataset_columns, iter_dataset, DatasetWriter
+
+# Datasets Parquet en Datasets/ (si solo existe solar_merged.csv se lee el CSV)
+path = dataset_path("solar_merged")
+output_path = dataset_path("solar_merged_clean")
 
 cols_to_drop = [
     "Temperature_Air_2m_Mean_24h",
@@ -12,16 +18,16 @@ cols_to_drop = [
     ".geo"
 ]
 
-<<<<<<< HEAD
 # si quieres usar solo temperature_2m_C, elimina esta otra:
 # cols_to_drop.append("temperature_2m_C")
 
-=======
->>>>>>> 8ae4bf1586911452768ee57b3aaa29a00ecfbc6f
-df = df.drop(columns=[c for c in cols_to_drop if c in df.columns])
+# Solo se leen las columnas que se conservan
+columns = [c for c in dataset_columns(path) if c not in cols_to_drop]
 
-# Guardar dataset limpio
-df.to_csv("solar_merged_clean.csv", index=False)
+# Guardar dataset limpio (por bloques)
+with DatasetWriter(output_path) as writer:
+    for chunk in iter_dataset(path, columns=columns):
+        writer.write(chunk)
 
-print("Dataset limpio guardado como solar_merged_clean.csv")
-print("Columnas finales:", df.columns.tolist())
+print(f"Dataset limpio guardado en {output_path}")
+print("Columnas finales:", columns)
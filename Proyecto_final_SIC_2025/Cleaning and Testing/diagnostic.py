@@ -1,23 +1,20 @@
+import sys
+import os
 import pandas as pd
-import json
+import numpy as np
 
-def parse_geo(raw):
-    if not isinstance(raw, str):
-        return None
-    fixed = raw.replace('""', '"').strip()
-    if fixed.startswith('"') and fixed.endswith('"'):
-        fixed = fixed[1:-1]
-    fixed = fixed.replace("false", "False").replace("true", "True")
-    return eval(fixed)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from Storage.gee_export import extract_point_coords, report_malformed
 
 def extract(df):
-    df["coords"] = df[".geo"].apply(parse_geo)
-    df["lon"] = df["coords"].apply(lambda x: x["coordinates"][0] if x else None)
-    df["lat"] = df["coords"].apply(lambda x: x["coordinates"][1] if x else None)
+    lon, lat, malformed = extract_point_coords(df[".geo"])
+    report_malformed(df[".geo"], malformed)
 
     # Nuevo: redondeo a 7 decimales
-    df["lon"] = df["lon"].round(7)
-    df["lat"] = df["lat"].round(7)
+    df["lon"] = np.round(lon, 7)
+    df["lat"] = np.round(lat, 7)
 
     df["date"] = pd.to_datetime(df["date"])
     return df[["lon","lat","date"]]
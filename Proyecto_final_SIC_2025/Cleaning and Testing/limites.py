@@ -8,7 +8,7 @@ from datetime import date
 sys.path.append(os.getcwd())
 
 try:
-    from Hackaton_SIC_2025.modulos_gee.modulos_gee import Solicitud, DataFetcher
+    from Hackaton_SIC_2025.modulos_gee.fetch_concurrente import MotorConcurrente
     print("✅ Módulos importados correctamente.")
 except ImportError as e:
     print(f"❌ Error importando módulos: {e}")
@@ -25,6 +25,10 @@ MAX_LON = -77.0
 # 0.2 es aprox cada 22km. Bájalo a 0.1 para más precisión (tardará más).
 STEP = 0.2 
 
+# Solicitudes simultáneas a GEE y ritmo máximo (solicitudes/segundo)
+MAX_EN_VUELO = 8
+MAX_POR_SEGUNDO = 10.0
+
 def scan_coordinates():
     print(f"Iniciando escaneo de cuadrícula...")
     print(f"Latitud: {MIN_LAT} a {MAX_LAT}")
@@ -42,38 +46,32 @@ def scan_coordinates():
     
     print(f"Total de puntos a verificar: {total_points}\n")
 
-    for lat in lats:
-        for lon in lons:
+    puntos = [[float(lon), float(lat)] for lat in lats for lon in lons]
+
+    # Pedimos solo 1 variable (elevación) para que sea rápido; los puntos se
+    # consultan en paralelo y los resultados llegan a medida que terminan
+    with MotorConcurrente(max_en_vuelo=MAX_EN_VUELO, max_por_segundo=MAX_POR_SEGUNDO) as motor:
+        for coords, data, error in motor.fetch(puntos, ['elevacion'], fecha=None):
             count += 1
             # Imprimir progreso cada 10 puntos
             if count % 10 == 0:
                 print(f"Procesando punto {count}/{total_points}...", end='\r')
 
-            coords = [float(lon), float(lat)]
-            
-            try:
-                # 1. Preparamos solicitud (usamos elevación como prueba rápida)
-                solicitud = Solicitud(coords)
-                # Pedimos solo 1 variable para que sea rápido
-                detalles = solicitud.hacer_solicitud(['elevacion'], fecha=None)
-                
-                # 2. Fetch
-                fetcher = DataFetcher(detalles, include_meta=False)
-                data = fetcher.fetch()
-                
-                # 3. Validar
-                # Si aplicaste mi corrección del buffer, esto debería ser > 0 cerca de la costa
-                valor = data.get('elevacion', 0)
-                
-                if valor != 0:
-                    valid_points.append({'lat': lat, 'lon': lon, 'val': valor})
-                    # print(f"✅ {lat:.2f}, {lon:.2f} -> {valor}") # Descomentar para ver cada acierto
-                else:
-                    invalid_points.append({'lat': lat, 'lon': lon})
-                    # print(f"❌ {lat:.2f}, {lon:.2f} -> Sin datos") # Descomentar para ver fallos
-                    
-            except Exception as e:
-                print(f"\n⚠️ Error en {lat:.2f}, {lon:.2f}: {e}")
+            lon, lat = coords
+            if error is not None:
+                print(f"\n⚠️ Error en {lat:.2f}, {lon:.2f}: {error}")
+                continue
+
+            # Validar
+            # Si aplicaste mi corrección del buffer, esto debería ser > 0 cerca de la costa
+            valor = data.get('elevacion', 0)
+
+            if valor != 0:
+                valid_points.append({'lat': lat, 'lon': lon, 'val': valor})
+                # print(f"✅ {lat:.2f}, {lon:.2f} -> {valor}") # Descomentar para ver cada acierto
+            else:
+                invalid_points.append({'lat': lat, 'lon': lon})
+                # print(f"❌ {lat:.2f}, {lon:.2f} -> Sin datos") # Descomentar para ver fallos
 
     print("\n\n" + "="*40)
     print(" RESULTADOS DEL ANÁLISIS DE RANGO")
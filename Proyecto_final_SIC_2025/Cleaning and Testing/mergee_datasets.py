@@ -1,114 +1,187 @@
+import sys
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 import pandas as pd
-import ast
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from Storage.dataset_store import (
+    dataset_path, write_dataset, read_dataset, DatasetWriter, PARTITION_COL, BATCH_ROWS,
+)
+from Storage.gee_export import extract_point_coords, report_malformed
+from Storage.grid import GRID_RES, pixel_ids
+
+# Claves enteras: pixel * KEY_DAYS + dias desde DAY_ORIGIN
+DAY_ORIGIN = np.datetime64("1900-01-01", "D").astype(np.int64)
+KEY_DAYS = 2 ** 17
+# Columnas que no se copian como variables al dataset final
+KEY_COLS = {"lon", "lat", "date", ".geo", "system:index"}
+# Construccion por particiones: mes x tesela espacial de TILE_DEG grados
+# (5 grados ~ 3000 pixeles; particiones mas chicas solo agregan archivos)
+TILE_COL = "tile"
+TILE_DEG = 5.0
+
+
+def bounded_map(executor, fn, *iterables, window):
+    """
+    Como executor.map pero con a lo sumo `window` tareas enviadas y sin
+    consumir: el resultado siguiente se pide recien cuando el anterior fue
+    entregado, asi la memoria del proceso principal no crece con el numero
+    de tareas. Conserva el orden de entrada.
+    """
+    in_flight = deque()
+    for args in zip(*iterables):
+        if len(in_flight) >= window:
+            yield in_flight.popleft().result()
+        in_flight.append(executor.submit(fn, *args))
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def tile_ids(lon, lat, grid_res=GRID_RES, tile_deg=TILE_DEG):
+    """Tesela espacial de cada punto: bloques de celdas completas de la malla."""
+    cells = max(1, int(round(tile_deg / grid_res)))
+    rows = int(np.ceil(180.0 / (grid_res * cells)))
+    i = np.floor((np.asarray(lon) + 180.0) / grid_res).astype(np.int64) // cells
+    j = np.floor((np.asarray(lat) + 90.0) / grid_res).astype(np.int64) // cells
+    return i * rows + j
+
+
+def _join_partition(builder, partition_dirs):
+    """Join de una particion (mes, tesela) de las tres fuentes (proceso del pool)."""
+    frames = [read_dataset(d) for d in partition_dirs]
+    return builder._merge_all(*frames)
+
+
+def day_numbers(dates):
+    """Fechas -> numero de dia int32 (dias desde 1970)."""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64).astype(np.int32)
 
 
 class SolarDatasetBuilder:
 
-    def __init__(self, dt1_path, dt2_path, dt3_path):
+    def __init__(self, dt1_path, dt2_path, dt3_path, grid_res=GRID_RES):
         self.dt1_path = dt1_path
         self.dt2_path = dt2_path
         self.dt3_path = dt3_path
+        self.grid_res = grid_res
 
-    def _load_csv(self, path):
-        df = pd.read_csv(path)
+    def _load_csv(self, path, usecols=None):
+        df = pd.read_csv(path, usecols=usecols)
         return df
 
+    def _plan_columns(self, columns_by_source):
+        """
+        Variables que aporta cada fuente, con la misma regla que el merge
+        con sufijos: las columnas repetidas en dt1 y dt2 se descartan, y
+        dt3 solo aporta las que no vienen de dt1/dt2.
+        """
+        c1, c2, c3 = [[c for c in cols if c not in KEY_COLS] for cols in columns_by_source]
+        both12 = set(c1) & set(c2)
+        from1 = [c for c in c1 if c not in both12]
+        from2 = [c for c in c2 if c not in both12]
+        taken = set(from1) | set(from2)
+        from3 = [c for c in c3 if c not in taken]
+        return [from1, from2, from3]
+
     def _extract_lon_lat(self, df):
-        import ast
-        import json
-
-        def fix_geo_string(s):
-            if not isinstance(s, str):
-                return None
-<<<<<<< HEAD
-            # Arregla comillas duplicadas
-            s = s.replace('""', '"').strip()
-            # Remueve comillas externas
-=======
-           
-            s = s.replace('""', '"').strip()
-            
->>>>>>> 8ae4bf1586911452768ee57b3aaa29a00ecfbc6f
-            if s.startswith('"') and s.endswith('"'):
-                s = s[1:-1]
-            # Intenta JSON
-            try:
-                return json.loads(s)
-            except:
-                pass
-            # Intenta literal_eval
-            try:
-                return ast.literal_eval(s)
-            except:
-                return None
-
-        def parse_geo(value):
-            geo = fix_geo_string(value)
-            if not isinstance(geo, dict):
-                return pd.Series({"lon": None, "lat": None})
-            coords = geo.get("coordinates", [None, None])
-            return pd.Series({"lon": coords[0], "lat": coords[1]})
-
-        coords = df[".geo"].apply(parse_geo)
-        df = pd.concat([df, coords], axis=1)
-
-        df["lon"] = pd.to_numeric(df["lon"], errors="coerce")
-        df["lat"] = pd.to_numeric(df["lat"], errors="coerce")
-
-        df["lon"] = df["lon"].round(7)
-        df["lat"] = df["lat"].round(7)
+        # Regex vectorizada sobre la columna .geo (sin json/ast por fila)
+        lon, lat, malformed = extract_point_coords(df[".geo"])
+
+        df["lon"] = np.round(lon, 7)
+        df["lat"] = np.round(lat, 7)
 
         # Si TODO queda NaN, ese es el motivo de dataset vacio
-        print("Coordenadas validas:", df[["lon", "lat"]].notna().all(axis=1).sum())
+        print("Coordenadas validas:", int((~malformed).sum()))
+        report_malformed(df[".geo"], malformed)
 
-        df = df.dropna(subset=["lon", "lat"])
+        df = df[~malformed]
         return df
 
-
-
     def _normalize_dates(self, df):
         df["date"] = pd.to_datetime(df["date"])
         return df
 
-    def _clean_columns(self, df):
-        if "system:index" in df.columns:
-            df = df.drop(columns=["system:index"])
-        return df
+    def _keys(self, df):
+        """Clave int64 (pixel, dia) de cada fila."""
+        pixel = pixel_ids(df["lon"].to_numpy(), df["lat"].to_numpy(), self.grid_res)
+        return pixel * KEY_DAYS + (day_numbers(df["date"]) - DAY_ORIGIN)
+
+    def _sorted_keys(self, df):
+        """Claves ordenadas sin repetir y fila de origen de cada una."""
+        keys = self._keys(df)
+        # Filas sin fecha valida no tienen clave
+        valid = ~np.isnat(df["date"].to_numpy())
+        order = np.flatnonzero(valid)[np.argsort(keys[valid], kind="stable")]
+        keys = keys[order]
+
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        # Dos coordenadas distintas en la misma celda: la malla no corresponde
+        dup = np.flatnonzero(~first)
+        for col in ("lon", "lat"):
+            values = df[col].to_numpy()[order]
+            if np.any(values[dup] != values[dup - 1]):
+                raise ValueError(
+                    f"Varios puntos caen en la misma celda de {self.grid_res} grados; "
+                    "usa el grid_res de la exportacion."
+                )
+        # Filas repetidas (mismo pixel y dia): se conserva la primera
+        return keys[first], order[first]
 
     def _merge_all(self, d1, d2, d3):
-        # Merge entre dt1 y dt2
-        m12 = pd.merge(
-            d1,
-            d2,
-            on=["lon", "lat", "date"],
-            how="inner",
-            suffixes=("_dt1", "_dt2")
-        )
-
-        # Merge con dt3 (domina dt3)
-        merged = pd.merge(
-            m12,
-            d3,
-            on=["lon", "lat", "date"],
-            how="inner",
-            suffixes=("", "_dup")
-        )
-
-        # Remover duplicados de dt1 y dt2
-        cols_to_drop = [c for c in merged.columns if c.endswith("_dt1") or c.endswith("_dt2")]
-
-        # Remover duplicados respecto a dt3
-        cols_to_drop += [c for c in merged.columns if c.endswith("_dup")]
-
-        merged = merged.drop(columns=cols_to_drop)
-
-        return merged
-
-    def build(self, save_path="./solar_merged.csv"):
+        """
+        Join interno de las tres fuentes sobre claves int64 (pixel, dia):
+        interseccion de claves ordenadas y busqueda binaria, sin merges
+        sobre coordenadas float. El resultado sale ordenado por lon, lat, date.
+        """
+        sources = [d1, d2, d3]
+        plan = self._plan_columns([d.columns for d in sources])
+
+        sorted_keys = [self._sorted_keys(d) for d in sources]
+        common = sorted_keys[0][0]
+        for keys, _ in sorted_keys[1:]:
+            common = np.intersect1d(common, keys, assume_unique=True)
+        rows = [order[np.searchsorted(keys, common)] for keys, order in sorted_keys]
+
+        # Igual que el merge por lon/lat: el pixel debe tener las mismas
+        # coordenadas (7 decimales) en las tres fuentes
+        match = np.ones(len(common), dtype=bool)
+        for df, r in zip(sources[1:], rows[1:]):
+            for col in ("lon", "lat"):
+                match &= df[col].to_numpy()[r] == d1[col].to_numpy()[rows[0]]
+        if not match.all():
+            print(f"Pixeles con coordenadas distintas entre fuentes (descartados): "
+                  f"{int((~match).sum())}")
+            rows = [r[match] for r in rows]
+
+        merged = {
+            "lon": d1["lon"].to_numpy()[rows[0]],
+            "lat": d1["lat"].to_numpy()[rows[0]],
+            "date": d1["date"].to_numpy()[rows[0]],
+        }
+        for df, r, cols in zip(sources, rows, plan):
+            for col in cols:
+                merged[col] = df[col].to_numpy()[r]
+
+        return pd.DataFrame(merged)
+
+    def build(self, save_path=dataset_path("solar_merged")):
+        paths = [self.dt1_path, self.dt2_path, self.dt3_path]
+
+        # Solo se leen las columnas que llegan al dataset final
+        headers = [pd.read_csv(p, nrows=0).columns for p in paths]
+        plan = self._plan_columns(headers)
         print("Loading datasets...")
-        dt1 = self._load_csv(self.dt1_path)
-        dt2 = self._load_csv(self.dt2_path)
-        dt3 = self._load_csv(self.dt3_path)
+        dt1, dt2, dt3 = [
+            self._load_csv(p, usecols=cols + [".geo", "date"]) for p, cols in zip(paths, plan)
+        ]
 
         print("Extracting lon/lat...")
         dt1 = self._extract_lon_lat(dt1)
@@ -120,28 +193,102 @@ class SolarDatasetBuilder:
         dt2 = self._normalize_dates(dt2)
         dt3 = self._normalize_dates(dt3)
 
-        print("Cleaning columns...")
-        dt1 = self._clean_columns(dt1)
-        dt2 = self._clean_columns(dt2)
-        dt3 = self._clean_columns(dt3)
-
         print("Merging datasets (inner, removing pixels that do not match)...")
         merged = self._merge_all(dt1, dt2, dt3)
 
-        print("Removing rows with missing coordinates...")
-        merged = merged.dropna(subset=["lon", "lat"])
-
-        print("Sorting...")
-        merged = merged.sort_values(by=["lon", "lat", "date"]).reset_index(drop=True)
-
+        # Parquet particionado por mes (o CSV si save_path termina en .csv)
         print(f"Saving final dataset: {save_path}")
-        merged.to_csv(save_path, index=False)
+        write_dataset(merged, save_path)
 
         print("Done.")
         return merged
 
+    def _stage_source(self, path, columns, stage_dir, tile_deg, chunk_rows):
+        """
+        Lee un CSV por bloques y lo reparte en un dataset Parquet particionado
+        por mes y tesela. Solo hay un bloque en memoria a la vez.
+        """
+        rows = 0
+        with DatasetWriter(stage_dir, partition_cols=(PARTITION_COL, TILE_COL)) as writer:
+            for chunk in pd.read_csv(path, usecols=columns + [".geo", "date"], chunksize=chunk_rows):
+                chunk = self._extract_lon_lat(chunk)
+                chunk = self._normalize_dates(chunk).drop(columns=".geo")
+                chunk[TILE_COL] = tile_ids(chunk["lon"], chunk["lat"], self.grid_res, tile_deg)
+                writer.write(chunk)
+                rows += len(chunk)
+        return rows
+
+    def build_partitioned(self, save_path=dataset_path("solar_merged"), tile_deg=TILE_DEG,
+                          workers=None, chunk_rows=BATCH_ROWS):
+        """
+        Construccion fuera de memoria: cada fuente se lee por bloques y se
+        reparte por mes y tesela en un area temporal; luego se hace el join
+        particion por particion (en paralelo con `workers` procesos) y se
+        escribe el resultado particionado por mes. La memoria depende del
+        tamaño de una particion, no del rango de fechas.
+        """
+        paths = [self.dt1_path, self.dt2_path, self.dt3_path]
+        headers = [pd.read_csv(p, nrows=0).columns for p in paths]
+        plan = self._plan_columns(headers)
+
+        save_path = Path(save_path)
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        stage_root = Path(tempfile.mkdtemp(prefix=".staging_", dir=save_path.parent))
+        workers = workers or os.cpu_count() or 1
+        executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+        # Sin pool (workers=1) todo corre en este proceso
+        run = executor.map if executor is not None else map
+        try:
+            stage_dirs = [stage_root / f"dt{k + 1}" for k in range(len(paths))]
+            print("Partitioning sources by month and tile...")
+            staged = run(self._stage_source, paths, plan, stage_dirs,
+                         [tile_deg] * len(paths), [chunk_rows] * len(paths))
+            for path, rows in zip(paths, staged):
+                print(f"  {path}: {rows:,} rows")
+
+            # Solo las particiones presentes en las tres fuentes pueden tener filas
+            keys = None
+            for stage_dir in stage_dirs:
+                found = {d.relative_to(stage_dir) for d in stage_dir.glob(f"{PARTITION_COL}=*/{TILE_COL}=*")}
+                keys = found if keys is None else keys & found
+            keys = sorted(keys, key=lambda k: (k.parent.name, int(k.name.split("=")[1])))
+            tasks = [[stage_dir / key for stage_dir in stage_dirs] for key in keys]
+            print(f"Merging {len(tasks)} partitions (month x tile)...")
+
+            # En orden (mes a mes, tesela a tesela) y con a lo sumo 2 * workers
+            # particiones unidas esperando a ser escritas
+            if executor is not None:
+                results = bounded_map(executor, _join_partition, [self] * len(tasks), tasks,
+                                      window=2 * workers)
+            else:
+                results = map(_join_partition, [self] * len(tasks), tasks)
+            rows = self._write_partitions(save_path, results, chunk_rows)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            shutil.rmtree(stage_root, ignore_errors=True)
+
+        print(f"Saved {rows:,} rows: {save_path}")
+        return save_path
+
+    def _write_partitions(self, save_path, results, chunk_rows):
+        """Escribe las particiones en orden, agrupadas en bloques de ~chunk_rows filas."""
+        rows = 0
+        pending, pending_rows = [], 0
+        with DatasetWriter(save_path) as writer:
+            for merged in results:
+                pending.append(merged)
+                pending_rows += len(merged)
+                if pending_rows >= chunk_rows:
+                    writer.write(pd.concat(pending, ignore_index=True))
+                    rows += pending_rows
+                    pending, pending_rows = [], 0
+            if pending_rows:
+                writer.write(pd.concat(pending, ignore_index=True))
+                rows += pending_rows
+        return rows
+
 
-<<<<<<< HEAD
 if __name__ == "__main__":
     builder = SolarDatasetBuilder(
         r"C:\Users\alan7\OneDrive\Documentos\Codigo\Python\Proyectos\SolarKointrol\Panama_AgERA5_JanJun2025.csv",
@@ -149,14 +296,8 @@ if __name__ == "__main__":
         r"C:\Users\alan7\OneDrive\Documentos\Codigo\Python\Proyectos\SolarKointrol\Panama_ERA5Land_JanJun2025.csv"
     )
 
-    builder.build("./solar_merged.csv")
-=======
-# if __name__ == "__main__":
-#     builder = SolarDatasetBuilder(
-#         r"C:\Users\alan7\OneDrive\Documentos\Codigo\Python\Proyectos\SolarKointrol\Panama_AgERA5_JanJun2025.csv",
-#         r"C:\Users\alan7\OneDrive\Documentos\Codigo\Python\Proyectos\SolarKointrol\Panama_ClimateVars_Clean_JanJun2025.csv",
-#         r"C:\Users\alan7\OneDrive\Documentos\Codigo\Python\Proyectos\SolarKointrol\Panama_ERA5Land_JanJun2025.csv"
-#     )
-
-#     builder.build("./solar_merged.csv")
->>>>>>> 8ae4bf1586911452768ee57b3aaa29a00ecfbc6f
+    # --out-of-core: por particiones (mes x tesela) y en paralelo, para historicos largos
+    if "--out-of-core" in sys.argv:
+        builder.build_partitioned()
+    else:
+        builder.build()
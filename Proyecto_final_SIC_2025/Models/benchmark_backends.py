@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from Models.features import build_features, valid_rows, LAG_COL
+from Models.lags import LagEngine
+from Models.predict import BACKENDS, InferenceEngine
+
+DATA_PATH = os.path.join(ROOT_DIR, "Datasets", "final_data.csv")
+REPORT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend_report.csv")
+
+# final_data.csv usa nombres distintos a los del entrenamiento
+COLUMN_MAP = {
+    "cloud_cover": "Cloud_Cover_Mean_24h",
+    "humidity": "relative_humidity",
+    "temperature_C": "temperature_2m_C",
+}
+
+
+def load_features(path=DATA_PATH, min_rows=50000):
+    """
+    Matriz de features (FEATURE_COLS) a partir de final_data.csv, repetida
+    hasta tener al menos min_rows filas para medir el rendimiento en lotes.
+    """
+    df = pd.read_csv(path, index_col=0).rename(columns=COLUMN_MAP)
+    df["date"] = pd.to_datetime(df["month"], format="%Y-%m")
+
+    # Datos mensuales: lag1 = mes anterior en la misma ubicacion
+    lag1 = LagEngine(freq="M").transform(df)[LAG_COL]
+
+    X = build_features(df, lag1=lag1).astype(np.float64)
+    X = X[valid_rows(X)]
+    repeats = max(1, -(-min_rows // len(X)))
+    return np.tile(X, (repeats, 1))
+
+
+def time_backend(engine, X, single_rows=200, repeats=3):
+    """Mejor tiempo de `repeats` pasadas en lote y latencia media por fila."""
+    engine.predict(X[:8])  # carga y calentamiento
+
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        y = engine.predict(X)
+        best = min(best, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for row in X[:single_rows]:
+        engine.predict(row.reshape(1, -1))
+    latency = (time.perf_counter() - t0) / single_rows
+
+    return y, best, latency
+
+
+def run_report(backends=BACKENDS, min_rows=50000):
+    """
+    Compara cada backend contra la referencia de Keras: error absoluto
+    (J/m2), error relativo, filas/s en lote y latencia de una fila.
+    """
+    X = load_features(min_rows=min_rows)
+    print(f"{len(X)} filas de features ({os.path.basename(DATA_PATH)})")
+
+    reference = None
+    rows = []
+    for backend in backends:
+        try:
+            y, seconds, latency = time_backend(InferenceEngine(backend), X)
+        except (ImportError, OSError) as e:
+            print(f"  {backend}: no disponible ({e})")
+            continue
+
+        if reference is None:
+            reference = y
+        err = np.abs(y - reference)
+        rows.append({
+            "backend": backend,
+            "rows_per_s": len(X) / seconds,
+            "latency_ms": latency * 1000.0,
+            "max_abs_err": err.max(),
+            "mean_abs_err": err.mean(),
+            "max_rel_err": (err / np.abs(reference)).max(),
+        })
+
+    report = pd.DataFrame(rows)
+    print(f"Referencia: {report['backend'].iloc[0]}")
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    report.to_csv(REPORT_PATH, index=False)
+    print(f"Reporte guardado en {REPORT_PATH}")
+    return report
+
+
+if __name__ == "__main__":
+    run_report()
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+import joblib
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_PATH = os.path.join(BASE_DIR, "solar_model.keras")
+SCALER_PATH = os.path.join(BASE_DIR, "solar_scaler.pkl")
+TARGET_NORM_PATH = os.path.join(BASE_DIR, "target_norm.pkl")
+OUTPUT_PATH = os.path.join(BASE_DIR, "solar_model_folded.npz")
+
+
+def fold_model(model, scaler, y_mean, y_std):
+    """
+    Convierte el MLP de Keras en una lista de capas afines (W, b, activacion):
+    - BatchNormalization (inferencia) se pliega en el Dense anterior
+    - Dropout e InputLayer se descartan (no actuan en inferencia)
+    - El StandardScaler se pliega en la primera capa
+    - La desnormalizacion del target (y_std, y_mean) se pliega en la ultima
+    """
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        config = layer.get_config()
+
+        if kind == "Dense":
+            weights = layer.get_weights()
+            W = weights[0].astype(np.float64)
+            b = weights[1].astype(np.float64) if len(weights) > 1 else np.zeros(W.shape[1])
+            layers.append([W, b, config["activation"]])
+
+        elif kind == "BatchNormalization":
+            if not layers or layers[-1][2] != "linear":
+                raise ValueError("BatchNormalization debe seguir a un Dense lineal para plegarse.")
+            names = [w.name.split("/")[-1].split(":")[0] for w in layer.weights]
+            params = dict(zip(names, layer.get_weights()))
+            gamma = params.get("gamma", np.ones(layers[-1][0].shape[1]))
+            beta = params.get("beta", np.zeros(layers[-1][0].shape[1]))
+            s = gamma / np.sqrt(params["moving_variance"] + config["epsilon"])
+            W, b, act = layers[-1]
+            layers[-1] = [W * s, (b - params["moving_mean"]) * s + beta, act]
+
+        elif kind == "Activation":
+            if not layers or layers[-1][2] != "linear":
+                raise ValueError("Activation debe seguir a un Dense lineal.")
+            layers[-1][2] = config["activation"]
+
+        elif kind in ("Dropout", "InputLayer"):
+            continue
+
+        else:
+            raise ValueError(f"Capa no soportada para exportar a NumPy: {kind}")
+
+    for _, _, act in layers:
+        if act not in ("linear", "gelu"):
+            raise ValueError(f"Activacion no soportada: {act}")
+
+    # Scaler: x_s = (x - mean) / scale  ->  W' = W / scale, b' = b - (mean / scale) @ W
+    W, b, act = layers[0]
+    layers[0] = [W / scaler.scale_[:, None], b - (scaler.mean_ / scaler.scale_) @ W, act]
+
+    # Target: y = y_norm * y_std + y_mean
+    W, b, act = layers[-1]
+    if act != "linear":
+        raise ValueError("La capa de salida debe ser lineal para plegar el target.")
+    layers[-1] = [W * y_std, b * y_std + y_mean, act]
+
+    return layers
+
+
+def export_numpy(output_path=OUTPUT_PATH):
+    from keras.models import load_model
+
+    model = load_model(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    target_norm = joblib.load(TARGET_NORM_PATH)
+
+    layers = fold_model(model, scaler, target_norm["y_mean"], target_norm["y_std"])
+
+    # La primera capa queda en float64: recibe features crudas (p. ej. radiacion
+    # ~1e7) y con el scaler plegado en float32 perderia precision por cancelacion.
+    arrays = {"activations": np.array([act for _, _, act in layers])}
+    for i, (W, b, _) in enumerate(layers):
+        dtype = np.float64 if i == 0 else np.float32
+        arrays[f"W{i}"] = W.astype(dtype)
+        arrays[f"b{i}"] = b.astype(dtype)
+    np.savez_compressed(output_path, **arrays)
+
+    print(f"Modelo plegado guardado en {output_path} ({len(layers)} capas densas)")
+    return output_path
+
+
+if __name__ == "__main__":
+    export_numpy()
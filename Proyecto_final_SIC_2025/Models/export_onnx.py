@@ -0,0 +1,117 @@
+import os
+import sys
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from Models.export_numpy import export_numpy, OUTPUT_PATH as NUMPY_MODEL_PATH
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ONNX_PATH = os.path.join(BASE_DIR, "solar_model.onnx")
+ONNX_FP16_PATH = os.path.join(BASE_DIR, "solar_model.fp16.onnx")
+ONNX_INT8_PATH = os.path.join(BASE_DIR, "solar_model.int8.onnx")
+
+OPSET = 17
+
+
+def load_folded_layers(path=NUMPY_MODEL_PATH):
+    """Capas (W, b, activacion) plegadas por export_numpy.py (se generan si faltan)."""
+    if not os.path.exists(path):
+        export_numpy(path)
+    with np.load(path) as data:
+        activations = [str(a) for a in data["activations"]]
+        return [(data[f"W{i}"], data[f"b{i}"], act) for i, act in enumerate(activations)]
+
+
+def build_onnx(layers, hidden_dtype=np.float32):
+    """
+    Grafo ONNX equivalente a NumpyPredictor: entrada 'features' (float64,
+    features crudas) y salida 'radiation' (float32, J/m2).
+
+    La primera capa se calcula en float64 y la de salida en float32 (sus pesos
+    incluyen y_std ~3e6, fuera de rango para float16); las capas ocultas usan
+    hidden_dtype (float32 o float16).
+    """
+    import onnx
+    from onnx import helper, numpy_helper, TensorProto
+
+    nodes = []
+    initializers = []
+
+    def const(name, value):
+        initializers.append(numpy_helper.from_array(np.asarray(value), name))
+        return name
+
+    def cast(src, dst, dtype):
+        to = helper.np_dtype_to_tensor_dtype(np.dtype(dtype))
+        nodes.append(helper.make_node("Cast", [src], [dst], to=to))
+        return dst
+
+    last = len(layers) - 1
+    # Tipo de cada capa; la salida de una capa se convierte al tipo de la siguiente
+    dtypes = [np.float64] + [hidden_dtype] * (last - 1) + [np.float32]
+    if last == 0:
+        dtypes = [np.float64]
+
+    h = "features"
+    for i, (W, b, act) in enumerate(layers):
+        w = const(f"W{i}", W.astype(dtypes[i]))
+        bias = const(f"b{i}", b.astype(dtypes[i]))
+        nodes.append(helper.make_node("MatMul", [h, w], [f"h{i}_mm"]))
+        nodes.append(helper.make_node("Add", [f"h{i}_mm", bias], [f"h{i}_lin"]))
+        h = f"h{i}_lin"
+
+        dtype = dtypes[i + 1] if i < last else np.float32
+        if dtype != dtypes[i]:
+            h = cast(h, f"h{i}_cast", dtype)
+
+        if act == "gelu":
+            # GELU exacta: 0.5 * x * (1 + erf(x / sqrt(2)))
+            inv_sqrt2 = const(f"inv_sqrt2_{i}", np.array(1.0 / np.sqrt(2.0), dtype=dtype))
+            one = const(f"one_{i}", np.array(1.0, dtype=dtype))
+            half = const(f"half_{i}", np.array(0.5, dtype=dtype))
+            nodes.append(helper.make_node("Mul", [h, inv_sqrt2], [f"h{i}_s"]))
+            nodes.append(helper.make_node("Erf", [f"h{i}_s"], [f"h{i}_erf"]))
+            nodes.append(helper.make_node("Add", [f"h{i}_erf", one], [f"h{i}_1p"]))
+            nodes.append(helper.make_node("Mul", [h, f"h{i}_1p"], [f"h{i}_x"]))
+            nodes.append(helper.make_node("Mul", [f"h{i}_x", half], [f"h{i}_gelu"]))
+            h = f"h{i}_gelu"
+
+    nodes.append(helper.make_node("Identity", [h], ["radiation"]))
+
+    n_features = layers[0][0].shape[0]
+    graph = helper.make_graph(
+        nodes,
+        "solar_model",
+        [helper.make_tensor_value_info("features", TensorProto.DOUBLE, [None, n_features])],
+        [helper.make_tensor_value_info("radiation", TensorProto.FLOAT, [None, 1])],
+        initializers,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", OPSET)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    return model
+
+
+def export_onnx():
+    """Exporta la version float32, float16 e int8 (cuantizacion dinamica) del modelo."""
+    import onnx
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    layers = load_folded_layers()
+
+    onnx.save(build_onnx(layers, np.float32), ONNX_PATH)
+    print(f"ONNX float32 guardado en {ONNX_PATH}")
+
+    onnx.save(build_onnx(layers, np.float16), ONNX_FP16_PATH)
+    print(f"ONNX float16 guardado en {ONNX_FP16_PATH}")
+
+    # Pesos int8 en los MatMul float32; la primera capa (float64) se mantiene
+    quantize_dynamic(ONNX_PATH, ONNX_INT8_PATH, weight_type=QuantType.QInt8)
+    print(f"ONNX int8 guardado en {ONNX_INT8_PATH}")
+
+
+if __name__ == "__main__":
+    export_onnx()
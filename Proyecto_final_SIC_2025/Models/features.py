@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+# Columnas de entrada del modelo, en el orden del entrenamiento
+FEATURE_COLS = [
+    "Cloud_Cover_Mean_24h",
+    "relative_humidity",
+    "temperature_2m_C",
+    "total_precipitation_sum",
+    "surface_pressure",
+    "elevation",
+    "sin_lat",
+    "cos_lat",
+    "sin_lon",
+    "cos_lon",
+    "sin_doy",
+    "cos_doy",
+    "dayofyear_norm",
+    "surface_net_solar_radiation_sum_lag1",
+    "temp_humidity_index",
+    "cloud_pressure_ratio"
+]
+
+# Variables que pasan sin transformar
+BASE_COLS = FEATURE_COLS[:6]
+TARGET_COL = "surface_net_solar_radiation_sum"
+LAG_COL = "surface_net_solar_radiation_sum_lag1"
+
+_IDX = {name: i for i, name in enumerate(FEATURE_COLS)}
+
+
+def _values(df, name):
+    return df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def dayofyear(dates):
+    """Dia del año (float, NaN si la fecha no es valida) de una serie de fechas."""
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    return dates.dt.dayofyear.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def build_features(df, lag1=None, date_col="date", out=None, fill_value=None, live=False):
+    """
+    Matriz (n, len(FEATURE_COLS)) float32 con las features del modelo, calculada
+    en una sola pasada vectorizada sobre un arreglo preasignado (sin agregar
+    columnas intermedias al DataFrame).
+
+    df debe tener BASE_COLS, lat, lon y date_col. lag1 es el arreglo con la
+    radiacion del registro anterior; si es None se toma la columna LAG_COL.
+    out permite reutilizar un buffer (p. ej. por bloques). Con fill_value,
+    los NaN/inf se reemplazan por ese valor. live=True aplica los arreglos
+    de la prediccion en vivo (presion 0 -> 1 en cloud_pressure_ratio); el
+    entrenamiento y el scoring no los usan.
+    """
+    n = len(df)
+    if out is None:
+        out = np.empty((n, len(FEATURE_COLS)), dtype=np.float32)
+    elif out.shape != (n, len(FEATURE_COLS)):
+        raise ValueError(f"out debe tener forma {(n, len(FEATURE_COLS))}, no {out.shape}")
+
+    for name in BASE_COLS:
+        out[:, _IDX[name]] = _values(df, name)
+
+    # Transformaciones geograficas
+    rad = np.radians(_values(df, "lat"))
+    np.sin(rad, out=out[:, _IDX["sin_lat"]])
+    np.cos(rad, out=out[:, _IDX["cos_lat"]])
+    rad = np.radians(_values(df, "lon"), out=rad)
+    np.sin(rad, out=out[:, _IDX["sin_lon"]])
+    np.cos(rad, out=out[:, _IDX["cos_lon"]])
+
+    # Transformaciones temporales
+    doy = dayofyear(df[date_col])
+    np.divide(doy, 365.0, out=out[:, _IDX["dayofyear_norm"]])
+    angle = doy * (2 * np.pi / 365.0)
+    np.sin(angle, out=out[:, _IDX["sin_doy"]])
+    np.cos(angle, out=out[:, _IDX["cos_doy"]])
+
+    # Variables derivadas
+    out[:, _IDX[LAG_COL]] = _values(df, LAG_COL) if lag1 is None else lag1
+
+    out[:, _IDX["temp_humidity_index"]] = (
+        _values(df, "temperature_2m_C") * (_values(df, "relative_humidity") / 100.0)
+    )
+
+    pressure = _values(df, "surface_pressure")
+    if live:
+        # En vivo, presion 0 (dato faltante de GEE) no debe producir inf
+        pressure = np.where(pressure == 0, 1.0, pressure)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(_values(df, "Cloud_Cover_Mean_24h"), pressure, out=out[:, _IDX["cloud_pressure_ratio"]])
+
+    if fill_value is not None:
+        out[~np.isfinite(out)] = fill_value
+    return out
+
+
+def valid_rows(X, df=None):
+    """
+    Mascara de filas con todas las features finitas. Con df, ademas sin
+    NaN en ninguna columna de df (el df.dropna() de los scripts originales).
+    """
+    valid = np.isfinite(X).all(axis=1)
+    if df is not None:
+        valid &= df.notna().all(axis=1).to_numpy()
+    return valid
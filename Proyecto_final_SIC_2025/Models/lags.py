@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+
+from .features import TARGET_COL, LAG_COL
+
+# Lag del entrenamiento: radiacion del periodo anterior en la misma ubicacion
+DEFAULT_LAGS = {LAG_COL: (TARGET_COL, 1)}
+
+
+def period_numbers(dates, freq="D"):
+    """Numero de periodo (dias o meses desde 1970) de una serie de fechas; NaN si no es valida."""
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    values = dates.to_numpy(dtype="datetime64[ns]")
+    unit = {"D": "datetime64[D]", "M": "datetime64[M]"}[freq]
+    periods = values.astype(unit).astype(np.int64).astype(np.float64)
+    periods[np.isnat(values)] = np.nan
+    return periods
+
+
+class LagEngine:
+    """
+    Lags y medias moviles por ubicacion (lat, lon) con un solo ordenamiento
+    y desplazamientos segmentados en NumPy (sin groupby.apply).
+
+    - lags: {nombre: (columna, k)} -> valor de la columna k periodos antes
+      en la misma ubicacion (NaN si ese periodo no existe; los huecos en la
+      serie no se confunden con el registro anterior).
+    - rolling: {nombre: (columna, ventana)} -> media de los `ventana`
+      registros anteriores de la misma ubicacion (sin incluir el actual).
+
+    transform(df) procesa un DataFrame completo. update(df) procesa bloques
+    sucesivos (streaming): guarda la cola de cada ubicacion entre bloques,
+    asi que el resultado es el mismo que con transform sobre todo el archivo
+    siempre que los periodos de cada ubicacion lleguen en orden.
+    """
+
+    def __init__(self, lags=None, rolling=None, time_col="date", freq="D",
+                 group_cols=("lat", "lon"), min_periods=None):
+        self.lags = dict(DEFAULT_LAGS if lags is None else lags)
+        self.rolling = dict(rolling or {})
+        self.time_col = time_col
+        self.freq = freq
+        self.group_cols = list(group_cols)
+        self.min_periods = min_periods
+        self.value_cols = sorted({col for col, _ in self.lags.values()} |
+                                 {col for col, _ in self.rolling.values()})
+        # Registros que hay que conservar por ubicacion entre bloques
+        self.history = max([k for _, k in self.lags.values()] +
+                           [w for _, w in self.rolling.values()] + [1])
+        self._tail = None
+
+    def reset(self):
+        self._tail = None
+
+    def _columns(self, df):
+        cols = {col: df[col].to_numpy(dtype=np.float64, na_value=np.nan) for col in self.group_cols}
+        cols["_period"] = period_numbers(df[self.time_col], self.freq)
+        for col in self.value_cols:
+            cols[col] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        return cols
+
+    def _compute(self, cols):
+        n_total = len(cols["_period"])
+        # Filas sin fecha o sin ubicacion no participan (resultado NaN)
+        ok = np.isfinite(cols["_period"])
+        for col in self.group_cols:
+            ok &= np.isfinite(cols[col])
+        cols = {col: values[ok] for col, values in cols.items()}
+        n = len(cols["_period"])
+
+        # Un solo ordenamiento estable por (ubicacion, periodo)
+        order = np.lexsort([cols["_period"]] + [cols[c] for c in reversed(self.group_cols)])
+        period = cols["_period"][order]
+
+        new_group = np.zeros(n, dtype=bool)
+        new_group[:1] = True
+        for col in self.group_cols:
+            key = cols[col][order]
+            new_group[1:] |= key[1:] != key[:-1]
+        group_id = np.cumsum(new_group) - 1
+        starts = np.flatnonzero(new_group)
+        row_start = starts[group_id]
+
+        results = {}
+        # Lags por periodo: buscar (ubicacion, periodo - k) en las claves ordenadas
+        if n:
+            period = period - period.min()
+            span = period.max() + self.history + 1
+            keys = group_id * span + period
+        for name, (col, k) in self.lags.items():
+            values = cols[col][order]
+            lagged = np.full(n, np.nan)
+            if n:
+                pos = np.searchsorted(keys, keys - k)
+                pos = np.minimum(pos, n - 1)
+                found = keys[pos] == keys - k
+                lagged[found] = values[pos[found]]
+            results[name] = lagged
+
+        # Medias moviles por registros: sumas acumuladas segmentadas
+        for name, (col, window) in self.rolling.items():
+            values = cols[col][order]
+            valid = np.isfinite(values)
+            csum = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+            ccount = np.concatenate(([0], np.cumsum(valid)))
+            end = np.arange(n)                       # exclusivo: sin el registro actual
+            lo = np.maximum(end - window, row_start)
+            count = ccount[end] - ccount[lo]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = (csum[end] - csum[lo]) / count
+            results[name] = np.where(count >= (self.min_periods or window), mean, np.nan)
+
+        # Devolver en el orden original de las filas
+        positions = np.flatnonzero(ok)[order]
+        for name, values in results.items():
+            full = np.full(n_total, np.nan)
+            full[positions] = values
+            results[name] = full
+
+        # Cola por ubicacion: ultimos `history` registros (para el siguiente bloque)
+        ends = np.append(starts[1:], n)
+        keep = (ends[group_id] - np.arange(n)) <= self.history
+        tail = {col: values[order][keep] for col, values in cols.items()}
+        return results, tail
+
+    def transform(self, df):
+        """Lags/medias de un DataFrame completo: {nombre: arreglo alineado con df}."""
+        results, _ = self._compute(self._columns(df))
+        return results
+
+    def update(self, df):
+        """Igual que transform, pero usando y actualizando la cola de bloques anteriores."""
+        cols = self._columns(df)
+        n_tail = 0
+        if self._tail is not None:
+            n_tail = len(self._tail["_period"])
+            cols = {col: np.concatenate([self._tail[col], values]) for col, values in cols.items()}
+        results, self._tail = self._compute(cols)
+        return {name: values[n_tail:] for name, values in results.items()}
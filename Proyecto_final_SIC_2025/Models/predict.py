@@ -1,43 +1,293 @@
+import importlib.util
 import os
+import queue
+import threading
+from concurrent.futures import Future
 import numpy as np
-import joblib
-from keras.models import load_model
+
+from .features import FEATURE_COLS
 
 BASE_DIR = os.path.dirname(__file__)
+# Pesos plegados para inferencia sin TensorFlow (ver export_numpy.py)
+NUMPY_MODEL_PATH = os.path.join(BASE_DIR, "solar_model_folded.npz")
+# Modelos ONNX para onnxruntime (ver export_onnx.py)
+ONNX_MODEL_PATHS = {
+    "onnx": os.path.join(BASE_DIR, "solar_model.onnx"),
+    "onnx-fp16": os.path.join(BASE_DIR, "solar_model.fp16.onnx"),
+    "onnx-int8": os.path.join(BASE_DIR, "solar_model.int8.onnx"),
+}
+
+# Backend de inferencia: "keras" (por defecto), "numpy", "onnx", "onnx-fp16",
+# "onnx-int8" o "auto" (onnxruntime si esta instalado y exportado, si no numpy,
+# si no keras). Los backends rapidos se eligen con SOLAR_MODEL_BACKEND.
+BACKENDS = ("keras", "numpy") + tuple(ONNX_MODEL_PATHS)
+DEFAULT_BACKEND = os.environ.get("SOLAR_MODEL_BACKEND", "keras")
+
+# Modelo, scaler y normalizacion del target se cargan al primer uso
+# (importar este modulo no importa TensorFlow).
+_artifacts = None
+_artifacts_lock = threading.Lock()
+
+
+def _load_artifacts():
+    import joblib
+    from keras.models import load_model
+
+    model = load_model(os.path.join(BASE_DIR, "solar_model.keras"))
+    scaler = joblib.load(os.path.join(BASE_DIR, "solar_scaler.pkl"))
+
+    target_norm = joblib.load(os.path.join(BASE_DIR, "target_norm.pkl"))
+    return {
+        "model": model,
+        "scaler": scaler,
+        "y_mean": target_norm["y_mean"],
+        "y_std": target_norm["y_std"],
+    }
+
+
+def get_artifacts():
+    """Devuelve (y carga una sola vez, de forma segura entre hilos) modelo y scalers."""
+    global _artifacts
+    if _artifacts is None:
+        with _artifacts_lock:
+            if _artifacts is None:
+                _artifacts = _load_artifacts()
+    return _artifacts
+
+
+def warm_up(backend=None):
+    """Carga el backend de inferencia y hace una prediccion de prueba."""
+    get_engine(backend).predict(np.zeros((1, len(FEATURE_COLS))))
+
+
+def __getattr__(name):
+    # Compatibilidad: predict.model, predict.scaler, predict.y_mean, predict.y_std
+    if name in ("model", "scaler", "y_mean", "y_std"):
+        return get_artifacts()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _keras_forward():
+    import tensorflow as tf
+    artifacts = get_artifacts()
+    model = artifacts["model"]
+    scaler = artifacts["scaler"]
+    # Firma fija: un solo trazado para cualquier numero de filas
+    graph = tf.function(
+        lambda x: model(x, training=False),
+        input_signature=[tf.TensorSpec([None, len(FEATURE_COLS)], tf.float32)]
+    )
+
+    def forward(X):
+        X_scaled = ((X - scaler.mean_) / scaler.scale_).astype(np.float32)
+        y_pred_norm = graph(X_scaled).numpy().reshape(-1)
+        # desnormalizar target
+        return y_pred_norm * artifacts["y_std"] + artifacts["y_mean"]
+
+    return forward
+
+
+class InferenceEngine:
+    """
+    Motor de inferencia del modelo solar sobre un backend ("keras", "numpy"
+    u "onnx*", ver BACKENDS).
+
+    - Entradas pequenas (<= small_threshold filas): una sola llamada directa
+      al backend (con keras, el modelo compilado con tf.function, sin el
+      overhead de model.predict).
+    - Entradas grandes: se procesan por bloques de batch_size filas.
+    - submit()/predict_one(): cola de micro-batching que agrupa solicitudes
+      de una fila de varios hilos en un solo forward pass.
+    """
+
+    def __init__(self, backend="keras", small_threshold=1024, batch_size=8192,
+                 max_batch=256, max_wait_ms=5):
+        self.backend = backend
+        self.small_threshold = small_threshold
+        self.batch_size = batch_size
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._forward = None
+        self._forward_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def _get_forward(self):
+        if self._forward is None:
+            with self._forward_lock:
+                if self._forward is None:
+                    if self.backend == "keras":
+                        self._forward = _keras_forward()
+                    else:
+                        self._forward = get_predictor(self.backend).predict
+        return self._forward
+
+    def predict(self, X):
+        """X: matriz (n, len(FEATURE_COLS)) sin escalar. Devuelve la radiacion en J/m2."""
+        X = np.asarray(X, dtype=np.float64)
+        forward = self._get_forward()
+        n = X.shape[0]
+        if n <= self.small_threshold:
+            return forward(X)
+
+        y_pred = np.empty(n, dtype=np.float64)
+        for start in range(0, n, self.batch_size):
+            end = min(start + self.batch_size, n)
+            y_pred[start:end] = forward(X[start:end])
+        return y_pred
+
+    def predict_dataframe(self, df):
+        return self.predict(df[FEATURE_COLS].values)
+
+    # --- micro-batching ---
+    def submit(self, x):
+        """Encola una fila de features; devuelve un Future con la prediccion."""
+        future = Future()
+        self._queue.put((np.asarray(x, dtype=np.float64).reshape(-1), future))
+        self._ensure_worker()
+        return future
+
+    def predict_one(self, x, timeout=None):
+        return self.submit(x).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(
+                        target=self._run_worker, name="inference-batcher", daemon=True
+                    )
+                    self._worker.start()
+
+    def _run_worker(self):
+        while True:
+            pending = [self._queue.get()]
+            # Espera breve para juntar solicitudes concurrentes en un mismo lote
+            try:
+                while len(pending) < self.max_batch:
+                    pending.append(self._queue.get(timeout=self.max_wait))
+            except queue.Empty:
+                pass
+
+            pending = [(x, f) for x, f in pending if f.set_running_or_notify_cancel()]
+            if not pending:
+                continue
+            try:
+                y = self.predict(np.stack([x for x, _ in pending]))
+                for (_, future), value in zip(pending, y):
+                    future.set_result(float(value))
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+
+
+class NumpyPredictor:
+    """
+    Forward pass del MLP en NumPy puro a partir de solar_model_folded.npz.
+    Scaler, BatchNorm y desnormalizacion del target ya vienen plegados en
+    los pesos, asi que recibe las features crudas y devuelve J/m2.
+    """
+
+    def __init__(self, path=NUMPY_MODEL_PATH):
+        from scipy.special import erf
+        self._erf = erf
+        with np.load(path) as data:
+            activations = [str(a) for a in data["activations"]]
+            self.layers = [
+                (data[f"W{i}"], data[f"b{i}"], act) for i, act in enumerate(activations)
+            ]
+
+    def _gelu(self, x):
+        # GELU exacta (la que usa Keras por defecto)
+        return 0.5 * x * (1.0 + self._erf(x / np.float32(np.sqrt(2.0))))
+
+    def predict(self, X):
+        # Primera capa en float64 (features crudas), el resto en float32
+        h = np.asarray(X, dtype=np.float64)
+        for W, b, act in self.layers:
+            h = (h @ W + b).astype(np.float32, copy=False)
+            if act == "gelu":
+                h = self._gelu(h)
+        return h.reshape(-1)
+
+    def predict_dataframe(self, df):
+        return self.predict(df[FEATURE_COLS].values)
+
+
+class OnnxPredictor:
+    """
+    Inferencia con onnxruntime en CPU a partir de los modelos de export_onnx.py
+    (float32, float16 o int8). Igual que NumpyPredictor, recibe las features
+    crudas y devuelve J/m2.
+    """
+
+    def __init__(self, path=ONNX_MODEL_PATHS["onnx"], threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, X):
+        # La primera capa del grafo es float64 (features crudas)
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        return self.session.run(None, {self.input_name: X})[0].reshape(-1)
+
+    def predict_dataframe(self, df):
+        return self.predict(df[FEATURE_COLS].values)
+
+
+def resolve_backend(backend=None):
+    """Traduce None/"auto" al backend concreto disponible en esta instalacion."""
+    backend = backend or DEFAULT_BACKEND
+    if backend != "auto":
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend desconocido: {backend!r}. Opciones: {BACKENDS + ('auto',)}")
+        return backend
+
+    if os.path.exists(ONNX_MODEL_PATHS["onnx"]) and importlib.util.find_spec("onnxruntime"):
+        return "onnx"
+    if os.path.exists(NUMPY_MODEL_PATH) and importlib.util.find_spec("scipy"):
+        return "numpy"
+    return "keras"
+
+
+_predictors = {}
+_engines = {}
+_engine_lock = threading.Lock()
+
+
+def get_predictor(backend):
+    """Predictor compartido sin TensorFlow: "numpy" u "onnx*"."""
+    if backend not in _predictors:
+        with _engine_lock:
+            if backend not in _predictors:
+                if backend == "numpy":
+                    _predictors[backend] = NumpyPredictor()
+                elif backend in ONNX_MODEL_PATHS:
+                    _predictors[backend] = OnnxPredictor(ONNX_MODEL_PATHS[backend])
+                else:
+                    raise ValueError(f"Backend sin predictor directo: {backend!r}")
+    return _predictors[backend]
+
+
+def get_numpy_predictor():
+    """Predictor NumPy compartido (no importa TensorFlow)."""
+    return get_predictor("numpy")
+
+
+def get_engine(backend=None):
+    """Motor de inferencia compartido por el proceso para el backend dado."""
+    backend = resolve_backend(backend)
+    if backend not in _engines:
+        with _engine_lock:
+            if backend not in _engines:
+                _engines[backend] = InferenceEngine(backend)
+    return _engines[backend]
+
 
-model = load_model(os.path.join(BASE_DIR, "solar_model.keras"))
-scaler = joblib.load(os.path.join(BASE_DIR, "solar_scaler.pkl"))
-
-target_norm = joblib.load(os.path.join(BASE_DIR, "target_norm.pkl"))
-y_mean = target_norm["y_mean"]
-y_std = target_norm["y_std"]
-
-FEATURE_COLS = [
-    "Cloud_Cover_Mean_24h",
-    "relative_humidity",
-    "temperature_2m_C",
-    "total_precipitation_sum",
-    "surface_pressure",
-    "elevation",
-    "sin_lat",
-    "cos_lat",
-    "sin_lon",
-    "cos_lon",
-    "sin_doy",
-    "cos_doy",
-    "dayofyear_norm",
-    "surface_net_solar_radiation_sum_lag1",
-    "temp_humidity_index",
-    "cloud_pressure_ratio"
-]
-
-def predict_from_dataframe(df):
-    X = df[FEATURE_COLS].values
-    X_scaled = scaler.transform(X)
-
-    y_pred_norm = model.predict(X_scaled, verbose=0).flatten()
-
-    # desnormalizar target
-    y_pred = y_pred_norm * y_std + y_mean
-
-    return y_pred
+def predict_from_dataframe(df, backend=None):
+    return get_engine(backend).predict_dataframe(df)
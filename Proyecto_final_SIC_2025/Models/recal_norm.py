@@ -1,76 +1,33 @@
+import sys
+import os
 import pandas as pd
 import numpy as np
 import joblib
 from sklearn.model_selection import train_test_split
 
-# ============================================
-# Cargar dataset
-# ============================================
-df = pd.read_csv("Datasets/solar_merged_clean.csv")
-
-# ============================================
-# Transformaciones geograficas
-# ============================================
-df["lat_rad"] = np.radians(df["lat"])
-df["lon_rad"] = np.radians(df["lon"])
-
-df["sin_lat"] = np.sin(df["lat_rad"])
-df["cos_lat"] = np.cos(df["lat_rad"])
-df["sin_lon"] = np.sin(df["lon_rad"])
-df["cos_lon"] = np.cos(df["lon_rad"])
-
-# ============================================
-# Transformaciones temporales
-# ============================================
-df["date"] = pd.to_datetime(df["date"], errors="coerce")
-
-df["dayofyear"] = df["date"].dt.dayofyear
-df["dayofyear_norm"] = df["dayofyear"] / 365.0
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
 
-df["sin_doy"] = np.sin(2 * np.pi * df["dayofyear"] / 365.0)
-df["cos_doy"] = np.cos(2 * np.pi * df["dayofyear"] / 365.0)
+from Models.features import build_features, valid_rows, TARGET_COL, LAG_COL
+from Models.lags import LagEngine
+from Storage.dataset_store import read_dataset, dataset_path
 
 # ============================================
-# Variables derivadas
+# Cargar dataset
 # ============================================
-df["surface_net_solar_radiation_sum_lag1"] = (
-    df["surface_net_solar_radiation_sum"].shift(1)
-)
-
-df["temp_humidity_index"] = (
-    df["temperature_2m_C"] * (df["relative_humidity"] / 100.0)
-)
-
-df["cloud_pressure_ratio"] = (
-    df["Cloud_Cover_Mean_24h"] / df["surface_pressure"]
-)
-
-df = df.dropna().reset_index(drop=True)
+df = read_dataset(dataset_path("solar_merged_clean"))
 
 # ============================================
-# Features y target
+# Features (modulo compartido con el entrenamiento y la prediccion)
 # ============================================
-feature_cols = [
-    "Cloud_Cover_Mean_24h",
-    "relative_humidity",
-    "temperature_2m_C",
-    "total_precipitation_sum",
-    "surface_pressure",
-    "elevation",
-    "sin_lat",
-    "cos_lat",
-    "sin_lon",
-    "cos_lon",
-    "sin_doy",
-    "cos_doy",
-    "dayofyear_norm",
-    "surface_net_solar_radiation_sum_lag1",
-    "temp_humidity_index",
-    "cloud_pressure_ratio"
-]
+df["date"] = pd.to_datetime(df["date"], errors="coerce")
+lag1 = LagEngine().transform(df)[LAG_COL]  # lag por ubicacion (lat, lon)
+X = build_features(df, lag1=lag1)
+y = df[TARGET_COL].to_numpy(dtype=np.float64)
 
-X = df[feature_cols]
-y = df["surface_net_solar_radiation_sum"].values
+valid = valid_rows(X, df) & np.isfinite(y)
+X = X[valid]
+y = y[valid]
 
 # ============================================
 # MISMO split que entrenamiento
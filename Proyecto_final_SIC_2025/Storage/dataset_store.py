@@ -0,0 +1,242 @@
+import hashlib
+import shutil
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DATASETS_DIR = ROOT_DIR / "Datasets"
+
+DATE_COL = "date"
+# Columna de particion (hive: <dataset>/month=YYYY-MM/part-*.parquet)
+PARTITION_COL = "month"
+# Coordenadas con 7 decimales: no caben en float32 sin perder la clave del pixel
+FLOAT64_COLS = {"lat", "lon"}
+BATCH_ROWS = 200_000
+
+
+def dataset_path(name):
+    """Ruta del dataset Parquet `name` dentro de Datasets/."""
+    return DATASETS_DIR / name
+
+
+def _csv_path(path):
+    path = Path(path)
+    if path.suffix == ".csv":
+        return path
+    # Compatibilidad: si el dataset Parquet no existe, se usa el CSV del mismo nombre
+    if not path.exists() and path.with_suffix(".csv").exists():
+        return path.with_suffix(".csv")
+    return None
+
+
+def to_storage_frame(df):
+    """
+    Tipos de almacenamiento: float32 (salvo FLOAT64_COLS), fecha categorica
+    'YYYY-MM-DD' y columna de mes para particionar.
+    """
+    out = {}
+    for col in df.columns:
+        values = df[col]
+        if col == DATE_COL:
+            # Se formatean solo las fechas unicas
+            codes, uniques = pd.factorize(pd.to_datetime(values, errors="coerce"))
+            labels = uniques.strftime("%Y-%m-%d")
+            if labels.is_unique:
+                out[col] = pd.Categorical.from_codes(codes, categories=labels)
+            else:
+                # Fechas con hora: varias se reducen al mismo dia
+                out[col] = pd.Categorical(np.append(np.asarray(labels, dtype=object), None)[codes])
+            months = np.append(np.asarray(uniques.strftime("%Y-%m"), dtype=object), None)
+            out[PARTITION_COL] = months[codes]
+        elif col == PARTITION_COL and DATE_COL in df.columns:
+            continue
+        elif pd.api.types.is_float_dtype(values) and col not in FLOAT64_COLS:
+            out[col] = values.astype(np.float32)
+        else:
+            out[col] = values
+    return pd.DataFrame(out, index=df.index)
+
+
+def _from_storage(df, parse_dates=True):
+    if DATE_COL in df.columns:
+        if PARTITION_COL in df.columns:
+            df = df.drop(columns=PARTITION_COL)
+        if parse_dates:
+            dates = df[DATE_COL].astype("category")
+            df[DATE_COL] = dates.cat.rename_categories(
+                pd.to_datetime(dates.cat.categories)
+            ).astype("datetime64[ns]")
+    elif PARTITION_COL in df.columns:
+        df[PARTITION_COL] = df[PARTITION_COL].astype(str)
+    return df
+
+
+class DatasetWriter:
+    """
+    Escribe un dataset Parquet (zstd) particionado por mes, bloque a bloque.
+    El esquema queda fijo con el primer bloque; los siguientes se convierten
+    a el. mode='overwrite' borra el dataset existente al primer bloque.
+    partition_cols agrega particiones hive ademas del mes (p. ej. teselas).
+    Si la ruta termina en .csv escribe un CSV (exportacion).
+    """
+
+    def __init__(self, path, mode="overwrite", partition_cols=(PARTITION_COL,)):
+        self.path = Path(path)
+        self.mode = mode
+        self.partition_cols = list(partition_cols)
+        self.schema = None
+        self._seq = 0
+        self._csv_started = False
+
+    def write(self, df):
+        if self.path.suffix == ".csv":
+            first = not self._csv_started and self.mode == "overwrite"
+            df.to_csv(self.path, mode="w" if first else "a", header=first, index=False)
+            self._csv_started = True
+            return
+
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        table = pa.Table.from_pandas(to_storage_frame(df), preserve_index=False)
+        if self.schema is None:
+            fields = []
+            for field in table.schema:
+                if pa.types.is_dictionary(field.type):
+                    # Indices fijos para que todos los archivos compartan esquema
+                    field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+                elif pa.types.is_large_string(field.type):
+                    field = field.with_type(pa.string())
+                fields.append(field)
+            self.schema = pa.schema(fields)
+            if self.mode == "overwrite" and self.path.exists():
+                shutil.rmtree(self.path)
+            self._seq = len(list(self.path.rglob("*.parquet"))) if self.path.exists() else 0
+        table = table.select(self.schema.names).cast(self.schema)
+
+        partitioning = None
+        fields = [self.schema.field(col) for col in self.partition_cols if col in self.schema.names]
+        if fields:
+            partitioning = ds.partitioning(pa.schema(fields), flavor="hive")
+        ds.write_dataset(
+            table, self.path, format="parquet", partitioning=partitioning,
+            basename_template=f"part-{self._seq:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        )
+        self._seq += 1
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_dataset(df, path):
+    """Guarda un DataFrame completo como dataset Parquet (o CSV si path termina en .csv)."""
+    with DatasetWriter(path) as writer:
+        writer.write(df)
+    return Path(path)
+
+
+def _open(path):
+    import pyarrow.dataset as ds
+    return ds.dataset(Path(path), format="parquet", partitioning="hive")
+
+
+def _month_filter(months):
+    import pyarrow.dataset as ds
+    return ds.field(PARTITION_COL).isin(list(months)) if months else None
+
+
+def read_dataset(path, columns=None, months=None, parse_dates=True):
+    """
+    Lee un dataset leyendo solo `columns` (projection pushdown) y solo las
+    particiones de `months` ('YYYY-MM'). Acepta tambien un CSV.
+    """
+    csv_path = _csv_path(path)
+    if csv_path is not None:
+        df = pd.read_csv(csv_path, usecols=columns)
+        if months and DATE_COL in df.columns:
+            df = df[pd.to_datetime(df[DATE_COL]).dt.strftime("%Y-%m").isin(months)]
+        if parse_dates and DATE_COL in df.columns:
+            df[DATE_COL] = pd.to_datetime(df[DATE_COL], errors="coerce")
+        return df.reset_index(drop=True)
+
+    table = _open(path).to_table(columns=columns, filter=_month_filter(months))
+    return _from_storage(table.to_pandas(), parse_dates)
+
+
+def iter_dataset(path, columns=None, months=None, batch_rows=BATCH_ROWS, parse_dates=True):
+    """
+    DataFrames de hasta batch_rows filas, en orden de mes y de escritura
+    (lectura en streaming; acepta tambien un CSV).
+    """
+    csv_path = _csv_path(path)
+    if csv_path is not None:
+        for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=batch_rows):
+            if months and DATE_COL in chunk.columns:
+                chunk = chunk[pd.to_datetime(chunk[DATE_COL]).dt.strftime("%Y-%m").isin(months)]
+            if parse_dates and DATE_COL in chunk.columns:
+                chunk[DATE_COL] = pd.to_datetime(chunk[DATE_COL], errors="coerce")
+            yield chunk
+        return
+
+    dataset = _open(path)
+    filt = _month_filter(months)
+    for fragment in sorted(dataset.get_fragments(filter=filt), key=lambda f: f.path):
+        for batch in fragment.to_batches(schema=dataset.schema, columns=columns,
+                                         filter=filt, batch_size=batch_rows):
+            if batch.num_rows:
+                yield _from_storage(batch.to_pandas(), parse_dates)
+
+
+def dataset_columns(path):
+    """Columnas disponibles en un dataset (o CSV) sin leer los datos."""
+    csv_path = _csv_path(path)
+    if csv_path is not None:
+        return list(pd.read_csv(csv_path, nrows=0).columns)
+    names = list(_open(path).schema.names)
+    # El mes derivado de la fecha es solo la particion
+    if DATE_COL in names and PARTITION_COL in names:
+        names.remove(PARTITION_COL)
+    return names
+
+
+def dataset_hash(path):
+    """sha256 del contenido del dataset (todos sus archivos) o del CSV."""
+    csv_path = _csv_path(path)
+    path = Path(csv_path if csv_path is not None else path)
+    files = [path] if path.is_file() else sorted(path.rglob("*.parquet"))
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(str(file.relative_to(path.parent)).encode())
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def import_csv(csv_path, path, batch_rows=BATCH_ROWS):
+    """Convierte un CSV a dataset Parquet por bloques. Devuelve el numero de filas."""
+    rows = 0
+    with DatasetWriter(path) as writer:
+        for chunk in pd.read_csv(csv_path, chunksize=batch_rows):
+            writer.write(chunk)
+            rows += len(chunk)
+    return rows
+
+
+def export_csv(path, csv_path, columns=None, batch_rows=BATCH_ROWS):
+    """Exporta un dataset Parquet a CSV por bloques. Devuelve el numero de filas."""
+    rows = 0
+    with DatasetWriter(csv_path) as writer:
+        for chunk in iter_dataset(path, columns=columns, batch_rows=batch_rows, parse_dates=False):
+            writer.write(chunk)
+            rows += len(chunk)
+    return rows
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+# Numero en formato JSON (admite exponente)
+_NUMBER = r"-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?"
+# Punto GeoJSON de la columna .geo de las exportaciones de GEE. \W* admite las
+# comillas duplicadas del CSV ("coordinates"":[...]) y espacios.
+POINT_PATTERN = rf"coordinates\W*\[\s*(?P<lon>{_NUMBER})\s*,\s*(?P<lat>{_NUMBER})\s*\]"
+
+
+def extract_point_coords(values):
+    """
+    Extrae lon/lat de una serie de cadenas GeoJSON Point en una sola pasada
+    (kernel de regex de Arrow; str.extract de pandas si no hay pyarrow).
+    Devuelve (lon, lat, malformadas): dos arreglos float64 y la mascara de
+    filas sin coordenadas validas (NaN en lon/lat).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        pa = None
+
+    if pa is not None:
+        values = pd.Series(values)
+        try:
+            array = pa.array(values, type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Valores no texto (p. ej. numeros) cuentan como malformados
+            values = values.where(values.map(type) == str)
+            array = pa.array(values, type=pa.string(), from_pandas=True)
+        matches = pc.extract_regex(array, POINT_PATTERN)
+        lon, lat = [
+            pc.cast(column, pa.float64()).to_numpy(zero_copy_only=False)
+            for column in matches.flatten()
+        ]
+    else:
+        parts = pd.Series(values, dtype="string").str.extract(POINT_PATTERN)
+        lon = pd.to_numeric(parts["lon"]).to_numpy(dtype=np.float64, na_value=np.nan)
+        lat = pd.to_numeric(parts["lat"]).to_numpy(dtype=np.float64, na_value=np.nan)
+
+    malformed = np.isnan(lon) | np.isnan(lat)
+    return lon, lat, malformed
+
+
+def report_malformed(values, malformed, max_examples=3):
+    """Imprime cuantas filas tienen .geo malformado y algunos ejemplos."""
+    count = int(np.count_nonzero(malformed))
+    if not count:
+        return
+    print(f"Filas con .geo malformado: {count}")
+    examples = pd.Series(values)[malformed].head(max_examples)
+    for index, value in examples.items():
+        print(f"  fila {index}: {str(value)[:80]!r}")
@@ -0,0 +1,23 @@
+import numpy as np
+
+# Malla de las exportaciones de GEE: escala de 10 km expresada en grados
+# (metros por grado en el ecuador, EPSG:3857)
+GRID_RES = 10000 / 111319.49079327357
+
+
+def pixel_ids(lon, lat, grid_res=GRID_RES):
+    """Id entero compacto de la celda de la malla (global, igual para todas las fuentes)."""
+    rows = int(np.ceil(180.0 / grid_res))
+    i = np.floor((np.asarray(lon) + 180.0) / grid_res).astype(np.int64)
+    j = np.floor((np.asarray(lat) + 90.0) / grid_res).astype(np.int64)
+    return i * rows + j
+
+
+def pixel_bounds(keys, grid_res=GRID_RES):
+    """Caja (min_lon, min_lat, max_lon, max_lat) de cada celda, inversa de pixel_ids."""
+    rows = int(np.ceil(180.0 / grid_res))
+    keys = np.asarray(keys, dtype=np.int64)
+    i, j = keys // rows, keys % rows
+    min_lon = i * grid_res - 180.0
+    min_lat = j * grid_res - 90.0
+    return min_lon, min_lat, min_lon + grid_res, min_lat + grid_res
@@ -1,70 +1,112 @@
 import sys
 import os
-import pandas as pd
+import time
+
 import numpy as np
+import pandas as pd
 
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(ROOT_DIR)
 
-from Models.predict import predict_from_dataframe
+from Models.features import build_features, valid_rows, LAG_COL
+from Models.lags import LagEngine
+from Models.predict import get_engine
+from Storage.dataset_store import dataset_path, iter_dataset, DatasetWriter
 
-# ============================================
-# Cargar dataset
-# ============================================
-df = pd.read_csv("Datasets/solar_merged_clean.csv")
+# Datasets Parquet en Datasets/ (la entrada puede ser tambien un CSV)
+INPUT_PATH = dataset_path("solar_merged_clean")
+OUTPUT_PATH = dataset_path("solar_with_predictions")
+CHUNK_ROWS = 200_000
+SUMMARY_COLS = ["surface_net_solar_radiation_sum", "radiation_pred"]
 
-# ============================================
-# Transformaciones geograficas
-# ============================================
-df["lat_rad"] = np.radians(df["lat"])
-df["lon_rad"] = np.radians(df["lon"])
 
-df["sin_lat"] = np.sin(df["lat_rad"])
-df["cos_lat"] = np.cos(df["lat_rad"])
-df["sin_lon"] = np.sin(df["lon_rad"])
-df["cos_lon"] = np.cos(df["lon_rad"])
+class RunningStats:
+    """
+    count, mean, std, min y max de una columna acumulados bloque a bloque
+    (combinacion de medias y varianzas por bloque, sin guardar los valores).
+    """
 
-# ============================================
-# Transformaciones temporales
-# ============================================
-df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        n = values.size
+        if n == 0:
+            return
+        mean = values.mean()
+        delta = mean - self.mean
+        total = self.count + n
+        self.m2 += ((values - mean) ** 2).sum() + delta ** 2 * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
 
-df["dayofyear"] = df["date"].dt.dayofyear
-df["dayofyear_norm"] = df["dayofyear"] / 365.0
+    def describe(self):
+        std = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+        empty = self.count == 0
+        return pd.Series({
+            "count": float(self.count),
+            "mean": np.nan if empty else self.mean,
+            "std": std,
+            "min": np.nan if empty else self.min,
+            "max": np.nan if empty else self.max,
+        })
 
-df["sin_doy"] = np.sin(2 * np.pi * df["dayofyear"] / 365.0)
-df["cos_doy"] = np.cos(2 * np.pi * df["dayofyear"] / 365.0)
 
 # ============================================
-# Variables derivadas
+# Predicciones en streaming
 # ============================================
-df["surface_net_solar_radiation_sum_lag1"] = (
-    df["surface_net_solar_radiation_sum"].shift(1)
-)
+def score_stream(input_path=INPUT_PATH, output_path=OUTPUT_PATH, chunk_rows=CHUNK_ROWS, backend=None):
+    """
+    Features y prediccion bloque por bloque. El lag por ubicacion se arrastra
+    entre bloques (LagEngine.update), asi que la memoria depende del tamaño
+    del bloque y del numero de ubicaciones, no del largo del archivo.
+    Devuelve el numero de filas escritas.
+    """
+    lags = LagEngine()
+    engine = get_engine(backend)
+    writer = DatasetWriter(output_path)
 
-df["temp_humidity_index"] = (
-    df["temperature_2m_C"] * (df["relative_humidity"] / 100.0)
-)
+    rows_in = rows_out = 0
+    head = None
+    stats = {col: RunningStats() for col in SUMMARY_COLS}
+    t0 = time.perf_counter()
+    try:
+        for chunk in iter_dataset(input_path, batch_rows=chunk_rows):
+            rows_in += len(chunk)
+            X = build_features(chunk, lag1=lags.update(chunk)[LAG_COL])
 
-df["cloud_pressure_ratio"] = (
-    df["Cloud_Cover_Mean_24h"] / df["surface_pressure"]
-)
+            # Limpiar NaN
+            valid = valid_rows(X, chunk)
+            chunk = chunk[valid].reset_index(drop=True)
+            chunk["radiation_pred"] = engine.predict(X[valid])
 
-# ============================================
-# Limpiar NaN
-# ============================================
-df = df.dropna().reset_index(drop=True)
+            writer.write(chunk)
+            rows_out += len(chunk)
+            if head is None and len(chunk):
+                head = chunk[SUMMARY_COLS].head()
+            for col, col_stats in stats.items():
+                col_stats.update(chunk[col].to_numpy())
+            elapsed = time.perf_counter() - t0
+            print(f"{rows_in:,} filas leidas, {rows_out:,} con prediccion "
+                  f"({rows_in / elapsed:,.0f} filas/s)")
+    finally:
+        writer.close()
 
-# ============================================
-# Predicciones
-# ============================================
-df["radiation_pred"] = predict_from_dataframe(df)
+    print(f"Dataset con predicciones generado correctamente: {output_path} "
+          f"({rows_out:,} filas en {time.perf_counter() - t0:.1f} s)")
+    if head is not None:
+        print(head)
+    print(pd.DataFrame({col: col_stats.describe() for col, col_stats in stats.items()}))
+    return rows_out
 
-# ============================================
-# Guardar resultado
-# ============================================
-df.to_csv("Datasets/solar_with_predictions.csv", index=False)
 
-print("Dataset con predicciones generado correctamente")
-print(df[["surface_net_solar_radiation_sum", "radiation_pred"]].head())
-print(df[["surface_net_solar_radiation_sum", "radiation_pred"]].describe())
\ No newline at end of file
+if __name__ == "__main__":
+    score_stream()
@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import json
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from Visualization.corregimientos_map import (
+    GEOJSON_PATH, PREDICTIONS_PATH, MAP_VARS, MapConfig, _build_stats, _build_filled,
+    _build_geometry, _build_html, _write_table,
+)
+
+REPORT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "map_report.csv")
+# Objetivos del HTML exportado
+TARGET_HTML_MB = 1.5
+TARGET_RENDER_MS = 2000
+GEOMETRY_ZOOMS = (None, 10, 9, 8, 7)
+
+
+def _filled_table(work_dir):
+    """Tabla rellenada real (dataset de predicciones) o sintetica si no existe."""
+    path = work_dir / "filled.parquet"
+    try:
+        _build_stats(work_dir / "stats.parquet", PREDICTIONS_PATH, GEOJSON_PATH)
+        _build_filled(path, work_dir / "stats.parquet", GEOJSON_PATH)
+        return path
+    except (FileNotFoundError, OSError) as e:
+        print(f"Sin dataset de predicciones ({e}); valores sinteticos")
+
+    with open(GEOJSON_PATH, encoding="utf-8") as f:
+        props = pd.DataFrame([ft["properties"] for ft in json.load(f)["features"]])
+    table = props[["ID_CORR", "Provincia", "Corregimiento"]].astype({"ID_CORR": str})
+    rng = np.random.default_rng(0)
+    for c in MAP_VARS:
+        table[c + "_filled"] = rng.random(len(table)) * 100
+    _write_table(table, path, center_lat=8.5, center_lon=-80.0)
+    return path
+
+
+def render_ms(html_path, timeout_ms=60000):
+    """
+    Tiempo hasta que Plotly dibuja el mapa en Chromium headless (playwright).
+    NaN si playwright/Chromium no estan disponibles o no hay red (plotly.js
+    se carga del CDN).
+    """
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        return float("nan")
+
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            t0 = time.perf_counter()
+            page.goto(Path(html_path).absolute().as_uri())
+            page.wait_for_function(
+                "() => { const gd = document.querySelector('.js-plotly-plot');"
+                " return gd && gd._fullLayout && document.querySelector('.mapboxgl-canvas'); }",
+                timeout=timeout_ms,
+            )
+            elapsed = (time.perf_counter() - t0) * 1000.0
+            browser.close()
+            return elapsed
+    except Exception as e:
+        print(f"  render no medido: {e}")
+        return float("nan")
+
+
+def run_report(zooms=GEOMETRY_ZOOMS):
+    """
+    Tamaño del HTML, vertices y tiempo de render para la geometria completa y
+    para cada zoom de simplificacion, contra TARGET_HTML_MB y TARGET_RENDER_MS.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        filled_path = _filled_table(work_dir)
+
+        for zoom in zooms:
+            config = MapConfig(height=700, geometry_zoom=zoom)
+            geometry_path = work_dir / f"geometry-{zoom}.json"
+            html_path = work_dir / f"map-{zoom}.html"
+
+            t0 = time.perf_counter()
+            _build_geometry(geometry_path, GEOJSON_PATH, zoom)
+            geometry_s = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            _build_html(html_path, filled_path, geometry_path, config)
+            html_s = time.perf_counter() - t0
+
+            with open(geometry_path, encoding="utf-8") as f:
+                features = json.load(f)["features"]
+            vertices = sum(len(ring) for ft in features
+                           for poly in (ft["geometry"]["coordinates"] if ft["geometry"]["type"] == "MultiPolygon"
+                                        else [ft["geometry"]["coordinates"]])
+                           for ring in poly)
+            html_mb = html_path.stat().st_size / 1e6
+            render = render_ms(html_path)
+            rows.append({
+                "geometry": "completa" if zoom is None else f"zoom {zoom}",
+                "vertices": vertices,
+                "html_mb": html_mb,
+                "geometry_s": geometry_s,
+                "html_s": html_s,
+                "render_ms": render,
+                "meets_size": html_mb <= TARGET_HTML_MB,
+                "meets_render": bool(render <= TARGET_RENDER_MS) if not np.isnan(render) else None,
+            })
+
+    report = pd.DataFrame(rows)
+    print(f"Objetivos: HTML <= {TARGET_HTML_MB} MB, render <= {TARGET_RENDER_MS} ms")
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.3g}"))
+    report.to_csv(REPORT_PATH, index=False)
+    print(f"Reporte guardado en {REPORT_PATH}")
+    return report
+
+
+if __name__ == "__main__":
+    run_report()
@@ -0,0 +1,27 @@
+import hashlib
+import json
+import numpy as np
+
+from Storage.dataset_store import DATASETS_DIR
+
+BOUNDARIES_PATH = DATASETS_DIR / "Panama_Boundaries.geojson"
+
+
+def file_hash(path):
+    """sha256 del archivo (invalida los caches derivados si cambian los limites)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_boundaries(boundaries_path=BOUNDARIES_PATH):
+    """IDs (ID_CORR) y geometrias shapely de los corregimientos."""
+    from shapely.geometry import shape
+
+    with open(boundaries_path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    ids = np.array([str(ft["properties"]["ID_CORR"]) for ft in features])
+    geoms = [shape(ft["geometry"]) for ft in features]
+    return ids, geoms
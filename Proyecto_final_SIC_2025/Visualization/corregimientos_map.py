@@ -1,69 +1,381 @@
 import pandas as pd
-import geopandas as gpd
 import json
 import plotly.express as px
 import numpy as np
 from pathlib import Path
 import os
 import time
-from dataclasses import dataclass
+import hashlib
+import shutil
+from dataclasses import dataclass, asdict
 from typing import Dict, Optional, Union
-from pathlib import Path
-import numpy as np
-import plotly.express as px
 from plotly.subplots import make_subplots
-
-def generate_and_save_map(force_regeneration=False):
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from Storage.dataset_store import dataset_path, read_dataset, dataset_hash
+from Visualization.corr_index import file_hash
+from Visualization.zonal_stats import ZonalWeights
+from Visualization.topology import DEFAULT_ZOOM, simplified_geojson
+
+# Variables promediadas por corregimiento
+MAP_VARS = [
+    'Cloud_Cover_Mean_24h', 'elevation', 'relative_humidity',
+    'surface_net_solar_radiation_sum', 'surface_pressure',
+    'temperature_2m_C', 'total_precipitation_sum',
+    'wind_direction', 'wind_speed', "radiation_pred"
+]
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DATA_PATH = PROJECT_ROOT / "Datasets"
+GEOJSON_PATH = DATA_PATH / "Panama_Boundaries.geojson"
+PREDICTIONS_PATH = dataset_path("solar_with_predictions")
+OUTPUT_FILE = PROJECT_ROOT / "solar_radiation_map_cache.html"
+# Artefactos intermedios del mapa, con nombre <etapa>-<hash>
+CACHE_DIR = PROJECT_ROOT / "map_cache"
+CACHE_KEEP = 4
+
+ColorscaleType = Union[str, list]
+
+@dataclass
+class MapConfig:
+    mapbox_style: str = "open-street-map"
+    zoom: float = 6
+    opacity: float = 0.75
+    height: int = 700
+    color_scale: Optional[list] = None
+    margin: Optional[dict] = None
+    # Geometria simplificada para este zoom (None = limites completos)
+    geometry_zoom: Optional[float] = DEFAULT_ZOOM
+    # Decimales de los valores embebidos en el HTML (z y hover)
+    value_decimals: int = 2
+
+    def __post_init__(self):
+        if self.color_scale is None:
+            self.color_scale = [(0.0, "#88FF00"), (0.3, "#FFA500"), (1.0, "#FF0000")]
+        if self.margin is None:
+            self.margin = dict(r=0, t=0, l=0, b=0)
+
+
+class ChoroplethMapBuilder:
     """
-    Genera el mapa interactivo de Plotly y lo guarda como un archivo HTML.
-    Utiliza un mecanismo de caché para evitar regenerar el archivo si ya existe.
+    Construye y exporta un choropleth mapbox a HTML (sin servidor).
+    La interactividad es client-side vía Plotly updatemenus (HTML estático).
     """
-    
-    # 1. ESTABLECER RUTAS
-    PROJECT_ROOT = Path(__file__).resolve().parent.parent 
-    DATA_PATH = PROJECT_ROOT / "Datasets"
-    OUTPUT_FILE = PROJECT_ROOT / "solar_radiation_map_cache.html"
-    
-    # 2. VERIFICAR CACHE
-    if OUTPUT_FILE.exists() and not force_regeneration:
-        print(f"DEBUG: Mapa cargado desde caché: {OUTPUT_FILE.name}")
-        return OUTPUT_FILE
-        
-    start_time = time.time()
-    
-    try:
-        csv_path = str(DATA_PATH / "solar_with_predictions.csv")
-        geojson_path = str(DATA_PATH / "Panama_Boundaries.geojson")
-        
-        # Lectura de archivos 
-        df = pd.read_csv(csv_path)
-        panama_map_data = json.load(open(geojson_path, encoding="utf-8"))
-        gdf_bound = gpd.read_file(geojson_path, encoding="utf-8") 
 
-    except FileNotFoundError as e:
-        print(f"ERROR FATAL: Archivo no encontrado. Asegúrate de que la ruta sea correcta. Error: {e}")
-        raise FileNotFoundError(f"Asegúrate de que la carpeta 'Datasets' exista y contenga los archivos requeridos. Ruta base: {DATA_PATH.absolute()}")
+    def __init__(
+        self,
+        gdf_bound2,
+        geojson_data: Dict,
+        center_lat: float,
+        center_lon: float,
+        config: Optional[MapConfig] = None
+    ):
+        self.gdf = gdf_bound2
+        self.geojson = geojson_data
+        self.center = {"lat": float(center_lat), "lon": float(center_lon)}
+        self.config = config or MapConfig()
+        self.fig = None
+
+        self._default_featureidkey = "properties.ID_CORR"
+        self._default_locations = "ID_CORR"
+
+    def build_base(
+        self,
+        color_col: str,
+        hover_name: str = "Corregimiento",
+        hover_data: Optional[Dict] = None,
+        title: Optional[str] = None,
+    ):
+        if hover_data is None:
+            hover_data = {"Provincia": True, color_col: ":.2f"}
+
+        self.fig = px.choropleth_mapbox(
+            self.gdf,
+            geojson=self.geojson,
+            locations=self._default_locations,
+            featureidkey=self._default_featureidkey,
+            color=color_col,
+            mapbox_style=self.config.mapbox_style,
+            zoom=self.config.zoom,
+            center=self.center,
+            opacity=self.config.opacity,
+            height=self.config.height,
+            color_continuous_scale=self.config.color_scale,
+            hover_name=hover_name,
+            hover_data=hover_data,
+            title=title
+        )
+        self.fig.update_layout(margin=self.config.margin)
+        return self
+
+    def add_variable_selector(
+        self,
+        variables: Dict[str, str],
+        default: Optional[str] = None,
+        dropdown_title: str = "Variable",
+        x: float = 0.01,
+        y: float = 0.99
+    ):
+        if self.fig is None:
+            raise RuntimeError("Primero llama build_base() antes de add_variable_selector().")
+        if not variables:
+            raise ValueError("variables está vacío.")
+
+        missing = [c for c in variables.keys() if c not in self.gdf.columns]
+        if missing:
+            raise ValueError(f"Estas columnas no existen en el GeoDataFrame: {missing}")
+
+        if default is None:
+            default = next(iter(variables.keys()))
+        if default not in variables:
+            raise ValueError(f"default='{default}' no está dentro de variables.")
+
+        z0 = np.round(np.nan_to_num(self.gdf[default].to_numpy(), nan=0.0), self.config.value_decimals)
+        self.fig.data[0].z = z0
+        self.fig.update_layout(coloraxis_colorbar=dict(title=variables[default]))
+
+        buttons = []
+        for col, label in variables.items():
+            z = np.round(np.nan_to_num(self.gdf[col].to_numpy(), nan=0.0), self.config.value_decimals)
+            buttons.append(
+                dict(
+                    label=label,
+                    method="update",
+                    args=[
+                        {"z": [z]},
+                        {"coloraxis": {"colorbar": {"title": {"text": label}}}}
+                    ],
+                )
+            )
 
-    # --- PROCESAMIENTO DE DATOS ---
-    vars_mean = [
-        'Cloud_Cover_Mean_24h', 'elevation', 'relative_humidity',
-        'surface_net_solar_radiation_sum', 'surface_pressure',
-        'temperature_2m_C', 'total_precipitation_sum',
-        'wind_direction', 'wind_speed', "radiation_pred"
-    ]
-    
-    gdf_points = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df['lon'], df['lat']), crs="EPSG:4326")
-    joined = gpd.sjoin(gdf_points, gdf_bound, how="left", predicate="within")
-
-    base = gdf_bound[["ID_CORR", "Provincia", 'Corregimiento']].copy()
-    base["ID_CORR"] = base["ID_CORR"].astype(str)
-    joined["ID_CORR"] = joined["ID_CORR"].astype(str)
+        # Merge con updatemenus existentes si ya había (ej. paletas)
+        existing = list(self.fig.layout.updatemenus) if self.fig.layout.updatemenus else []
+        existing.append(
+            dict(
+                type="dropdown",
+                direction="down",
+                x=x, y=y,
+                xanchor="left", yanchor="top",
+                showactive=True,
+                buttons=buttons,
+                bgcolor="rgba(255,255,255,0.85)",
+                bordercolor="rgba(0,0,0,0.2)",
+                borderwidth=1,
+            )
+        )
+
+        ann = list(self.fig.layout.annotations) if self.fig.layout.annotations else []
+        ann.append(
+            dict(
+                text=dropdown_title,
+                x=x, y=y + 0.045,
+                xref="paper", yref="paper",
+                showarrow=False,
+                align="left",
+                font=dict(size=12),
+            )
+        )
+
+        self.fig.update_layout(updatemenus=existing, annotations=ann)
+        return self
+
+    def add_colorscale_selector(
+        self,
+        scales: Dict[str, ColorscaleType],
+        default_key: Optional[str] = None,
+        dropdown_title: str = "Paleta",
+        x: float = 0.22,
+        y: float = 0.99
+    ):
+        if self.fig is None:
+            raise RuntimeError("Primero llama build_base() antes de add_colorscale_selector().")
+        if not scales:
+            raise ValueError("scales está vacío.")
+
+        if default_key is None:
+            default_key = next(iter(scales.keys()))
+        if default_key not in scales:
+            raise ValueError(f"default_key='{default_key}' no está dentro de scales.")
+
+        self.fig.update_layout(coloraxis=dict(colorscale=scales[default_key]))
+
+        buttons = []
+        for key, scale_value in scales.items():
+            buttons.append(
+                dict(
+                    label=key,
+                    method="relayout",
+                    args=[{"coloraxis.colorscale": scale_value}],
+                )
+            )
 
-    corr_stats = (
-        joined.groupby("ID_CORR")
-        .agg({c: "mean" for c in vars_mean})
-        .reset_index()
-    )
+        existing = list(self.fig.layout.updatemenus) if self.fig.layout.updatemenus else []
+        existing.append(
+            dict(
+                type="dropdown",
+                direction="down",
+                x=x, y=y,
+                xanchor="left", yanchor="top",
+                showactive=True,
+                buttons=buttons,
+                bgcolor="rgba(255,255,255,0.85)",
+                bordercolor="rgba(0,0,0,0.2)",
+                borderwidth=1,
+            )
+        )
+
+        ann = list(self.fig.layout.annotations) if self.fig.layout.annotations else []
+        ann.append(
+            dict(
+                text=dropdown_title,
+                x=x, y=y + 0.045,
+                xref="paper", yref="paper",
+                showarrow=False,
+                align="left",
+                font=dict(size=12),
+            )
+        )
+
+        self.fig.update_layout(updatemenus=existing, annotations=ann)
+        return self
+
+    # Exporta el cache del mapa en html
+    def export_html(self, output_path, include_plotlyjs: str = "cdn", full_html: bool = True):
+        if self.fig is None:
+            raise RuntimeError("No hay figura. Llama build_base() antes de export_html().")
+        self.fig.write_html(str(output_path), include_plotlyjs=include_plotlyjs, full_html=full_html)
+        return output_path
+
+VARIABLES = {
+    "radiation_pred_filled": "Radiación (pred)",
+    "temperature_2m_C_filled": "Temperatura (°C)",
+    "relative_humidity_filled": "Humedad relativa (%)",
+    "Cloud_Cover_Mean_24h_filled": "Cobertura nubosa (24h)",
+    "wind_speed_filled": "Velocidad del viento",
+    "surface_pressure_filled": "Presión superficial"
+}
+
+PANEL_FIELDS = {
+    "Provincia": "Provincia",
+    "Distrito": "Distrito",
+    "Corregimiento": "Corregimiento",
+    "radiation_pred_filled": "Radiación (pred)",
+    "temperature_2m_C_filled": "Temperatura (°C)",
+    "relative_humidity_filled": "Humedad (%)",
+    "Cloud_Cover_Mean_24h_filled": "Nubosidad (24h)",
+    "elevation_filled": "Elevación (m)"
+}
+
+HOVER_DATA = {
+    "ID_CORR": False,
+    "Provincia": True,
+    "radiation_pred_filled": ":.2f",
+    "Cloud_Cover_Mean_24h_filled": ":.2f",
+    "elevation_filled": ":.0f",
+    "relative_humidity_filled": ":.2f",
+    "temperature_2m_C_filled": ":.2f",
+}
+
+PRESET = [(0.0, "#88FF00"), (0.3, "#FFA500"), (1.0, "#FF0000")]
+
+PALETTE_OPTIONS = {
+    "Solar Potential Scale": PRESET,
+    "Thermal Intensity Scale": "YlOrRd",
+    "Perceptual Uniform Scale": "Cividis",
+    "Environmental Gradient": "Viridis",
+}
+
+
+# ============================================
+# Cache de artefactos
+# ============================================
+def content_key(*parts):
+    """Hash corto de las partes (hashes de entrada, parametros, config)."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class MapCache:
+    """
+    Artefactos del mapa direccionados por contenido: cada etapa guarda
+    CACHE_DIR/<etapa>-<clave><ext> y solo se recalcula si cambia su clave.
+    Se conservan los `keep` artefactos mas recientes de cada etapa.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, keep=CACHE_KEEP):
+        self.cache_dir = Path(cache_dir)
+        self.keep = keep
+
+    def get(self, stage, key, suffix, build, force=False):
+        """Ruta del artefacto; lo construye con build(ruta) si falta (o force)."""
+        path = self.cache_dir / f"{stage}-{key}{suffix}"
+        if path.exists() and not force:
+            print(f"DEBUG: {stage} desde caché: {path.name}")
+            return path
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Se escribe a un temporal: un artefacto a medias nunca queda con el nombre final
+        tmp = path.with_name(f".{path.name}.tmp")
+        build(tmp)
+        os.replace(tmp, path)
+        self._prune(stage, suffix)
+        return path
+
+    def _prune(self, stage, suffix):
+        old = sorted(self.cache_dir.glob(f"{stage}-*{suffix}"), key=lambda p: p.stat().st_mtime)
+        for path in old[:-self.keep]:
+            path.unlink(missing_ok=True)
+
+
+def _write_table(df, path, **meta):
+    """Parquet con metadatos extra (p. ej. el centro del mapa)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"map_meta"] = json.dumps(meta).encode("utf-8")
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+def _read_table(path):
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    meta = json.loads(table.schema.metadata.get(b"map_meta", b"{}"))
+    return table.to_pandas(), meta
+
+
+# ============================================
+# Etapas
+# ============================================
+def _build_stats(path, predictions_path, geojson_path):
+    """Promedios por corregimiento (ponderados por area) y centro del mapa."""
+    # Lectura de archivos: solo coordenadas y variables del mapa
+    # (dataset Parquet de add_predictions.py, o el CSV si no existe)
+    df = read_dataset(predictions_path, columns=["lon", "lat"] + MAP_VARS)
+
+    # Promedio por corregimiento ponderado por el area de cada celda de la
+    # malla que toca (pesos precalculados; un producto disperso por mapa)
+    zonal = ZonalWeights.from_points(df["lon"].to_numpy(), df["lat"].to_numpy(),
+                                     boundaries_path=geojson_path)
+    corr_stats = zonal.zonal_means(df, MAP_VARS)
+    _write_table(corr_stats, path, center_lat=float(df["lat"].mean()),
+                 center_lon=float(df["lon"].mean()))
+
+
+def _build_filled(path, stats_path, geojson_path):
+    """Tabla por corregimiento con los huecos rellenados (provincia, luego global)."""
+    corr_stats, meta = _read_table(stats_path)
+    vars_mean = MAP_VARS
+
+    with open(geojson_path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    base = pd.DataFrame([ft["properties"] for ft in features])[["ID_CORR", "Provincia", "Corregimiento"]]
+    base["ID_CORR"] = base["ID_CORR"].astype(str)
 
     full = base.merge(corr_stats, on="ID_CORR", how="left")
 
@@ -85,290 +397,111 @@ def generate_and_save_map(force_regeneration=False):
 
     filled_cols = [c + "_filled" for c in vars_mean]
     to_merge = ["ID_CORR", "Provincia", "Corregimiento"] + filled_cols
+    _write_table(full[to_merge], path, **meta)
 
-    gdf_bound["ID_CORR"] = gdf_bound["ID_CORR"].astype(str)
-    gdf_bound2 = gdf_bound.merge(full[to_merge], on="ID_CORR", how="left", suffixes=("", "_dup"))
 
-    for col in ["Provincia", "Corregimiento"]:
-        dup = col + "_dup"
-        if dup in gdf_bound2.columns:
-            gdf_bound2[col] = gdf_bound2[col].fillna(gdf_bound2[dup])
-            gdf_bound2.drop(columns=[dup], inplace=True)
-            
-    # --- PLOTTING ---
+def _build_geometry(path, geojson_path, zoom=DEFAULT_ZOOM):
+    """
+    GeoJSON del mapa con ID_CORR como texto (featureidkey). Con `zoom` se usa
+    la geometria simplificada y cuantizada (topology.py) en vez de la completa.
+    """
+    if zoom is None:
+        with open(geojson_path, encoding="utf-8") as f:
+            panama_map_data = json.load(f)
+    else:
+        panama_map_data = simplified_geojson(geojson_path, zoom)
+
     for ft in panama_map_data.get("features", []):
         props = ft.get("properties", {})
         if "ID_CORR" in props and props["ID_CORR"] is not None:
             props["ID_CORR"] = str(props["ID_CORR"])
 
-    PROJECT_ROOT = Path.cwd()
-    OUTPUT_FILE = PROJECT_ROOT / "test_map.html"
-
-    ColorscaleType = Union[str, list]
-
-    @dataclass
-    class MapConfig:
-        mapbox_style: str = "open-street-map"
-        zoom: float = 6
-        opacity: float = 0.75
-        height: int = 700
-        color_scale: Optional[list] = None
-        margin: Optional[dict] = None
-
-        def __post_init__(self):
-            if self.color_scale is None:
-                self.color_scale = [(0.0, "#88FF00"), (0.3, "#FFA500"), (1.0, "#FF0000")]
-            if self.margin is None:
-                self.margin = dict(r=0, t=0, l=0, b=0)
-
-
-    class ChoroplethMapBuilder:
-        """
-        Construye y exporta un choropleth mapbox a HTML (sin servidor).
-        La interactividad es client-side vía Plotly updatemenus (HTML estático).
-        """
-
-        def __init__(
-            self,
-            gdf_bound2,
-            geojson_data: Dict,
-            center_lat: float,
-            center_lon: float,
-            config: Optional[MapConfig] = None
-        ):
-            self.gdf = gdf_bound2
-            self.geojson = geojson_data
-            self.center = {"lat": float(center_lat), "lon": float(center_lon)}
-            self.config = config or MapConfig()
-            self.fig = None
-
-            self._default_featureidkey = "properties.ID_CORR"
-            self._default_locations = "ID_CORR"
-
-        def build_base(
-            self,
-            color_col: str,
-            hover_name: str = "Corregimiento",
-            hover_data: Optional[Dict] = None,
-            title: Optional[str] = None,
-        ):
-            if hover_data is None:
-                hover_data = {"Provincia": True, color_col: ":.2f"}
-
-            self.fig = px.choropleth_mapbox(
-                self.gdf,
-                geojson=self.geojson,
-                locations=self._default_locations,
-                featureidkey=self._default_featureidkey,
-                color=color_col,
-                mapbox_style=self.config.mapbox_style,
-                zoom=self.config.zoom,
-                center=self.center,
-                opacity=self.config.opacity,
-                height=self.config.height,
-                color_continuous_scale=self.config.color_scale,
-                hover_name=hover_name,
-                hover_data=hover_data,
-                title=title
-            )
-            self.fig.update_layout(margin=self.config.margin)
-            return self
-
-        def add_variable_selector(
-            self,
-            variables: Dict[str, str],
-            default: Optional[str] = None,
-            dropdown_title: str = "Variable",
-            x: float = 0.01,
-            y: float = 0.99
-        ):
-            if self.fig is None:
-                raise RuntimeError("Primero llama build_base() antes de add_variable_selector().")
-            if not variables:
-                raise ValueError("variables está vacío.")
-
-            missing = [c for c in variables.keys() if c not in self.gdf.columns]
-            if missing:
-                raise ValueError(f"Estas columnas no existen en el GeoDataFrame: {missing}")
-
-            if default is None:
-                default = next(iter(variables.keys()))
-            if default not in variables:
-                raise ValueError(f"default='{default}' no está dentro de variables.")
-
-            z0 = np.nan_to_num(self.gdf[default].to_numpy(), nan=0.0)
-            self.fig.data[0].z = z0
-            self.fig.update_layout(coloraxis_colorbar=dict(title=variables[default]))
-
-            buttons = []
-            for col, label in variables.items():
-                z = np.nan_to_num(self.gdf[col].to_numpy(), nan=0.0)
-                buttons.append(
-                    dict(
-                        label=label,
-                        method="update",
-                        args=[
-                            {"z": [z]},
-                            {"coloraxis": {"colorbar": {"title": {"text": label}}}}
-                        ],
-                    )
-                )
-
-            # Merge con updatemenus existentes si ya había (ej. paletas)
-            existing = list(self.fig.layout.updatemenus) if self.fig.layout.updatemenus else []
-            existing.append(
-                dict(
-                    type="dropdown",
-                    direction="down",
-                    x=x, y=y,
-                    xanchor="left", yanchor="top",
-                    showactive=True,
-                    buttons=buttons,
-                    bgcolor="rgba(255,255,255,0.85)",
-                    bordercolor="rgba(0,0,0,0.2)",
-                    borderwidth=1,
-                )
-            )
-
-            ann = list(self.fig.layout.annotations) if self.fig.layout.annotations else []
-            ann.append(
-                dict(
-                    text=dropdown_title,
-                    x=x, y=y + 0.045,
-                    xref="paper", yref="paper",
-                    showarrow=False,
-                    align="left",
-                    font=dict(size=12),
-                )
-            )
-
-            self.fig.update_layout(updatemenus=existing, annotations=ann)
-            return self
-
-        def add_colorscale_selector(
-            self,
-            scales: Dict[str, ColorscaleType],
-            default_key: Optional[str] = None,
-            dropdown_title: str = "Paleta",
-            x: float = 0.22,
-            y: float = 0.99
-        ):
-            if self.fig is None:
-                raise RuntimeError("Primero llama build_base() antes de add_colorscale_selector().")
-            if not scales:
-                raise ValueError("scales está vacío.")
-
-            if default_key is None:
-                default_key = next(iter(scales.keys()))
-            if default_key not in scales:
-                raise ValueError(f"default_key='{default_key}' no está dentro de scales.")
-
-            self.fig.update_layout(coloraxis=dict(colorscale=scales[default_key]))
-
-            buttons = []
-            for key, scale_value in scales.items():
-                buttons.append(
-                    dict(
-                        label=key,
-                        method="relayout",
-                        args=[{"coloraxis.colorscale": scale_value}],
-                    )
-                )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(panama_map_data, f, ensure_ascii=False, separators=(",", ":"))
 
-            existing = list(self.fig.layout.updatemenus) if self.fig.layout.updatemenus else []
-            existing.append(
-                dict(
-                    type="dropdown",
-                    direction="down",
-                    x=x, y=y,
-                    xanchor="left", yanchor="top",
-                    showactive=True,
-                    buttons=buttons,
-                    bgcolor="rgba(255,255,255,0.85)",
-                    bordercolor="rgba(0,0,0,0.2)",
-                    borderwidth=1,
-                )
-            )
 
-            ann = list(self.fig.layout.annotations) if self.fig.layout.annotations else []
-            ann.append(
-                dict(
-                    text=dropdown_title,
-                    x=x, y=y + 0.045,
-                    xref="paper", yref="paper",
-                    showarrow=False,
-                    align="left",
-                    font=dict(size=12),
-                )
-            )
+def _build_html(path, filled_path, geometry_path, config):
+    """Choropleth final a partir de la tabla rellenada y la geometria."""
+    full, meta = _read_table(filled_path)
+    with open(geometry_path, encoding="utf-8") as f:
+        panama_map_data = json.load(f)
 
-            self.fig.update_layout(updatemenus=existing, annotations=ann)
-            return self
+    gdf_bound = pd.DataFrame([ft["properties"] for ft in panama_map_data["features"]])
+    gdf_bound["ID_CORR"] = gdf_bound["ID_CORR"].astype(str)
+    gdf_bound2 = gdf_bound.merge(full, on="ID_CORR", how="left", suffixes=("", "_dup"))
 
-    # Exporta el cache del mapa en html
-        def export_html(self, output_path, include_plotlyjs: str = "cdn", full_html: bool = True):
-            if self.fig is None:
-                raise RuntimeError("No hay figura. Llama build_base() antes de export_html().")
-            self.fig.write_html(str(output_path), include_plotlyjs=include_plotlyjs, full_html=full_html)
-            return output_path
-
-    variables = {
-        "radiation_pred_filled": "Radiación (pred)",
-        "temperature_2m_C_filled": "Temperatura (°C)",
-        "relative_humidity_filled": "Humedad relativa (%)",
-        "Cloud_Cover_Mean_24h_filled": "Cobertura nubosa (24h)",
-        "wind_speed_filled": "Velocidad del viento",
-        "surface_pressure_filled": "Presión superficial"
-    }
-
-    panel_fields = {
-        "Provincia": "Provincia",
-        "Distrito": "Distrito",
-        "Corregimiento": "Corregimiento",
-        "radiation_pred_filled": "Radiación (pred)",
-        "temperature_2m_C_filled": "Temperatura (°C)",
-        "relative_humidity_filled": "Humedad (%)",
-        "Cloud_Cover_Mean_24h_filled": "Nubosidad (24h)",
-        "elevation_filled": "Elevación (m)"
-    }
-
-
-    PRESET = [(0.0, "#88FF00"), (0.3, "#FFA500"), (1.0, "#FF0000")]
-
-    palette_options = {
-        "Solar Potential Scale": PRESET,
-        "Thermal Intensity Scale": "YlOrRd",
-        "Perceptual Uniform Scale": "Cividis",
-        "Environmental Gradient": "Viridis",
-    }
+    for col in ["Provincia", "Corregimiento"]:
+        dup = col + "_dup"
+        if dup in gdf_bound2.columns:
+            gdf_bound2[col] = gdf_bound2[col].fillna(gdf_bound2[dup])
+            gdf_bound2.drop(columns=[dup], inplace=True)
 
+    filled_cols = [c for c in gdf_bound2.columns if c.endswith("_filled")]
+    gdf_bound2[filled_cols] = gdf_bound2[filled_cols].round(config.value_decimals)
 
     builder = ChoroplethMapBuilder(
         gdf_bound2=gdf_bound2,
         geojson_data=panama_map_data,
-        center_lat=df["lat"].mean(),
-        center_lon=df["lon"].mean(),
-        config=MapConfig(height=700)
+        center_lat=meta["center_lat"],
+        center_lon=meta["center_lon"],
+        config=config
     )
 
     builder.build_base(
         color_col="radiation_pred_filled",
         hover_name="Corregimiento",
-        hover_data={
-            "ID_CORR": False,
-            "Provincia": True,
-            "radiation_pred_filled": ":.2f",
-            "Cloud_Cover_Mean_24h_filled": ":.2f",
-            "elevation_filled": ":.0f",
-            "relative_humidity_filled": ":.2f",
-            "temperature_2m_C_filled": ":.2f",
-        }
+        hover_data=HOVER_DATA
     ).add_variable_selector(
-        variables=variables,
+        variables=VARIABLES,
         default="radiation_pred_filled",
         dropdown_title="Variable"
     ).add_colorscale_selector(
-        scales=palette_options,
+        scales=PALETTE_OPTIONS,
         default_key="Solar Potential Scale",
         dropdown_title="Paleta"
-    ).export_html(OUTPUT_FILE)
\ No newline at end of file
+    ).export_html(path)
+
+
+def generate_and_save_map(force_regeneration=False, config=None, cache=None):
+    """
+    Genera el mapa interactivo de Plotly y lo guarda como un archivo HTML.
+    Cada etapa (promedios, tabla rellenada, geometria, HTML) se guarda en
+    MapCache con una clave derivada del contenido de sus entradas: cambiar
+    solo la configuracion del mapa reutiliza los promedios ya calculados.
+    """
+    config = config or MapConfig(height=700)
+    cache = cache or MapCache()
+    start_time = time.time()
+
+    # 1. HASHES DE LAS ENTRADAS
+    try:
+        data_hash = dataset_hash(PREDICTIONS_PATH)
+        bounds_hash = file_hash(GEOJSON_PATH)
+    except FileNotFoundError as e:
+        print(f"ERROR FATAL: Archivo no encontrado. Asegúrate de que la ruta sea correcta. Error: {e}")
+        raise FileNotFoundError(f"Asegúrate de que la carpeta 'Datasets' exista y contenga los archivos requeridos. Ruta base: {DATA_PATH.absolute()}")
+
+    # 2. ETAPAS (cada una solo se recalcula si cambia su clave)
+    force = force_regeneration
+    stats_key = content_key("stats", data_hash, bounds_hash, MAP_VARS)
+    stats_path = cache.get("stats", stats_key, ".parquet",
+                           lambda p: _build_stats(p, PREDICTIONS_PATH, GEOJSON_PATH), force)
+
+    filled_key = content_key("filled", stats_key, bounds_hash)
+    filled_path = cache.get("filled", filled_key, ".parquet",
+                            lambda p: _build_filled(p, stats_path, GEOJSON_PATH), force)
+
+    geometry_key = content_key("geometry", bounds_hash, config.geometry_zoom)
+    geometry_path = cache.get("geometry", geometry_key, ".json",
+                              lambda p: _build_geometry(p, GEOJSON_PATH, config.geometry_zoom), force)
+
+    import plotly
+    html_key = content_key("html", filled_key, geometry_key, asdict(config), VARIABLES,
+                           HOVER_DATA, PALETTE_OPTIONS, plotly.__version__)
+    html_path = cache.get("map", html_key, ".html",
+                          lambda p: _build_html(p, filled_path, geometry_path, config), force)
+
+    # Copia estable para la interfaz
+    shutil.copyfile(html_path, OUTPUT_FILE)
+    print(f"DEBUG: Mapa listo en {time.time() - start_time:.2f} s: {OUTPUT_FILE.name}")
+    return OUTPUT_FILE
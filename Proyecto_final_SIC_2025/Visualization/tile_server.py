@@ -0,0 +1,127 @@
+import os
+import re
+import sys
+import json
+import sqlite3
+import threading
+import webbrowser
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from Visualization.tiles import TILES_DIR, TILE_SIZE, png_bytes
+
+VIEWER_PATH = Path(os.path.dirname(os.path.abspath(__file__))) / "tile_viewer.html"
+DEFAULT_PORT = 8765
+# Respuesta para tiles que no estan en el archivo (fuera de Panama)
+EMPTY_TILE = png_bytes(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+TILE_ROUTE = re.compile(r"^/tiles/([\w.-]+)/(\d+)/(\d+)/(\d+)\.png$")
+
+
+class MBTilesReader:
+    """Lectura de un archivo MBTiles (solo lectura, compartido entre hilos)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(f"{self.path.absolute().as_uri()}?mode=ro", uri=True,
+                                     check_same_thread=False)
+        self._lock = threading.Lock()
+        self.metadata = dict(self._conn.execute("SELECT name, value FROM metadata"))
+
+    def tile(self, z, x, y):
+        """PNG del tile XYZ (z, x, y) o None si no existe."""
+        # MBTiles guarda las filas en esquema TMS
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (z, x, 2 ** z - 1 - y),
+            ).fetchone()
+        return row[0] if row else None
+
+    def info(self):
+        """Metadatos para el visor (bounds, zooms y leyenda)."""
+        meta = self.metadata
+        return {
+            "name": meta.get("name"),
+            "bounds": [float(v) for v in meta["bounds"].split(",")],
+            "center": [float(v) for v in meta["center"].split(",")],
+            "minzoom": int(meta["minzoom"]),
+            "maxzoom": int(meta["maxzoom"]),
+            "legend": json.loads(meta.get("legend", "{}")),
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def open_tilesets(tiles_dir=TILES_DIR):
+    """Un lector por cada <variable>.mbtiles en tiles_dir."""
+    return {p.stem: MBTilesReader(p) for p in sorted(Path(tiles_dir).glob("*.mbtiles"))}
+
+
+def make_handler(tilesets):
+    class TileHandler(BaseHTTPRequestHandler):
+        def _send(self, body, content_type, status=200, cache=True):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if cache:
+                self.send_header("Cache-Control", "public, max-age=3600")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, data, status=200):
+            self._send(json.dumps(data, ensure_ascii=False).encode("utf-8"),
+                       "application/json; charset=utf-8", status, cache=False)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path in ("/", "/index.html"):
+                self._send(VIEWER_PATH.read_bytes(), "text/html; charset=utf-8", cache=False)
+            elif path == "/tilesets":
+                self._json({name: reader.info() for name, reader in tilesets.items()})
+            elif (match := TILE_ROUTE.match(path)):
+                name, z, x, y = match.group(1), *map(int, match.groups()[1:])
+                if name not in tilesets:
+                    self._json({"error": f"tileset desconocido: {name}"}, 404)
+                    return
+                self._send(tilesets[name].tile(z, x, y) or EMPTY_TILE, "image/png")
+            else:
+                self._json({"error": "ruta no encontrada"}, 404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return TileHandler
+
+
+def serve(port=DEFAULT_PORT, tiles_dir=TILES_DIR, open_browser=True):
+    """
+    Sirve el visor y los tiles de todos los MBTiles de tiles_dir en
+    http://localhost:<port>/ (el navegador pide solo los tiles visibles).
+    """
+    tilesets = open_tilesets(tiles_dir)
+    if not tilesets:
+        raise FileNotFoundError(f"No hay archivos .mbtiles en {tiles_dir}; ejecuta tiles.py primero")
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(tilesets))
+    url = f"http://localhost:{server.server_address[1]}/"
+    print(f"Visor de tiles en {url} ({', '.join(tilesets)}); Ctrl+C para terminar")
+    if open_browser:
+        webbrowser.open(url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for reader in tilesets.values():
+            reader.close()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import math
+import sqlite3
+import struct
+import time
+import zlib
+from pathlib import Path
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from Storage.dataset_store import DATASETS_DIR, read_dataset
+from Storage.grid import GRID_RES, pixel_ids
+from Visualization.corr_index import BOUNDARIES_PATH, load_boundaries
+from Visualization.corregimientos_map import PREDICTIONS_PATH, PALETTE_OPTIONS, MapConfig
+from Visualization.zonal_stats import ZonalWeights
+
+TILES_DIR = DATASETS_DIR / "tiles"
+TILE_SIZE = 256
+# Nivel de agregacion de cada zoom: provincia -> distrito -> corregimiento -> pixel de la malla
+ZOOM_LEVELS = {
+    5: "Provincia", 6: "Provincia",
+    7: "Distrito", 8: "Distrito",
+    9: "Corregimiento", 10: "Corregimiento",
+    11: "pixel", 12: "pixel",
+}
+
+
+# ============================================
+# Geometria de tiles (Web Mercator, esquema XYZ)
+# ============================================
+def lonlat_to_tile(lon, lat, zoom):
+    n = 2 ** zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_pixel_centers(zoom, x, y, size=TILE_SIZE):
+    """lon de cada columna y lat de cada fila de pixeles del tile."""
+    n = 2 ** zoom
+    offsets = (np.arange(size) + 0.5) / size
+    lon = (x + offsets) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (y + offsets) / n))))
+    return lon, lat
+
+
+def tiles_for_bounds(bounds, zoom):
+    """Tiles (x, y) que cubren bounds = (min_lon, min_lat, max_lon, max_lat)."""
+    x0, y0 = lonlat_to_tile(bounds[0], bounds[3], zoom)
+    x1, y1 = lonlat_to_tile(bounds[2], bounds[1], zoom)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+# ============================================
+# Color y PNG
+# ============================================
+def colormap(scale, n=256):
+    """Tabla (n, 3) uint8 de una escala de Plotly (nombre o lista de (pos, color))."""
+    import plotly.colors as pc
+
+    if isinstance(scale, str):
+        scale = pc.get_colorscale(scale)
+    pos = [float(p) for p, _ in scale]
+    rgb = np.array([
+        pc.hex_to_rgb(c) if c.strip().startswith("#") else pc.unlabel_rgb(c)
+        for _, c in scale
+    ], dtype=np.float64)
+    t = np.linspace(0.0, 1.0, n)
+    return np.stack([np.interp(t, pos, rgb[:, i]) for i in range(3)], axis=1).round().astype(np.uint8)
+
+
+def png_bytes(rgba):
+    """PNG RGBA (8 bits) de un arreglo (alto, ancho, 4), sin dependencias extra."""
+    height, width = rgba.shape[:2]
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, -1)
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) + chunk(b"IEND", b""))
+
+
+# ============================================
+# Valores por nivel
+# ============================================
+class PyramidData:
+    """
+    Valores de una variable en cada nivel de la piramide: promedio por pixel
+    de la malla y promedios ponderados por area por corregimiento, distrito
+    y provincia (los poligonos de corregimiento se pintan con el valor de su
+    nivel, asi no hace falta disolver geometrias).
+    """
+
+    def __init__(self, source=PREDICTIONS_PATH, variable="radiation_pred",
+                 boundaries_path=BOUNDARIES_PATH, grid_res=GRID_RES):
+        import shapely
+
+        df = read_dataset(source, columns=["lon", "lat", variable])
+        keys = pixel_ids(df["lon"].to_numpy(), df["lat"].to_numpy(), grid_res)
+        cell_means = df[variable].groupby(keys).mean()
+        self.grid_res = grid_res
+        self.cell_keys = cell_means.index.to_numpy()
+        self.cell_values = cell_means.to_numpy(dtype=np.float64)
+
+        with open(boundaries_path, encoding="utf-8") as f:
+            props = [ft["properties"] for ft in json.load(f)["features"]]
+        self.ids, geoms = load_boundaries(boundaries_path)
+        self.geoms = shapely.make_valid(np.asarray(geoms, dtype=object))
+        shapely.prepare(self.geoms)
+        self.tree = shapely.STRtree(self.geoms)
+        self.bounds = tuple(shapely.total_bounds(self.geoms))
+
+        zonal = ZonalWeights(self.cell_keys, boundaries_path=boundaries_path, grid_res=grid_res)
+        self.polygon_values = {"Corregimiento": zonal.aggregate(self.cell_values)}
+        for level in ("Distrito", "Provincia"):
+            names = [f"{p.get('Provincia')}/{p.get(level)}" for p in props]
+            _, groups = np.unique(names, return_inverse=True)
+            self.polygon_values[level] = zonal.aggregate(self.cell_values, groups)[groups]
+
+        # Rango comun a todos los niveles (los promedios quedan dentro del de los pixeles)
+        self.vmin = float(np.nanmin(self.cell_values))
+        self.vmax = float(np.nanmax(self.cell_values))
+
+    def polygon_raster(self, zoom, x, y, size=TILE_SIZE):
+        """Indice del poligono bajo cada pixel del tile (-1 fuera de todos)."""
+        import shapely
+
+        lon, lat = tile_pixel_centers(zoom, x, y, size)
+        raster = np.full((size, size), -1, dtype=np.int32)
+        tile_box = shapely.box(lon[0], lat[-1], lon[-1], lat[0])
+        for g in self.tree.query(tile_box):
+            min_lon, min_lat, max_lon, max_lat = shapely.bounds(self.geoms[g])
+            cols = np.flatnonzero((lon >= min_lon) & (lon <= max_lon))
+            rows = np.flatnonzero((lat >= min_lat) & (lat <= max_lat))
+            if len(cols) == 0 or len(rows) == 0:
+                continue
+            window = raster[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+            xx, yy = np.meshgrid(lon[cols[0]:cols[-1] + 1], lat[rows[0]:rows[-1] + 1])
+            inside = shapely.contains_xy(self.geoms[g], xx, yy) & (window < 0)
+            window[inside] = g
+        return raster
+
+    def tile_values(self, zoom, x, y, level, size=TILE_SIZE):
+        """Valor de la variable en cada pixel del tile para `level` (NaN = vacio)."""
+        if level == "pixel":
+            lon, lat = tile_pixel_centers(zoom, x, y, size)
+            keys = pixel_ids(*np.meshgrid(lon, lat), self.grid_res)
+            pos = np.minimum(np.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+            return np.where(self.cell_keys[pos] == keys, self.cell_values[pos], np.nan)
+
+        raster = self.polygon_raster(zoom, x, y, size)
+        values = np.append(self.polygon_values[level], np.nan)
+        return values[raster]
+
+
+def render_tile(values, vmin, vmax, colors, alpha=255):
+    """Valores -> PNG RGBA con la escala `colors`; None si el tile esta vacio."""
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return None
+    scaled = np.clip((np.where(valid, values, vmin) - vmin) / max(vmax - vmin, 1e-12), 0.0, 1.0)
+    rgba = np.zeros(values.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = colors[np.rint(scaled * (len(colors) - 1)).astype(np.int64)]
+    rgba[..., 3] = np.where(valid, alpha, 0)
+    return png_bytes(rgba)
+
+
+# ============================================
+# MBTiles
+# ============================================
+def mbtiles_path(variable, tiles_dir=TILES_DIR):
+    return Path(tiles_dir) / f"{variable}.mbtiles"
+
+
+def build_mbtiles(source=PREDICTIONS_PATH, variable="radiation_pred",
+                  palette="Solar Potential Scale", zoom_levels=None, path=None):
+    """
+    Genera la piramide de tiles PNG pre-agregados de `variable` en un archivo
+    MBTiles (SQLite). Los tiles vacios no se guardan. El archivo se escribe
+    aparte y se reemplaza al final. Devuelve la ruta.
+    """
+    zoom_levels = zoom_levels or ZOOM_LEVELS
+    path = Path(path or mbtiles_path(variable))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.unlink(missing_ok=True)
+
+    start = time.perf_counter()
+    data = PyramidData(source, variable)
+    colors = colormap(PALETTE_OPTIONS[palette])
+    alpha = int(round(MapConfig().opacity * 255))
+
+    conn = sqlite3.connect(tmp)
+    conn.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+    conn.execute(
+        "CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER,"
+        " tile_row INTEGER, tile_data BLOB)"
+    )
+    conn.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+
+    count = 0
+    for zoom, level in sorted(zoom_levels.items()):
+        rows = []
+        for x, y in tiles_for_bounds(data.bounds, zoom):
+            png = render_tile(data.tile_values(zoom, x, y, level), data.vmin, data.vmax, colors, alpha)
+            if png is not None:
+                # MBTiles usa filas TMS (origen abajo)
+                rows.append((zoom, x, 2 ** zoom - 1 - y, png))
+        conn.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", rows)
+        count += len(rows)
+        print(f"  zoom {zoom} ({level}): {len(rows)} tiles")
+
+    min_lon, min_lat, max_lon, max_lat = data.bounds
+    stops = colors[np.linspace(0, len(colors) - 1, 9).astype(int)]
+    legend = {"variable": variable, "palette": palette, "vmin": data.vmin, "vmax": data.vmax,
+              "colors": [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in stops],
+              "levels": {str(z): lvl for z, lvl in zoom_levels.items()}}
+    metadata = {
+        "name": variable,
+        "format": "png",
+        "type": "overlay",
+        "version": "1",
+        "minzoom": str(min(zoom_levels)),
+        "maxzoom": str(max(zoom_levels)),
+        "bounds": f"{min_lon},{min_lat},{max_lon},{max_lat}",
+        "center": f"{(min_lon + max_lon) / 2},{(min_lat + max_lat) / 2},{min(zoom_levels) + 1}",
+        "legend": json.dumps(legend, ensure_ascii=False),
+    }
+    conn.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+    conn.commit()
+    conn.close()
+    os.replace(tmp, path)
+
+    print(f"{count} tiles en {path} ({time.perf_counter() - start:.1f} s)")
+    return path
+
+
+if __name__ == "__main__":
+    build_mbtiles()
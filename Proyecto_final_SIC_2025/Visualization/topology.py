@@ -0,0 +1,256 @@
+import json
+import math
+from pathlib import Path
+import numpy as np
+
+from Visualization.corr_index import BOUNDARIES_PATH, file_hash
+
+# Zoom de referencia (el mapa abre en zoom 6): la geometria se simplifica a
+# medio pixel y se cuantiza a un cuarto de pixel de ese zoom (tiles de 512 px)
+DEFAULT_ZOOM = 8
+TILE_PX = 512
+
+
+def degrees_per_pixel(zoom):
+    return 360.0 / (TILE_PX * 2 ** zoom)
+
+
+def _polygons(geom):
+    if geom["type"] == "Polygon":
+        return [geom["coordinates"]]
+    if geom["type"] == "MultiPolygon":
+        return geom["coordinates"]
+    return []
+
+
+def _open_ring(ring, x0, y0, step):
+    """Anillo cuantizado a enteros, sin puntos repetidos ni cierre."""
+    pts = np.asarray(ring, dtype=np.float64)[:, :2]
+    q = np.rint((pts - (x0, y0)) / step).astype(np.int64)
+    keep = np.ones(len(q), dtype=bool)
+    keep[1:] = np.any(q[1:] != q[:-1], axis=1)
+    q = q[keep]
+    if len(q) > 1 and np.array_equal(q[0], q[-1]):
+        q = q[:-1]
+    return q
+
+
+def _point_keys(q):
+    return (q[:, 0] << 32) | q[:, 1]
+
+
+def _junctions(rings):
+    """
+    Mascara por anillo de los puntos donde se separan los limites
+    compartidos: puntos que aparecen en varios lugares con vecinos
+    distintos (como en TopoJSON).
+    """
+    keys, pairs_a, pairs_b = [], [], []
+    for q in rings:
+        k = _point_keys(q)
+        prev, nxt = np.roll(k, 1), np.roll(k, -1)
+        keys.append(k)
+        pairs_a.append(np.minimum(prev, nxt))
+        pairs_b.append(np.maximum(prev, nxt))
+    keys = np.concatenate(keys)
+    pairs_a, pairs_b = np.concatenate(pairs_a), np.concatenate(pairs_b)
+
+    # Juntura: mas de un par de vecinos distinto para la misma clave
+    order = np.lexsort((pairs_b, pairs_a, keys))
+    k, a, b = keys[order], pairs_a[order], pairs_b[order]
+    new_pair = np.ones(len(k), dtype=bool)
+    new_pair[1:] = (k[1:] != k[:-1]) | (a[1:] != a[:-1]) | (b[1:] != b[:-1])
+    point, count = np.unique(k[new_pair], return_counts=True)
+    mask = np.isin(keys, point[count > 1])
+    return np.split(mask, np.cumsum([len(q) for q in rings])[:-1])
+
+
+def _cut_ring(q, is_junction):
+    """Arcos del anillo cortado en sus junturas (un arco cerrado si no hay)."""
+    cuts = np.flatnonzero(is_junction)
+    if len(cuts) == 0:
+        # Anillo sin juntura: arco cerrado que empieza en su punto minimo
+        start = int(np.argmin(_point_keys(q)))
+        q = np.roll(q, -start, axis=0)
+        return [np.vstack([q, q[:1]])]
+    q = np.roll(q, -cuts[0], axis=0)
+    cuts = np.append(cuts - cuts[0], len(q))
+    closed = np.vstack([q, q[:1]])
+    return [closed[a:b + 1] for a, b in zip(cuts[:-1], cuts[1:])]
+
+
+def _ring_area(q):
+    x, y = q[:, 0].astype(np.float64), q[:, 1].astype(np.float64)
+    return abs(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2.0
+
+
+def build_topology(geojson, zoom=DEFAULT_ZOOM):
+    """
+    Topologia estilo TopoJSON de una FeatureCollection de poligonos: arcos
+    compartidos entre vecinos (se simplifican una sola vez, sin huecos ni
+    solapes entre corregimientos), coordenadas enteras cuantizadas y
+    codificadas por diferencias. Los anillos que colapsan al simplificar o
+    miden menos de un pixel se descartan, salvo el exterior de la parte mas
+    grande de cada geometria.
+    """
+    import shapely
+
+    step = degrees_per_pixel(zoom) / 4.0
+    tolerance = degrees_per_pixel(zoom) / 2.0 / step
+
+    features = geojson["features"]
+    all_pts = np.concatenate([
+        np.asarray(ring, dtype=np.float64)[:, :2]
+        for ft in features for poly in _polygons(ft["geometry"]) for ring in poly
+    ])
+    x0, y0 = all_pts.min(axis=0)
+
+    # Anillos cuantizados: (feature, parte, anillo) -> puntos enteros
+    rings, owners = [], []
+    for f, ft in enumerate(features):
+        for p, poly in enumerate(_polygons(ft["geometry"])):
+            for r, ring in enumerate(poly):
+                q = _open_ring(ring, x0, y0, step)
+                if len(q) >= 3:
+                    rings.append(q)
+                    owners.append((f, p, r))
+    junctions = _junctions(rings)
+
+    # Arcos unicos; un indice negativo ~i es el arco i recorrido al reves
+    arcs, arc_index, ring_arcs = [], {}, []
+    for q, is_junction in zip(rings, junctions):
+        refs = []
+        for arc in _cut_ring(q, is_junction):
+            key = arc.tobytes()
+            if key in arc_index:
+                refs.append(arc_index[key])
+                continue
+            rev = arc[::-1].copy().tobytes()
+            if rev in arc_index:
+                refs.append(~arc_index[rev])
+                continue
+            arc_index[key] = len(arcs)
+            refs.append(len(arcs))
+            arcs.append(arc)
+        ring_arcs.append(refs)
+
+    # Simplificacion de todos los arcos juntos (los extremos se conservan y
+    # GEOS evita que un arco simplificado cruce a otro)
+    lines = shapely.linestrings(
+        np.concatenate(arcs).astype(np.float64),
+        indices=np.repeat(np.arange(len(arcs)), [len(a) for a in arcs]),
+    )
+    network = shapely.simplify(shapely.multilinestrings(lines), tolerance, preserve_topology=True)
+    simplified = [
+        np.rint(shapely.get_coordinates(line)).astype(np.int64)
+        for line in shapely.get_parts(network)
+    ]
+
+    def ring_points(refs, source):
+        parts = [source[i] if i >= 0 else source[~i][::-1] for i in refs]
+        return np.vstack([parts[0]] + [part[1:] for part in parts[1:]])
+
+    # Exterior de la parte mas grande de cada feature: siempre se dibuja
+    largest = {}
+    for q, (f, p, r) in zip(rings, owners):
+        if r == 0 and _ring_area(q) > largest.get(f, (None, -1))[1]:
+            largest[f] = (p, _ring_area(q))
+
+    geometries = [{"type": "MultiPolygon", "arcs": [], "properties": ft["properties"]} for ft in features]
+    # Anillos de menos de un pixel^2 al zoom de referencia no se ven
+    min_area = (degrees_per_pixel(zoom) / step) ** 2
+    parts = {}
+    for refs, (f, p, r) in zip(ring_arcs, owners):
+        q = ring_points(refs, simplified)
+        if len(np.unique(_point_keys(q))) < 3 or _ring_area(q) < min_area:
+            if r == 0 and largest[f][0] == p:
+                # Se restauran sus arcos originales (tambien para los vecinos)
+                for i in refs:
+                    simplified[i if i >= 0 else ~i] = arcs[i if i >= 0 else ~i]
+            else:
+                # Anillo que no se ve: se descarta (y los huecos de su parte)
+                if r == 0:
+                    parts[(f, p)] = None
+                continue
+        if r > 0 and parts.get((f, p)) is None:
+            continue
+        if r == 0:
+            parts[(f, p)] = []
+            geometries[f]["arcs"].append(parts[(f, p)])
+        parts[(f, p)].append(refs)
+
+    for geom in geometries:
+        if len(geom["arcs"]) == 1:
+            geom["type"], geom["arcs"] = "Polygon", geom["arcs"][0]
+
+    encoded = []
+    for arc in simplified:
+        delta = np.vstack([arc[:1], np.diff(arc, axis=0)])
+        encoded.append(delta.tolist())
+
+    return {
+        "type": "Topology",
+        "transform": {"scale": [step, step], "translate": [float(x0), float(y0)]},
+        "arcs": encoded,
+        "objects": {"corregimientos": {"type": "GeometryCollection", "geometries": geometries}},
+    }
+
+
+def topology_to_geojson(topology):
+    """FeatureCollection GeoJSON (lo que consume Plotly) desde la topologia."""
+    sx, sy = topology["transform"]["scale"]
+    tx, ty = topology["transform"]["translate"]
+    decimals = max(0, math.ceil(-math.log10(min(sx, sy))))
+    arcs = [np.cumsum(np.asarray(a, dtype=np.int64), axis=0) for a in topology["arcs"]]
+
+    def ring(refs):
+        parts = [arcs[i] if i >= 0 else arcs[~i][::-1] for i in refs]
+        q = np.vstack([parts[0]] + [part[1:] for part in parts[1:]])
+        xy = np.round(q * (sx, sy) + (tx, ty), decimals)
+        return xy.tolist()
+
+    features = []
+    for geom in topology["objects"]["corregimientos"]["geometries"]:
+        if geom["type"] == "Polygon":
+            coords = [ring(refs) for refs in geom["arcs"]]
+        else:
+            coords = [[ring(refs) for refs in poly] for poly in geom["arcs"]]
+        features.append({
+            "type": "Feature",
+            "properties": geom["properties"],
+            "geometry": {"type": geom["type"], "coordinates": coords},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def topology_path(boundaries_path, zoom):
+    """Cache junto al archivo de limites: <nombre>.z<zoom>.topo.json."""
+    boundaries_path = Path(boundaries_path)
+    return boundaries_path.with_name(f"{boundaries_path.stem}.z{zoom:g}.topo.json")
+
+
+def load_topology(boundaries_path=BOUNDARIES_PATH, zoom=DEFAULT_ZOOM):
+    """
+    Topologia simplificada para `zoom`, desde el cache si corresponde al
+    hash actual del archivo de limites (si no, se recalcula y se guarda).
+    """
+    source_hash = file_hash(boundaries_path)
+    path = topology_path(boundaries_path, zoom)
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            topology = json.load(f)
+        if topology.get("source_hash") == source_hash:
+            return topology
+
+    print(f"Simplificando limites para zoom {zoom:g}...")
+    with open(boundaries_path, encoding="utf-8") as f:
+        topology = build_topology(json.load(f), zoom)
+    topology["source_hash"] = source_hash
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(topology, f, ensure_ascii=False, separators=(",", ":"))
+    return topology
+
+
+def simplified_geojson(boundaries_path=BOUNDARIES_PATH, zoom=DEFAULT_ZOOM):
+    """GeoJSON simplificado y cuantizado para el mapa (ver load_topology)."""
+    return topology_to_geojson(load_topology(boundaries_path, zoom))
@@ -0,0 +1,131 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from Storage.dataset_store import DATASETS_DIR
+from Storage.grid import GRID_RES, pixel_ids, pixel_bounds
+from Visualization.corr_index import BOUNDARIES_PATH, file_hash, load_boundaries
+
+WEIGHTS_PATH = DATASETS_DIR / "zonal_weights.npz"
+
+
+def intersection_weights(cell_keys, geoms, grid_res=GRID_RES):
+    """
+    Matriz dispersa (poligono x celda) con el area de interseccion entre cada
+    poligono y cada celda de la malla. Areas en grados^2: dentro de un
+    corregimiento el factor cos(lat) es practicamente constante.
+    """
+    import shapely
+    from shapely import STRtree
+    from scipy.sparse import csr_matrix
+
+    boxes = shapely.box(*pixel_bounds(cell_keys, grid_res))
+    # Algunos poligonos del GeoJSON no son validos (auto-intersecciones)
+    geoms = shapely.make_valid(np.asarray(geoms, dtype=object))
+    poly_idx, cell_idx = STRtree(boxes).query(geoms, predicate="intersects")
+    areas = shapely.area(shapely.intersection(geoms[poly_idx], boxes[cell_idx]))
+    keep = areas > 0
+    return csr_matrix((areas[keep], (poly_idx[keep], cell_idx[keep])),
+                      shape=(len(geoms), len(boxes)))
+
+
+class ZonalWeights:
+    """
+    Estadisticas zonales ponderadas por area: el valor de un corregimiento es
+    el promedio de las celdas de la malla que toca, pesado por el area de
+    interseccion. La matriz de pesos se guarda en WEIGHTS_PATH y se
+    reconstruye si cambian los limites, la malla o el conjunto de celdas.
+    """
+
+    def __init__(self, cell_keys, boundaries_path=BOUNDARIES_PATH, cache_path=WEIGHTS_PATH,
+                 grid_res=GRID_RES):
+        self.cell_keys = np.unique(np.asarray(cell_keys, dtype=np.int64))
+        self.boundaries_path = Path(boundaries_path)
+        self.cache_path = Path(cache_path)
+        self.grid_res = grid_res
+        self._load()
+
+    @classmethod
+    def from_points(cls, lon, lat, **kwargs):
+        """Pesos para las celdas que contienen los puntos (lon, lat) de un dataset."""
+        return cls(pixel_ids(lon, lat, kwargs.get("grid_res", GRID_RES)), **kwargs)
+
+    def _load(self):
+        from scipy.sparse import csr_matrix
+
+        self.boundaries_hash = file_hash(self.boundaries_path)
+        if self.cache_path.exists():
+            data = np.load(self.cache_path, allow_pickle=False)
+            if (str(data["boundaries_hash"]) == self.boundaries_hash
+                    and float(data["grid_res"]) == self.grid_res
+                    and np.array_equal(data["cell_keys"], self.cell_keys)):
+                self.ids = data["ids"]
+                self.weights = csr_matrix(
+                    (data["data"], data["indices"], data["indptr"]),
+                    shape=(len(self.ids), len(self.cell_keys)),
+                )
+                return
+
+        print("Calculando pesos zonales (interseccion corregimiento x celda)...")
+        self.ids, geoms = load_boundaries(self.boundaries_path)
+        self.weights = intersection_weights(self.cell_keys, geoms, self.grid_res)
+        self.save()
+
+    def save(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_path, "wb") as f:
+            np.savez(f, data=self.weights.data, indices=self.weights.indices,
+                     indptr=self.weights.indptr, ids=self.ids, cell_keys=self.cell_keys,
+                     boundaries_hash=self.boundaries_hash, grid_res=self.grid_res)
+
+    def cell_index(self, lon, lat):
+        """Posicion de la celda de cada punto en cell_keys (-1 si no esta)."""
+        keys = pixel_ids(lon, lat, self.grid_res)
+        pos = np.minimum(np.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+        return np.where(self.cell_keys[pos] == keys, pos, -1)
+
+    def aggregate(self, values, groups=None):
+        """
+        values: (celdas,) o (celdas, k) con NaN donde no hay dato. Devuelve
+        (corregimientos, k): promedio ponderado por area de las celdas con
+        dato (NaN si el corregimiento no toca ninguna). Con `groups` (un
+        codigo entero por corregimiento, p. ej. distrito o provincia) el
+        resultado es (max(groups)+1, k) con las areas de cada grupo sumadas.
+        """
+        from scipy.sparse import csr_matrix
+
+        weights = self.weights
+        if groups is not None:
+            groups = np.asarray(groups)
+            members = csr_matrix((np.ones(len(groups)), (groups, np.arange(len(groups)))),
+                                 shape=(groups.max() + 1, len(groups)))
+            weights = members @ weights
+
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        total = weights @ np.where(valid, values, 0.0)
+        area = weights @ valid.astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(area > 0, total / area, np.nan)
+
+    def zonal_means(self, df, value_cols, by=None):
+        """
+        Promedio por corregimiento de value_cols. Primero se promedia cada
+        celda (y cada grupo de `by`, p. ej. el mes) y luego se agregan todas
+        las columnas con un solo producto disperso. Devuelve un DataFrame con
+        ID_CORR (y `by`) y una columna por variable.
+        """
+        cells = self.cell_index(df["lon"].to_numpy(), df["lat"].to_numpy())
+        inside = cells >= 0
+        keys = [cells[inside]] + ([df.loc[inside, by].to_numpy()] if by else [])
+        cell_means = df.loc[inside, value_cols].groupby(keys).mean()
+        if by:
+            cell_means = cell_means.unstack(1).rename_axis(columns=[None, by])
+        cell_means = cell_means.reindex(np.arange(len(self.cell_keys)))
+
+        result = pd.DataFrame(self.aggregate(cell_means.to_numpy()),
+                              index=pd.Index(self.ids, name="ID_CORR"),
+                              columns=cell_means.columns)
+        if by:
+            result = result.stack(by, future_stack=True)
+        return result.reset_index()